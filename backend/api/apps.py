@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Invalidation du cache des réponses publiques (post_save / post_delete)
+        from . import caching  # noqa: F401
+        # Suppression des fichiers d'archive d'audit (post_delete)
+        from . import audit_archive  # noqa: F401
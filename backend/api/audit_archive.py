@@ -0,0 +1,258 @@
+"""
+Archivage de l'audit des paiements Premium.
+
+Les lignes de PremiumPaymentAuditLog plus anciennes que settings.AUDIT_HOT_MONTHS
+mois sont déplacées, par propriétaire et par mois, dans un fichier JSONL
+compressé (gzip) stocké sous settings.AUDIT_ARCHIVE_ROOT. Chaque fichier est
+référencé par une ligne PremiumPaymentAuditArchive : la table chaude reste
+bornée, les insertions et listes d'audit restent rapides.
+
+La liste d'audit (PremiumPaymentAuditLogListView) relit les mois archivés
+quand la période demandée les recouvre (audit_page), le détail d'une ligne
+archivée est relu par archived_log ; la commande restore_audit_logs les
+réinsère en base.
+"""
+import gzip
+import json
+import tempfile
+import uuid
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import User, PremiumPayment, PremiumPaymentAuditLog, PremiumPaymentAuditArchive
+
+ARCHIVE_FIELDS = ('id', 'payment_id', 'owner_id', 'actor_id', 'action', 'old_data', 'new_data', 'changed_at')
+
+
+def archive_storage():
+    return FileSystemStorage(location=settings.AUDIT_ARCHIVE_ROOT)
+
+
+def month_start_datetime(mois):
+    return timezone.make_aware(datetime.combine(mois, time.min))
+
+
+def next_month(mois):
+    return mois.replace(year=mois.year + 1, month=1) if mois.month == 12 else mois.replace(month=mois.month + 1)
+
+
+def archive_cutoff(mois_conserves=None, now=None):
+    """Début du plus ancien mois conservé en base : tout ce qui précède est archivable"""
+    mois_conserves = settings.AUDIT_HOT_MONTHS if mois_conserves is None else mois_conserves
+    today = timezone.localdate(now)
+    index = today.year * 12 + today.month - 1 - mois_conserves
+    return month_start_datetime(today.replace(year=index // 12, month=index % 12 + 1, day=1))
+
+
+def read_archive(name):
+    """Lignes d'un fichier d'archive (dicts, changed_at en datetime)"""
+    with archive_storage().open(name, 'rb') as raw, gzip.open(raw, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            row = json.loads(line)
+            row['changed_at'] = parse_datetime(row['changed_at'])
+            yield row
+
+
+def write_archive(owner_id, mois, rows):
+    """Écrit les lignes dans un nouveau fichier gzip (sans tout garder en mémoire), retourne (nom, nombre)"""
+    count = 0
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode='wb') as compressed:
+            for row in rows:
+                # isoformat complet : DjangoJSONEncoder tronque les microsecondes (ordre et restauration)
+                row = {**row, 'changed_at': row['changed_at'].isoformat()}
+                compressed.write(json.dumps(row, cls=DjangoJSONEncoder).encode('utf-8'))
+                compressed.write(b'\n')
+                count += 1
+        tmp.seek(0)
+        # Nom unique : un fichier existant n'est remplacé qu'une fois la transaction validée
+        name = archive_storage().save(f'{owner_id}/{mois:%Y-%m}-{uuid.uuid4().hex[:8]}.jsonl.gz', File(tmp))
+    return name, count
+
+
+def archive_audit_logs(mois_conserves=None, owner=None, dry_run=False, chunk_size=2000):
+    """
+    Archive les mois entiers antérieurs à archive_cutoff(mois_conserves).
+    Un mois déjà archivé est fusionné avec ses nouvelles lignes (dédoublonnage par id).
+    """
+    cutoff = archive_cutoff(mois_conserves)
+    logs = PremiumPaymentAuditLog.objects.filter(changed_at__lt=cutoff)
+    if owner is not None:
+        logs = logs.filter(owner=owner)
+
+    groupes = list(
+        logs.order_by().annotate(mois=TruncMonth('changed_at')).values('owner_id', 'mois')
+        .annotate(total=Count('id')).order_by('owner_id', 'mois')
+    )
+    report = {'avant': cutoff.date().isoformat(), 'mois_archives': len(groupes), 'lignes_archivees': 0}
+    if dry_run:
+        report['lignes_archivees'] = sum(groupe['total'] for groupe in groupes)
+        return report
+
+    for groupe in groupes:
+        owner_id, mois = groupe['owner_id'], timezone.localtime(groupe['mois']).date()
+        debut, fin = month_start_datetime(mois), month_start_datetime(next_month(mois))
+        lignes = PremiumPaymentAuditLog.objects.filter(owner_id=owner_id, changed_at__gte=debut, changed_at__lt=fin)
+        archive = PremiumPaymentAuditArchive.objects.filter(owner_id=owner_id, mois=mois).first()
+
+        vus = set()
+        bornes = {'min_id': None, 'max_id': 0, 'premier': None, 'dernier': None}
+
+        def rows():
+            sources = [read_archive(archive.fichier)] if archive else []
+            sources.append(lignes.order_by('changed_at', 'id').values(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size))
+            for source in sources:
+                for row in source:
+                    if row['id'] in vus:
+                        continue
+                    vus.add(row['id'])
+                    bornes['max_id'] = max(bornes['max_id'], row['id'])
+                    if bornes['min_id'] is None or row['id'] < bornes['min_id']:
+                        bornes['min_id'] = row['id']
+                    if bornes['premier'] is None or row['changed_at'] < bornes['premier']:
+                        bornes['premier'] = row['changed_at']
+                    if bornes['dernier'] is None or row['changed_at'] > bornes['dernier']:
+                        bornes['dernier'] = row['changed_at']
+                    yield row
+
+        name, count = write_archive(owner_id, mois, rows())
+        ancien_fichier = archive.fichier if archive else None
+
+        with transaction.atomic():
+            PremiumPaymentAuditArchive.objects.update_or_create(
+                owner_id=owner_id, mois=mois,
+                defaults={
+                    'fichier': name,
+                    'nb_lignes': count,
+                    'premier_changement': bornes['premier'],
+                    'dernier_changement': bornes['dernier'],
+                    'premier_id': bornes['min_id'],
+                    'dernier_id': bornes['max_id'],
+                },
+            )
+            # Seules les lignes écrites dans le fichier sont supprimées
+            supprimees, _ = lignes.filter(id__lte=bornes['max_id']).delete()
+            if ancien_fichier:
+                transaction.on_commit(lambda nom=ancien_fichier: archive_storage().delete(nom))
+
+        report['lignes_archivees'] += supprimees
+
+    return report
+
+
+def restore_audit_archives(owner=None, mois=None, batch_size=2000):
+    """Réinsère en base les lignes des archives (toutes, d'un propriétaire et/ou d'un mois)"""
+    archives = PremiumPaymentAuditArchive.objects.all()
+    if owner is not None:
+        archives = archives.filter(owner=owner)
+    if mois is not None:
+        archives = archives.filter(mois=mois)
+
+    report = {'archives_restaurees': 0, 'lignes_restaurees': 0}
+    for archive in archives.order_by('owner_id', 'mois'):
+        rows = list(read_archive(archive.fichier))
+        # Paiements / acteurs supprimés depuis l'archivage : référence remise à NULL
+        payments = set(PremiumPayment.objects.filter(
+            pk__in={row['payment_id'] for row in rows if row['payment_id']}
+        ).values_list('pk', flat=True))
+        actors = {str(pk) for pk in User.objects.filter(
+            pk__in={row['actor_id'] for row in rows if row['actor_id']}
+        ).values_list('pk', flat=True)}
+
+        with transaction.atomic():
+            PremiumPaymentAuditLog.objects.bulk_create([
+                PremiumPaymentAuditLog(
+                    id=row['id'],
+                    payment_id=row['payment_id'] if row['payment_id'] in payments else None,
+                    owner_id=row['owner_id'],
+                    actor_id=row['actor_id'] if row['actor_id'] in actors else None,
+                    action=row['action'],
+                    old_data=row['old_data'],
+                    new_data=row['new_data'],
+                    changed_at=row['changed_at'],
+                )
+                for row in rows
+            ], batch_size=batch_size, ignore_conflicts=True)
+            # changed_at est auto_now_add : bulk_create l'a écrasé, on remet les dates d'origine
+            restored = PremiumPaymentAuditLog.objects.filter(pk__in=[row['id'] for row in rows])
+            by_id = {row['id']: row['changed_at'] for row in rows}
+            instances = list(restored.only('id'))
+            for instance in instances:
+                instance.changed_at = by_id[instance.id]
+            PremiumPaymentAuditLog.objects.bulk_update(instances, ['changed_at'], batch_size=batch_size)
+            archive.delete()
+
+        report['archives_restaurees'] += 1
+        report['lignes_restaurees'] += len(rows)
+    return report
+
+
+def audit_page(queryset, archives, matches, page_size, avant=None, payload=False):
+    """
+    Page d'audit (ordre -changed_at, -id) fusionnant la table et les mois archivés.
+
+    queryset: lignes en base déjà filtrées ; archives: PremiumPaymentAuditArchive
+    recouvrant la période ; matches(row): filtres appliqués aux lignes d'archive ;
+    avant: position (changed_at, id) de la dernière ligne de la page précédente ;
+    payload: inclure old_data / new_data.
+    Un fichier n'est lu que s'il peut contenir des lignes de la page.
+    Retourne (lignes, position suivante ou None).
+    """
+    def key(row):
+        return (row['changed_at'], row['id'])
+
+    if avant is not None:
+        changed_at, pk = avant
+        queryset = queryset.filter(Q(changed_at__lt=changed_at) | Q(changed_at=changed_at, id__lt=pk))
+        archives = archives.filter(premier_changement__lte=changed_at)
+
+    values = [field for field in ARCHIVE_FIELDS if payload or field not in ('old_data', 'new_data')]
+    candidates = list(queryset.order_by('-changed_at', '-id').values(*values)[:page_size + 1])
+
+    for archive in archives.order_by('-mois'):
+        if len(candidates) > page_size:
+            candidates.sort(key=key, reverse=True)
+            if archive.dernier_changement < candidates[page_size]['changed_at']:
+                break
+        for row in read_archive(archive.fichier):
+            if avant is not None and key(row) >= avant:
+                continue
+            if matches(row):
+                candidates.append({field: row[field] for field in values})
+
+    candidates.sort(key=key, reverse=True)
+    page = candidates[:page_size]
+    suivant = key(page[-1]) if len(candidates) > page_size else None
+    return [PremiumPaymentAuditLog(**row) for row in page], suivant
+
+
+def archived_log(owner, pk):
+    """
+    Ligne d'audit archivée d'un propriétaire (instance non enregistrée), None si absente.
+    Seuls les fichiers dont la plage d'ids contient pk sont lus (tous pour les
+    archives antérieures au suivi des ids).
+    """
+    archives = PremiumPaymentAuditArchive.objects.filter(owner=owner).filter(
+        Q(premier_id__lte=pk, dernier_id__gte=pk) | Q(premier_id__isnull=True)
+    )
+    for archive in archives.order_by('-mois'):
+        for row in read_archive(archive.fichier):
+            if row['id'] == pk:
+                return PremiumPaymentAuditLog(**{field: row[field] for field in ARCHIVE_FIELDS})
+    return None
+
+
+@receiver(post_delete, sender=PremiumPaymentAuditArchive)
+def supprimer_fichier_archive(sender, instance, **kwargs):
+    transaction.on_commit(lambda: archive_storage().delete(instance.fichier))
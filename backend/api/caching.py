@@ -0,0 +1,315 @@
+"""
+Cache HTTP de l'API.
+
+1. Cache versionné des réponses publiques (GET anonymes).
+
+Chaque espace de noms possède un compteur de génération stocké dans le cache
+Django. Les clés de réponse incluent la génération courante : incrémenter le
+compteur (à la sauvegarde / suppression d'un Appartement ou d'une Photo)
+invalide d'un coup toutes les réponses mises en cache, sans les parcourir.
+
+Le backend est celui de settings.CACHES (locmem, fichier ou Redis). En
+production multi-processus, utiliser un backend partagé (Redis ou fichier)
+pour que l'invalidation soit vue par tous les workers.
+
+2. GET conditionnels (ETag / If-None-Match) pour les vues authentifiées.
+
+L'ETag est dérivé d'une empreinte agrégée (max des dates de modification et
+nombre de lignes) calculée en base, sans sérialiser la réponse. Si le client
+présente un ETag identique, la vue répond 304 sans exécuter le handler.
+"""
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Appartement, Photo, PremiumBien
+
+APPARTEMENTS_CACHE_NAMESPACE = 'appartements'
+
+# Compteurs modifiés hors formulaire : ils ne justifient pas une invalidation
+COMPTEURS_NON_INVALIDANTS = {'nb_vues', 'nb_favoris'}
+
+
+def _generation_key(namespace):
+    return f'api:generation:{namespace}'
+
+
+def _last_modified_key(namespace):
+    return f'api:last-modified:{namespace}'
+
+
+def get_generation(namespace):
+    """Retourne la génération courante (initialisée à l'horodatage en ms si absente)"""
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # Valeur initiale horodatée : après une éviction, on ne retombe pas
+        # sur une génération déjà utilisée par des entrées encore présentes.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_last_modified(namespace):
+    last_modified = cache.get(_last_modified_key(namespace))
+    if last_modified is None:
+        last_modified = int(time.time())
+        cache.add(_last_modified_key(namespace), last_modified, timeout=None)
+    return last_modified
+
+
+def bump_generation(namespace):
+    """Invalide toutes les réponses en cache de l'espace de noms"""
+    key = _generation_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+    cache.set(_last_modified_key(namespace), int(time.time()), timeout=None)
+
+
+def normalized_query(request):
+    """Query string aux paramètres triés (?a=1&b=2 == ?b=2&a=1)"""
+    return urlencode(sorted(
+        (param, value)
+        for param, values in request.query_params.lists()
+        for value in values
+    ))
+
+
+def anonymous_cache_key(request, namespace):
+    """
+    Clé de cache pour une requête GET anonyme rendue en JSON, None sinon.
+    La query string est normalisée (paramètres triés) pour que ?a=1&b=2 et
+    ?b=2&a=1 partagent la même entrée.
+    """
+    if request.user.is_authenticated:
+        return None
+    return public_cache_key(request, namespace)
+
+
+def public_cache_key(request, namespace):
+    """Comme anonymous_cache_key, pour les réponses identiques quel que soit l'utilisateur"""
+    if request.method != 'GET':
+        return None
+
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is None or renderer.format != 'json':
+        return None
+
+    raw_key = f'{request.get_host()}{request.path}?{normalized_query(request)}'
+    digest = hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+    return f'api:response:{namespace}:{get_generation(namespace)}:{digest}'
+
+
+def _conditional_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Vary'] = 'Accept, Authorization, Cookie'
+
+
+def cached_response(request, cache_key):
+    """Réponse (200 ou 304) construite depuis le cache, None si absente"""
+    entry = cache.get(cache_key)
+    if entry is None:
+        return None
+
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    _conditional_headers(response, entry['etag'], entry['last_modified'])
+    response['X-Cache'] = 'HIT'
+    return get_conditional_response(
+        request,
+        etag=entry['etag'],
+        last_modified=entry['last_modified'],
+        response=response,
+    )
+
+
+def store_response(cache_key, response, last_modified):
+    """
+    Met la réponse DRF en cache une fois rendue et y ajoute ETag / Last-Modified.
+    last_modified: datetime ou timestamp (secondes).
+    """
+    if hasattr(last_modified, 'timestamp'):
+        last_modified = int(last_modified.timestamp())
+
+    def _store(rendered):
+        if rendered.status_code != 200:
+            return
+        content = rendered.content
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        _conditional_headers(rendered, etag, last_modified)
+        rendered['X-Cache'] = 'MISS'
+        cache.set(cache_key, {
+            'content': content,
+            'content_type': rendered['Content-Type'],
+            'etag': etag,
+            'last_modified': last_modified,
+        }, timeout=getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300))
+
+    response.add_post_render_callback(_store)
+    return response
+
+
+@receiver(post_save, sender=Appartement)
+@receiver(post_save, sender=Photo)
+def invalider_cache_appartements_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= COMPTEURS_NON_INVALIDANTS:
+        return
+    bump_generation(APPARTEMENTS_CACHE_NAMESPACE)
+
+
+@receiver(post_delete, sender=Appartement)
+@receiver(post_delete, sender=Photo)
+def invalider_cache_appartements_delete(sender, instance, **kwargs):
+    bump_generation(APPARTEMENTS_CACHE_NAMESPACE)
+
+
+# Les coordonnées des annonces (recherche carte, regroupements) sont portées par le
+# bien : seul un changement de coordonnées d'un bien lié à une annonce invalide le cache
+
+@receiver(post_save, sender=PremiumBien)
+def invalider_cache_appartements_bien(sender, instance, created=False, update_fields=None, **kwargs):
+    # Bien créé : pas encore d'annonce liée (la liaison sauvegarde l'annonce)
+    if created:
+        return
+    if update_fields is not None and not {'latitude', 'longitude', 'cellule'} & set(update_fields):
+        return
+    chargees = getattr(instance, '_coordonnees_chargees', None)
+    coordonnees = instance.coordonnees()
+    instance._coordonnees_chargees = coordonnees
+    if chargees == coordonnees:
+        return
+    if instance.appartements.exists():
+        bump_generation(APPARTEMENTS_CACHE_NAMESPACE)
+
+
+@receiver(pre_delete, sender=PremiumBien)
+def noter_annonces_bien(sender, instance, **kwargs):
+    # Avant le SET_NULL des annonces liées
+    instance._annonces_liees = instance.cellule is not None and instance.appartements.exists()
+
+
+@receiver(post_delete, sender=PremiumBien)
+def invalider_cache_appartements_bien_delete(sender, instance, **kwargs):
+    if getattr(instance, '_annonces_liees', False):
+        bump_generation(APPARTEMENTS_CACHE_NAMESPACE)
+
+
+def aggregate_fingerprint(queryset, *timestamp_fields, counter_fields=()):
+    """
+    Empreinte bon marché d'un queryset : max de chaque champ date et nombre de lignes,
+    en une seule requête d'agrégation.
+
+    counter_fields : compteurs mis à jour sans toucher aux dates (nb_vues...), sommés
+    pondérés par la clé pour qu'un transfert d'une ligne à l'autre change l'empreinte.
+    """
+    aggregates = {
+        f'max_{index}': Max(field) for index, field in enumerate(timestamp_fields)
+    }
+    for index, field in enumerate(counter_fields):
+        aggregates[f'sum_{index}'] = Sum(F(field) * F('pk'))
+    aggregates['total'] = Count('pk', distinct=True)
+    values = queryset.order_by().aggregate(**aggregates)
+    return tuple(
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values.values()
+    )
+
+
+def compute_etag(view, request, fingerprint):
+    """ETag faible : vue, action, utilisateur, paramètres, format et empreinte"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = repr((
+        view.__class__.__name__,
+        getattr(view, 'action', None),
+        str(getattr(request.user, 'pk', None)),
+        request.path,
+        normalized_query(request),
+        getattr(renderer, 'media_type', None),
+        fingerprint,
+    ))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional_get(handler):
+    """
+    Décorateur de handler GET : répond 304 si If-None-Match correspond à l'ETag
+    calculé par view.get_conditional_fingerprint(request), sinon exécute le
+    handler et ajoute l'en-tête ETag à la réponse.
+    """
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return handler(view, request, *args, **kwargs)
+
+        etag = compute_etag(view, request, view.get_conditional_fingerprint(request))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            view.conditional_not_modified(request)
+            return not_modified
+
+        response = handler(view, request, *args, **kwargs)
+        if response.status_code == 200 and not response.has_header('ETag'):
+            response['ETag'] = etag
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    GET conditionnels pour les ViewSets (list / retrieve).
+
+    L'empreinte porte sur le queryset filtré (et restreint à l'objet pour retrieve) :
+    max de conditional_timestamp_fields, somme de conditional_counter_fields et
+    nombre de lignes.
+    """
+    conditional_timestamp_fields = ('updated_at',)
+    conditional_counter_fields = ()
+
+    def get_conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_conditional_fingerprint(self, request):
+        return aggregate_fingerprint(
+            self.get_conditional_queryset(), *self.conditional_timestamp_fields,
+            counter_fields=self.conditional_counter_fields,
+        )
+
+    def conditional_not_modified(self, request):
+        """Appelé quand la vue répond 304 (effets de bord à conserver)"""
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class ConditionalAPIViewMixin:
+    """
+    Pour les APIView : décorer get avec @conditional_get et définir
+    get_conditional_fingerprint(request), qui renvoie une valeur changeant avec
+    les données servies (par exemple via aggregate_fingerprint).
+    """
+
+    def conditional_not_modified(self, request):
+        """Appelé quand la vue répond 304"""
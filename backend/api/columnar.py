@@ -0,0 +1,176 @@
+"""
+Format colonnes pour les grandes listes (?format=columnar ou
+Accept: application/vnd.columnar+json) :
+
+    {"count": ..., "links": ..., "columns": ["id", "statut", ...], "rows": [[1, "PAYE", ...], ...]}
+
+Les lignes viennent directement de values_list() : ni instances de modèle ni
+sérialiseur par ligne. Les colonnes sont les champs du sérialiseur de liste
+(élagué par ?fields=) qui correspondent à une colonne ou à une annotation du
+queryset, ainsi que les colonnes déclarées dans l'attribut columnar_fields de
+la vue ({nom: chemin ou expression}) pour les champs calculés. Les autres champs
+calculés sont absents du format colonnes.
+
+Les valeurs gardent la représentation du format JSON : les Decimal, dates,
+dates-heures et durées passent par le champ du sérialiseur, les FileField sont
+rendus en URL absolue.
+
+En mode colonnes, la taille de page peut monter jusqu'à columnar_max_page_size.
+"""
+import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .renderers import ColumnarJSONRenderer
+
+# Champs dont la représentation JSON diffère de la valeur lue en base
+CHAMPS_CONVERTIS = (
+    serializers.DecimalField, serializers.DateTimeField, serializers.DateField,
+    serializers.TimeField, serializers.DurationField,
+)
+
+
+def representation(field):
+    """
+    to_representation du champ pour toute une colonne : format et fuseau des
+    dates résolus une fois (DRF les relit à chaque valeur)
+    """
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if not output_format or output_format.lower() == ISO_8601 or field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            return value.astimezone(field_timezone).strftime(output_format)
+        return convert
+
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format == '%Y-%m-%d' or (output_format and output_format.lower() == ISO_8601):
+            return datetime.date.isoformat
+        if output_format:
+            return lambda value: value.strftime(output_format)
+    return field.to_representation
+
+
+def model_column(model, attrs):
+    """Champ de modèle final du chemin attrs (relations 1-1 / n-1 seulement), None sinon"""
+    model_field = None
+    for index, attr in enumerate(attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if model_field.is_relation and index < len(attrs) - 1:
+            model = model_field.related_model
+        elif index < len(attrs) - 1:
+            return None
+    return model_field
+
+
+class ColumnarListMixin:
+    """
+    À placer avant le ViewSet de base (après ConditionalGetMixin) : ajoute le
+    rendu colonnes à l'action list.
+    """
+    columnar_fields = {}
+    columnar_max_page_size = 10000
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if getattr(self, 'action', None) == 'list':
+            renderers.append(ColumnarJSONRenderer())
+        return renderers
+
+    def is_columnar(self, request):
+        return getattr(getattr(request, 'accepted_renderer', None), 'format', None) == ColumnarJSONRenderer.format
+
+    def file_url(self, field):
+        storage = field.storage
+        request = self.request
+
+        def convert(name):
+            return request.build_absolute_uri(storage.url(name)) if name else None
+        return convert
+
+    def get_columns(self, queryset):
+        """[(nom, chemin ou expression, conversion ou None)] dans l'ordre du sérialiseur"""
+        serializer = self.get_serializer()
+        model = queryset.model
+        columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in self.columnar_fields:
+                source = self.columnar_fields[name]
+                model_field = model_column(model, source.split('__')) if isinstance(source, str) else None
+                if isinstance(model_field, models.FileField):
+                    columns.append((name, source, self.file_url(model_field)))
+                else:
+                    columns.append((name, source, None))
+                continue
+            if field.source == '*' or isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+                continue
+
+            path = '__'.join(field.source_attrs)
+            model_field = model_column(model, field.source_attrs)
+            if model_field is None and path not in queryset.query.annotations:
+                continue
+            if isinstance(model_field, models.FileField):
+                convert = self.file_url(model_field)
+            elif isinstance(field, CHAMPS_CONVERTIS):
+                convert = representation(field)
+            else:
+                convert = None
+            columns.append((name, path, convert))
+        return columns
+
+    def columnar_rows(self, values, columns):
+        conversions = [(index, convert) for index, (_, _, convert) in enumerate(columns) if convert is not None]
+        if not conversions:
+            return [list(row) for row in values]
+        rows = []
+        for row in values:
+            row = list(row)
+            for index, convert in conversions:
+                if row[index] is not None:
+                    row[index] = convert(row[index])
+            rows.append(row)
+        return rows
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_columnar(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = self.get_columns(queryset)
+        expressions = {name: source for name, source, _ in columns if not isinstance(source, str)}
+        if expressions:
+            queryset = queryset.annotate(**{f'colonne_{name}': expression for name, expression in expressions.items()})
+        paths = [f'colonne_{name}' if name in expressions else source for name, source, _ in columns]
+        values = queryset.values_list(*paths)
+
+        paginator = self.paginator
+        if paginator is not None:
+            paginator.max_page_size = max(getattr(paginator, 'max_page_size', None) or 0, self.columnar_max_page_size)
+        page = self.paginate_queryset(values)
+        data = {
+            'columns': [name for name, _, _ in columns],
+            'rows': self.columnar_rows(values if page is None else page, columns),
+        }
+        if page is None:
+            return Response(data)
+
+        response = self.get_paginated_response([])
+        response.data.pop('results', None)
+        response.data.update(data)
+        return response
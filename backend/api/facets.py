@@ -0,0 +1,139 @@
+"""
+Facettes des listes filtrées (?facets=).
+
+Pour chaque champ de facette, le nombre de résultats par valeur est calculé
+sur le queryset filtré de la liste, sans le filtre de la facette elle-même :
+le client peut afficher "Paris (12), Lyon (4)" même quand ville=Paris est
+sélectionné. Une requête GROUP BY par facette, plus une seule requête
+d'agrégats conditionnels pour tous les histogrammes.
+
+Le résultat ne dépend que des filtres (pas de la page, du tri ni de
+l'utilisateur) : il est mis en cache par combinaison de filtres, avec la
+génération de l'espace de noms de la vue pour l'invalidation.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+
+from .caching import get_generation
+
+# Paramètres sans effet sur les facettes
+PARAMETRES_HORS_FILTRE = {'page', 'page_size', 'ordering', 'format', 'facets'}
+
+
+def histogram_buckets(edges):
+    """Bornes [a, b[ successives, la dernière ouverte"""
+    return list(zip(edges, [*edges[1:], None]))
+
+
+class FacetedListMixin:
+    """
+    À placer avant le ViewSet de base : ajoute 'facets' à la réponse paginée de list
+    quand ?facets=1 (toutes) ou ?facets=ville,loyer_mensuel (sélection).
+
+    facet_fields: champs comptés par valeur (filtres de filterset_fields)
+    facet_histograms: {champ: bornes croissantes des tranches}
+    facet_cache_namespace: espace de noms de génération (None : pas de cache)
+    """
+    facet_fields = ()
+    facet_histograms = {}
+    facet_limit = 50
+    facet_cache_namespace = None
+
+    def get_requested_facets(self, request):
+        value = request.query_params.get('facets', '')
+        if value.lower() in ('', '0', 'false'):
+            return None
+        available = [*self.facet_fields, *self.facet_histograms]
+        if value.lower() in ('1', 'true'):
+            return available
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({
+                'error': f"Facette(s) inconnue(s): {', '.join(unknown)}. Disponibles: {', '.join(available)}"
+            })
+        return requested
+
+    def facet_queryset(self, request, exclude=None):
+        """Queryset de la liste filtré comme list, sans le filtre du champ exclude"""
+        queryset = self.get_queryset()
+        for backend_class in self.filter_backends:
+            if issubclass(backend_class, OrderingFilter):
+                continue
+            backend = backend_class()
+            if issubclass(backend_class, DjangoFilterBackend):
+                data = request.query_params.copy()
+                data.pop(exclude, None)
+                filterset_class = backend.get_filterset_class(self, queryset)
+                if filterset_class is None:
+                    continue
+                filterset = filterset_class(data=data, queryset=queryset, request=request)
+                if not filterset.is_valid():
+                    raise ValidationError({'error': dict(filterset.errors)})
+                queryset = filterset.qs
+            else:
+                queryset = backend.filter_queryset(request, queryset, self)
+        return queryset.order_by()
+
+    def compute_facets(self, request, names):
+        facets = {}
+        for field in (name for name in names if name in self.facet_fields):
+            rows = (
+                self.facet_queryset(request, exclude=field)
+                .values(field)
+                .annotate(nombre=Count('pk'))
+                .order_by('-nombre', field)[:self.facet_limit]
+            )
+            facets[field] = [{'valeur': row[field], 'nombre': row['nombre']} for row in rows]
+
+        histograms = [name for name in names if name in self.facet_histograms]
+        if histograms:
+            aggregates = {}
+            for field in histograms:
+                for index, (low, high) in enumerate(histogram_buckets(self.facet_histograms[field])):
+                    condition = Q(**{f'{field}__gte': low})
+                    if high is not None:
+                        condition &= Q(**{f'{field}__lt': high})
+                    aggregates[f'{field}__{index}'] = Count('pk', filter=condition)
+            counts = self.facet_queryset(request).aggregate(**aggregates)
+            for field in histograms:
+                facets[field] = [
+                    {'min': low, 'max': high, 'nombre': counts[f'{field}__{index}']}
+                    for index, (low, high) in enumerate(histogram_buckets(self.facet_histograms[field]))
+                ]
+        return facets
+
+    def facets_cache_key(self, request, names):
+        params = sorted(
+            (param, value)
+            for param, values in request.query_params.lists()
+            if param not in PARAMETRES_HORS_FILTRE
+            for value in values
+        )
+        raw = repr((self.__class__.__name__, sorted(names), params))
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f'api:facets:{self.facet_cache_namespace}:{get_generation(self.facet_cache_namespace)}:{digest}'
+
+    def get_facets(self, request, names):
+        if self.facet_cache_namespace is None:
+            return self.compute_facets(request, names)
+
+        cache_key = self.facets_cache_key(request, names)
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = self.compute_facets(request, names)
+            cache.set(cache_key, facets, timeout=getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300))
+        return facets
+
+    def list(self, request, *args, **kwargs):
+        names = self.get_requested_facets(request)
+        response = super().list(request, *args, **kwargs)
+        if names and response.status_code == 200 and isinstance(response.data, dict):
+            response.data['facets'] = self.get_facets(request, names)
+        return response
@@ -0,0 +1,205 @@
+"""
+Champs à la demande (sparse fieldsets) pour les listes et détails de l'API.
+
+    ?fields=id,titre,appartement.titre   champs à renvoyer (notation pointée pour les objets imbriqués)
+    ?expand=appartement                  objets imbriqués à renvoyer en entier
+
+Sans ?fields=, la réponse est inchangée. Avec ?fields=, un objet imbriqué
+cité sans sous-champ ni ?expand= est réduit à sa clé primaire.
+
+L'arbre de champs retenu pilote aussi le queryset : only() sur les colonnes
+lues, select_related / prefetch_related limités aux relations encore
+présentes, si bien que les jointures et colonnes non demandées ne sont jamais
+lues. Les champs calculés (SerializerMethodField, source='*') déclarent les
+attributs qu'ils lisent dans l'attribut field_sources du sérialiseur ; à
+défaut, toutes les colonnes du modèle sont chargées.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_tree(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in str(value).split(','):
+        node = tree
+        for name in (part.strip() for part in path.split('.')):
+            if not name:
+                break
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _nested(field):
+    """Sérialiseur imbriqué porté par le champ (many ou non), None sinon"""
+    child = field.child if isinstance(field, serializers.ListSerializer) else field
+    return child if isinstance(child, serializers.BaseSerializer) else None
+
+
+def prune_serializer(serializer, fields, expand, path=''):
+    """Retire les champs non demandés ; retourne la liste des champs inconnus"""
+    unknown = []
+    for name in expand:
+        fields.setdefault(name, {})
+    for name in list(serializer.fields):
+        if name not in fields:
+            serializer.fields.pop(name)
+
+    for name, subfields in fields.items():
+        field = serializer.fields.get(name)
+        if field is None:
+            unknown.append(path + name)
+            continue
+        nested = _nested(field)
+        if nested is None:
+            if subfields:
+                unknown.extend(f'{path}{name}.{sub}' for sub in subfields)
+            continue
+        if subfields or name in expand:
+            if subfields:
+                unknown += prune_serializer(nested, subfields, expand.get(name, {}), f'{path}{name}.')
+        else:
+            # Objet imbriqué non déplié : clé primaire seulement
+            options = {'source': field.source} if field.source != name else {}
+            serializer.fields[name] = serializers.PrimaryKeyRelatedField(
+                many=isinstance(field, serializers.ListSerializer), read_only=True, **options
+            )
+    return unknown
+
+
+class QueryShape:
+    """Colonnes, jointures et préchargements nécessaires à un sérialiseur élagué"""
+
+    def __init__(self):
+        self.columns = {'pk'}
+        self.select_related = set()
+        self.prefetches = []
+        self.exact = True
+
+    def add_source(self, model, attrs, prefix=''):
+        """Chemin d'attributs ('proprietaire', 'telephone') depuis model"""
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Propriété ou méthode du modèle : colonnes lues inconnues
+                self.exact = False
+                return
+            last = index == len(attrs) - 1
+            if model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+                self.columns.add(prefix + attr)
+                if last:
+                    return
+                self.select_related.add(prefix + attr)
+                model, prefix = model_field.related_model, f'{prefix}{attr}__'
+            elif model_field.is_relation:
+                # Relation inverse / multiple citée directement : chargée entièrement
+                self.exact = self.exact and last
+                return
+            else:
+                self.columns.add(prefix + attr)
+                return
+
+    def add_serializer(self, serializer, model, prefix=''):
+        declared = getattr(serializer, 'field_sources', {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in declared:
+                for source in declared[name]:
+                    self.add_source(model, source.split('.'), prefix)
+                continue
+
+            nested = _nested(field)
+            many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+            if field.source == '*':
+                self.exact = False
+            elif many:
+                self.add_prefetch(model, field.source, nested, prefix)
+            elif nested is not None:
+                self.add_source(model, field.source_attrs, prefix)
+                relation = self._relation(model, field.source_attrs)
+                if relation is None:
+                    continue
+                self.select_related.add(prefix + '__'.join(field.source_attrs))
+                self.add_serializer(nested, relation.related_model, prefix + '__'.join(field.source_attrs) + '__')
+            else:
+                self.add_source(model, field.source_attrs, prefix)
+
+    @staticmethod
+    def _relation(model, attrs):
+        try:
+            for attr in attrs[:-1]:
+                model = model._meta.get_field(attr).related_model
+            return model._meta.get_field(attrs[-1])
+        except (FieldDoesNotExist, AttributeError):
+            return None
+
+    def add_prefetch(self, model, source, nested, prefix):
+        relation = self._relation(model, source.split('.'))
+        if relation is None or '.' in source:
+            self.exact = False
+            return
+        # Relation inverse : la clé vers le parent sert à répartir les lignes préchargées
+        parent_key = (relation.field.name,) if relation.one_to_many else ()
+        queryset = relation.related_model._default_manager.all()
+        if nested is not None:
+            queryset = shape_queryset(queryset, nested, parent_key)
+        else:
+            queryset = queryset.only(*parent_key) if parent_key else queryset
+        self.prefetches.append(Prefetch(prefix + source, queryset=queryset))
+
+
+def shape_queryset(queryset, serializer, required_columns=()):
+    """Applique only / select_related / prefetch_related correspondant au sérialiseur"""
+    shape = QueryShape()
+    shape.columns.update(required_columns)
+    shape.add_serializer(serializer, queryset.model)
+    if shape.exact:
+        # Seul le sérialiseur lit ces objets : les jointures de base inutiles sont retirées
+        queryset = queryset.select_related(None).prefetch_related(None).only(*shape.columns)
+    if shape.select_related:
+        queryset = queryset.select_related(*shape.select_related)
+    if shape.prefetches:
+        queryset = queryset.prefetch_related(*shape.prefetches)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields= / ?expand= pour list et retrieve : élague le sérialiseur et ajuste
+    le queryset (dans filter_queryset, après les annotations des filtres).
+    """
+    sparse_fieldset_actions = ('list', 'retrieve')
+
+    def get_sparse_fieldset(self):
+        request = self.request
+        if (
+            request is None or request.method not in SAFE_METHODS
+            or getattr(self, 'action', None) not in self.sparse_fieldset_actions
+            or not request.query_params.get('fields')
+        ):
+            return None
+        return (
+            parse_field_tree(request.query_params.get('fields', '')),
+            parse_field_tree(request.query_params.get('expand', '')),
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_sparse_fieldset()
+        if fieldset is not None:
+            root = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+            unknown = prune_serializer(root, *fieldset)
+            if unknown:
+                raise ValidationError({'error': f"Champ(s) inconnu(s): {', '.join(unknown)}"})
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_sparse_fieldset() is None:
+            return queryset
+        return shape_queryset(queryset, self.get_serializer())
@@ -0,0 +1,231 @@
+"""
+Recherche géographique sur les coordonnées des biens Premium (latitude / longitude).
+
+Deux filtres pour les vues carte :
+- bbox=min_lng,min_lat,max_lng,max_lat : rectangle, en prédicats d'intervalle
+  servis par l'index (latitude, longitude) de PremiumBien ;
+- latitude=&longitude=&rayon_km= : cercle, préfiltré par son rectangle englobant
+  puis affiné par la distance de haversine, calculée en SQL sur les seules
+  lignes du rectangle. Les résultats sont annotés de distance_km et triés du
+  plus proche au plus loin, ou selon ?ordering= (qui accepte alors distance_km).
+
+Les annonces publiques (Appartement) n'ont pas de coordonnées : elles sont
+filtrées via leur bien Premium lié (geo_field_prefix = 'bien__').
+
+Regroupement carte : chaque bien stocke sa cellule (voir api/geo_utils.py),
+regroupée ici par préfixe pour chaque niveau de zoom.
+"""
+import math
+
+from django.db.models import Avg, Count, F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .geo_utils import CELLULE_ZOOM, demorton
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+MAX_RAYON_KM = 500
+
+# Chaque tuile affichée est découpée en 2^3 x 2^3 cellules de regroupement
+GRILLE_SUBDIVISION = 3
+
+
+def _coordinate(value, name, limit):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} invalide")
+    if not -limit <= number <= limit:
+        raise ValueError(f"{name} hors limites (±{limit})")
+    return number
+
+
+def parse_bbox(value):
+    """'min_lng,min_lat,max_lng,max_lat' -> tuple de floats (ValueError si invalide)"""
+    parts = str(value).split(',')
+    if len(parts) != 4:
+        raise ValueError("bbox invalide, format attendu: min_lng,min_lat,max_lng,max_lat")
+    min_lng = _coordinate(parts[0], 'Longitude', 180)
+    min_lat = _coordinate(parts[1], 'Latitude', 90)
+    max_lng = _coordinate(parts[2], 'Longitude', 180)
+    max_lat = _coordinate(parts[3], 'Latitude', 90)
+    if min_lat > max_lat:
+        raise ValueError("bbox invalide: min_lat doit être inférieure à max_lat")
+    # min_lng > max_lng : rectangle à cheval sur l'antiméridien
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def parse_circle(latitude, longitude, rayon_km):
+    """Centre et rayon -> (lat, lng, rayon) (ValueError si invalide)"""
+    lat = _coordinate(latitude, 'Latitude', 90)
+    lng = _coordinate(longitude, 'Longitude', 180)
+    try:
+        rayon = float(rayon_km)
+    except (TypeError, ValueError):
+        raise ValueError("rayon_km invalide")
+    if not 0 < rayon <= MAX_RAYON_KM:
+        raise ValueError(f"rayon_km doit être compris entre 0 et {MAX_RAYON_KM}")
+    return lat, lng, rayon
+
+
+def bounding_box(lat, lng, rayon_km):
+    """Rectangle englobant le cercle (toutes longitudes si le cercle atteint un pôle)"""
+    delta_lat = rayon_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return -180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0)
+
+    # Largeur au parallèle le plus éloigné de l'équateur du rectangle
+    delta_lng = delta_lat / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if delta_lng >= 180:
+        return -180.0, min_lat, 180.0, max_lat
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_q(bbox, prefix=''):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    condition = Q(**{f'{prefix}latitude__range': (min_lat, max_lat)})
+    if min_lng <= max_lng:
+        return condition & Q(**{f'{prefix}longitude__range': (min_lng, max_lng)})
+    return condition & (Q(**{f'{prefix}longitude__gte': min_lng}) | Q(**{f'{prefix}longitude__lte': max_lng}))
+
+
+def haversine_km(lat, lng, prefix=''):
+    """Expression SQL : distance de haversine (km) entre (lat, lng) et les coordonnées de la ligne"""
+    row_lat = Radians(Cast(F(f'{prefix}latitude'), FloatField()))
+    row_lng = Radians(Cast(F(f'{prefix}longitude'), FloatField()))
+    lat0, lng0 = math.radians(lat), math.radians(lng)
+    a = (
+        Power(Sin((row_lat - lat0) / 2), 2)
+        + math.cos(lat0) * Cos(row_lat) * Power(Sin((row_lng - lng0) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def parse_tile(value):
+    """'z/x/y' -> (z, x, y) (ValueError si invalide)"""
+    try:
+        zoom, x, y = (int(part) for part in str(value).split('/'))
+    except (TypeError, ValueError):
+        raise ValueError("Tuile invalide, format attendu: z/x/y")
+    if not 0 <= zoom <= CELLULE_ZOOM or not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+        raise ValueError("Tuile hors limites")
+    return zoom, x, y
+
+
+def filter_geo(queryset, bbox=None, circle=None, prefix=''):
+    """Applique le rectangle et/ou le cercle ; le cercle annote distance_km"""
+    if bbox is not None:
+        queryset = queryset.filter(bbox_q(bbox, prefix))
+    if circle is not None:
+        lat, lng, rayon = circle
+        queryset = queryset.filter(bbox_q(bounding_box(lat, lng, rayon), prefix)).annotate(
+            distance_km=haversine_km(lat, lng, prefix)
+        ).filter(distance_km__lte=rayon)
+    return queryset
+
+
+def cluster_cells(queryset, zoom, prefix='', **aggregates):
+    """
+    Regroupe les lignes par cellule de carte au zoom d'affichage, en un seul GROUP BY
+    sur le préfixe de la colonne cellule. Chaque cellule : identifiant 'z/x/y',
+    nombre de lignes, centroïde et les agrégats supplémentaires demandés.
+    """
+    precision = min(zoom + GRILLE_SUBDIVISION, CELLULE_ZOOM)
+    shift = 2 * (CELLULE_ZOOM - precision)
+    rows = (
+        queryset.filter(**{f'{prefix}cellule__isnull': False})
+        .annotate(maille=F(f'{prefix}cellule').bitrightshift(shift))
+        .order_by()
+        .values('maille')
+        .annotate(
+            nombre=Count('pk'),
+            centre_lat=Avg(Cast(F(f'{prefix}latitude'), FloatField())),
+            centre_lng=Avg(Cast(F(f'{prefix}longitude'), FloatField())),
+            **aggregates,
+        )
+        .order_by('maille')
+    )
+
+    cells = []
+    for row in rows:
+        x, y = demorton(row.pop('maille'))
+        cells.append({
+            'cellule': f'{precision}/{x}/{y}',
+            'nombre': row.pop('nombre'),
+            'latitude': round(row.pop('centre_lat'), 6),
+            'longitude': round(row.pop('centre_lng'), 6),
+            **row,
+        })
+    return cells
+
+
+class GeoFilterBackend(BaseFilterBackend):
+    """
+    Filtres ?bbox= et ?latitude=&longitude=&rayon_km= pour les vues de liste.
+    La vue indique le chemin des coordonnées par geo_field_prefix ('' ou 'bien__').
+    À placer après OrderingFilter : avec un rayon, le tri par distance remplace le
+    tri par défaut, et ?ordering= peut citer distance_km (annotation absente des
+    ordering_fields de la vue, ignorée par OrderingFilter).
+    """
+    distance_field = 'distance_km'
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        prefix = getattr(view, 'geo_field_prefix', '')
+        circle_params = [params.get(name) for name in ('latitude', 'longitude', 'rayon_km')]
+
+        try:
+            bbox = parse_bbox(params['bbox']) if params.get('bbox') else None
+            circle = None
+            if any(circle_params):
+                if not all(circle_params):
+                    raise ValueError("latitude, longitude et rayon_km sont requis ensemble")
+                circle = parse_circle(*circle_params)
+        except ValueError as exc:
+            raise ValidationError({'error': str(exc)})
+
+        if bbox is None and circle is None:
+            return queryset
+
+        queryset = filter_geo(queryset, bbox=bbox, circle=circle, prefix=prefix)
+        if circle is not None:
+            ordering = self.get_ordering(request, queryset, view)
+            if ordering is not None:
+                queryset = queryset.order_by(*ordering, 'pk')
+        return queryset
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Tri à appliquer une fois distance_km annotée : par distance sans ?ordering=,
+        les termes valides de ?ordering= s'il cite distance_km, None sinon (tri
+        d'OrderingFilter conservé).
+        """
+        ordering_filter = OrderingFilter()
+        param = request.query_params.get(ordering_filter.ordering_param)
+        if not param:
+            return [self.distance_field]
+        terms = [term.strip() for term in param.split(',') if term.strip()]
+        if not any(term.lstrip('-') == self.distance_field for term in terms):
+            return None
+        valides = set(ordering_filter.remove_invalid_fields(queryset, terms, view, request))
+        return [term for term in terms if term.lstrip('-') == self.distance_field or term in valides]
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            ('bbox', 'string', 'Rectangle min_lng,min_lat,max_lng,max_lat'),
+            ('latitude', 'number', 'Centre de la recherche par rayon'),
+            ('longitude', 'number', 'Centre de la recherche par rayon'),
+            ('rayon_km', 'number', f'Rayon en km (max {MAX_RAYON_KM}), résultats triés par distance'),
+        ]
+        return [
+            {'name': name, 'required': False, 'in': 'query', 'description': description, 'schema': {'type': kind}}
+            for name, kind, description in parameters
+        ]
@@ -0,0 +1,61 @@
+"""
+Cellules carte, sans dépendance à Django ni à DRF (importé par api.models).
+
+Chaque bien stocke sa cellule : tuile Web Mercator au zoom CELLULE_ZOOM,
+coordonnées x / y entrelacées en code de Morton. La cellule d'un zoom
+inférieur z est le préfixe cellule >> 2 * (CELLULE_ZOOM - z) : une seule
+colonne indexée sert tous les niveaux de zoom, et les cellules d'une tuile
+forment un intervalle contigu.
+"""
+import math
+
+CELLULE_ZOOM = 24
+MERCATOR_MAX_LAT = 85.05112878
+
+
+def tile_xy(lat, lng, zoom):
+    """Tuile Web Mercator (x, y) contenant le point au zoom donné"""
+    n = 1 << zoom
+    lat = max(min(float(lat), MERCATOR_MAX_LAT), -MERCATOR_MAX_LAT)
+    x = int((float(lng) + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bbox(zoom, x, y):
+    """Rectangle (min_lng, min_lat, max_lng, max_lat) d'une tuile"""
+    n = 1 << zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def morton(x, y):
+    code = 0
+    for bit in range(CELLULE_ZOOM):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def demorton(code):
+    x = y = 0
+    for bit in range(CELLULE_ZOOM):
+        x |= ((code >> (2 * bit)) & 1) << bit
+        y |= ((code >> (2 * bit + 1)) & 1) << bit
+    return x, y
+
+
+def cellule_carte(lat, lng):
+    """Cellule d'un point au zoom CELLULE_ZOOM (None sans coordonnées)"""
+    if lat is None or lng is None:
+        return None
+    return morton(*tile_xy(lat, lng, CELLULE_ZOOM))
+
+
+def tile_cellules(zoom, x, y):
+    """Intervalle [début, fin] des cellules contenues dans une tuile"""
+    shift = 2 * (CELLULE_ZOOM - zoom)
+    start = morton(x, y) << shift
+    return start, start + (1 << shift) - 1
@@ -0,0 +1,37 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.audit_archive import archive_audit_logs
+
+
+class Command(BaseCommand):
+    help = "Archive l'audit des paiements Premium plus ancien que N mois dans des fichiers JSONL gzip mensuels"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois-conserves', type=int, default=None, help="Mois gardés en base (défaut: AUDIT_HOT_MONTHS)")
+        parser.add_argument('--owner', default=None, help="Email du propriétaire (défaut: tous)")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Compte sans rien archiver")
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            owner = get_user_model().objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Propriétaire introuvable: {options['owner']}")
+
+        debut = time.perf_counter()
+        report = archive_audit_logs(
+            mois_conserves=options['mois_conserves'],
+            owner=owner,
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+        )
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivage audit avant {report['avant']}{' (dry-run)' if options['dry_run'] else ''}: "
+            f"{report['lignes_archivees']} lignes, {report['mois_archives']} mois en {duree:.2f}s"
+        ))
@@ -0,0 +1,143 @@
+import re
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.generics import GenericAPIView
+from rest_framework.mixins import ListModelMixin
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# SQLite : "SCAN table" sans index (les "SEARCH ... USING INDEX" et "SCAN ... USING INDEX" sont indexés)
+SQLITE_SEQ_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)')
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+# Tri hors index (signalé sans faire échouer la commande)
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+POSTGRES_SORT = re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE)
+
+
+def iter_patterns(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield prefix + str(pattern.pattern), pattern
+
+
+def route_to_path(route):
+    return '/' + route.replace('^', '').replace('$', '').replace('\\', '')
+
+
+def sequential_scans(plan):
+    regex = POSTGRES_SEQ_SCAN if connection.vendor == 'postgresql' else SQLITE_SEQ_SCAN
+    return sorted(set(regex.findall(plan)))
+
+
+def uses_sort(plan):
+    regex = POSTGRES_SORT if connection.vendor == 'postgresql' else SQLITE_SORT
+    return bool(regex.search(plan))
+
+
+def list_endpoints(prefix=''):
+    """(chemin, vue) de chaque endpoint de liste DRF sans paramètre d'URL"""
+    vues = {}
+    for route, pattern in iter_patterns(get_resolver().url_patterns):
+        path = route_to_path(route)
+        view_class = getattr(pattern.callback, 'cls', None)
+        if view_class is None or not issubclass(view_class, GenericAPIView):
+            continue
+        if '<' in route or '(?P' in route or not path.startswith('/' + prefix.lstrip('/')):
+            continue
+
+        actions = getattr(pattern.callback, 'actions', None)
+        if actions is not None:
+            if actions.get('get') != 'list':
+                continue
+        elif not issubclass(view_class, ListModelMixin):
+            continue
+        vues.setdefault(path, (pattern.callback, actions))
+    return sorted(vues.items())
+
+
+def list_queryset(callback, actions, path, query, user):
+    """Queryset de la page que la vue servirait pour GET path?query"""
+    request = APIRequestFactory().get(path + (f'?{query}' if query else ''))
+    force_authenticate(request, user=user)
+
+    view = callback.cls(**getattr(callback, 'initkwargs', {}))
+    view.args, view.kwargs, view.format_kwarg = (), {}, None
+    if actions is not None:
+        view.action_map = actions
+    view.request = view.initialize_request(request)
+
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    page_size = paginator.get_page_size(view.request) if paginator is not None else None
+    return queryset[:page_size] if page_size else queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute EXPLAIN sur le queryset de chaque endpoint de liste (page 1) et signale "
+        "les parcours séquentiels. Sur PostgreSQL, enable_seqscan est désactivé pour vérifier "
+        "qu'un index est utilisable même sur des tables presque vides."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='api/', help="Préfixe des chemins analysés (ex: api/premium/)")
+        parser.add_argument(
+            '--query', action='append', default=None,
+            help="Query string à tester en plus de la liste simple (répétable, défaut: bien_id=1)",
+        )
+        parser.add_argument('--fail', action='store_true', help="Erreur si un parcours séquentiel est détecté")
+
+    def handle(self, *args, **options):
+        queries = [''] + (options['query'] if options['query'] is not None else ['bien_id=1'])
+        endpoints = list_endpoints(options['prefix'])
+        if not endpoints:
+            raise CommandError(f"Aucun endpoint de liste sous /{options['prefix']}")
+
+        regressions = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            # Utilisateur temporaire (annulé en fin de commande) pour les querysets filtrés par owner
+            user = get_user_model().objects.create_user(
+                email=f'explain.{uuid.uuid4().hex[:8]}@example.com',
+                username=f'explain_{uuid.uuid4().hex[:8]}',
+                password=None,
+                plan='premium',
+                is_admin=True,
+            )
+
+            for path, (callback, actions) in endpoints:
+                plans = {}
+                for query in queries:
+                    queryset = list_queryset(callback, actions, path, query, user)
+                    sql = str(queryset.query)
+                    if sql not in plans:
+                        plans[sql] = (query, queryset.explain())
+
+                for query, plan in plans.values():
+                    label = path + (f'?{query}' if query else '')
+                    scans = sequential_scans(plan)
+                    if scans:
+                        regressions.append(label)
+                        self.stdout.write(self.style.ERROR(f"SEQ SCAN {label}: {', '.join(scans)}"))
+                    elif uses_sort(plan):
+                        self.stdout.write(self.style.WARNING(f"TRI      {label}"))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f"OK       {label}"))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(plan)
+
+            transaction.set_rollback(True)
+
+        if regressions and options['fail']:
+            raise CommandError(f"{len(regressions)} requête(s) avec parcours séquentiel")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(endpoints)} endpoint(s) analysé(s), {len(regressions)} parcours séquentiel(s)"
+        ))
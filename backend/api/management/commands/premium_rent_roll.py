@@ -0,0 +1,45 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.premium_services import parse_month, generate_rent_roll
+
+
+class Command(BaseCommand):
+    help = "Génère les paiements IMPAYE du mois (loyer + charges révisés) pour tous les baux Premium actifs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois', default=None, help="Mois au format YYYY-MM (défaut: mois courant)")
+        parser.add_argument('--owner', default=None, help="Email du propriétaire (défaut: tous)")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Calcule sans rien écrire")
+
+    def handle(self, *args, **options):
+        try:
+            month_start = parse_month(options['mois'] or timezone.now().strftime('%Y-%m'))
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        owner = None
+        if options['owner']:
+            owner = get_user_model().objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Propriétaire introuvable: {options['owner']}")
+
+        debut = time.perf_counter()
+        report = generate_rent_roll(
+            month_start,
+            owner=owner,
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+        )
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rent-roll {report['mois']}{' (dry-run)' if options['dry_run'] else ''}: "
+            f"{report['crees']} paiements créés, {report['deja_presents']} déjà présents "
+            f"sur {report['baux_actifs']} baux actifs, total {report['montant_total']} "
+            f"en {duree:.2f}s"
+        ))
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.premium_services import purge_departed_locataires
+
+
+class Command(BaseCommand):
+    help = "Purge RGPD par lots des locataires Premium partis depuis plus que la durée de rétention"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-jours', type=int, default=None, help="Défaut: RGPD_RETENTION_DAYS")
+        parser.add_argument('--owner', default=None, help="Email du propriétaire (défaut: tous)")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Compte sans rien purger")
+
+    def handle(self, *args, **options):
+        if options['retention_jours'] is not None and options['retention_jours'] < 0:
+            raise CommandError("La rétention doit être positive")
+
+        owner = None
+        if options['owner']:
+            owner = get_user_model().objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Propriétaire introuvable: {options['owner']}")
+
+        rapport = purge_departed_locataires(
+            retention_jours=options['retention_jours'],
+            owner=owner,
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Purge RGPD #{rapport.id}{' (dry-run)' if rapport.dry_run else ''}: "
+            f"{rapport.nb_locataires} locataires partis au plus tard le {rapport.date_limite}, "
+            f"{len(rapport.par_proprietaire)} propriétaires, en {rapport.duree_secondes:.2f}s"
+        ))
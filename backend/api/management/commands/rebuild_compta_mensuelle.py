@@ -0,0 +1,28 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import PremiumComptaMensuelle
+
+
+class Command(BaseCommand):
+    help = "Recalcule les cumuls mensuels de comptabilité Premium depuis les écritures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default=None, help="Email du propriétaire (défaut: tous)")
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            owner = get_user_model().objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Propriétaire introuvable: {options['owner']}")
+
+        debut = time.perf_counter()
+        total = PremiumComptaMensuelle.objects.reconstruire(owner=owner)
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Cumuls mensuels reconstruits: {total} lignes en {duree:.2f}s"
+        ))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.audit_archive import restore_audit_archives
+from api.premium_services import parse_month
+
+
+class Command(BaseCommand):
+    help = "Réinsère en base l'audit des paiements Premium archivé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default=None, help="Email du propriétaire (défaut: tous)")
+        parser.add_argument('--mois', default=None, help="Mois archivé au format YYYY-MM (défaut: tous)")
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            owner = get_user_model().objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Propriétaire introuvable: {options['owner']}")
+
+        mois = None
+        if options['mois']:
+            try:
+                mois = parse_month(options['mois'])
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        report = restore_audit_archives(owner=owner, mois=mois)
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['lignes_restaurees']} lignes restaurées depuis {report['archives_restaurees']} archives"
+        ))
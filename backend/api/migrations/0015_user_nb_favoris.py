@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_favoris_counters(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    Appartement = apps.get_model('api', 'Appartement')
+    Favori = apps.get_model('api', 'Favori')
+
+    par_locataire = Favori.objects.filter(
+        locataire=OuterRef('pk')
+    ).order_by().values('locataire').annotate(total=Count('id')).values('total')
+    User.objects.update(nb_favoris=Coalesce(Subquery(par_locataire), Value(0)))
+
+    par_appartement = Favori.objects.filter(
+        appartement=OuterRef('pk')
+    ).order_by().values('appartement').annotate(total=Count('id')).values('total')
+    Appartement.objects.update(nb_favoris=Coalesce(Subquery(par_appartement), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_rename_api_emaillo_email_6f5a9e_idx_api_emaillo_email_82205b_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='nb_favoris',
+            field=models.IntegerField(default=0, verbose_name='Nombre de favoris'),
+        ),
+        migrations.RunPython(backfill_favoris_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_user_nb_favoris'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, verbose_name='Dernière modification'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, verbose_name='Dernière modification'),
+        ),
+        migrations.AddField(
+            model_name='premiumappartementtype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_conditional_get_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiumcomptableecriture',
+            index=models.Index(fields=['owner', 'date_operation', 'created_at'], name='api_premium_owner_i_0755aa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumcomptableecriture',
+            index=models.Index(fields=['owner', 'bien', 'date_operation', 'created_at'], name='api_premium_owner_i_43d5ae_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_compta_mensuelle(apps, schema_editor):
+    PremiumComptableEcriture = apps.get_model('api', 'PremiumComptableEcriture')
+    PremiumComptaMensuelle = apps.get_model('api', 'PremiumComptaMensuelle')
+
+    lignes = PremiumComptableEcriture.objects.order_by().annotate(mois=TruncMonth('date_operation')).values(
+        'owner_id', 'bien_id', 'mois', 'type_ecriture', 'categorie',
+    ).annotate(total=Sum('montant'), nombre=Count('id'))
+
+    PremiumComptaMensuelle.objects.bulk_create([
+        PremiumComptaMensuelle(
+            owner_id=ligne['owner_id'], bien_id=ligne['bien_id'], mois=ligne['mois'],
+            type_ecriture=ligne['type_ecriture'], categorie=ligne['categorie'],
+            montant=ligne['total'], nb_ecritures=ligne['nombre'],
+        )
+        for ligne in lignes.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_comptable_ecriture_period_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PremiumComptaMensuelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('type_ecriture', models.CharField(choices=[('REVENU', 'Revenu'), ('DEPENSE', 'Depense')], max_length=10)),
+                ('categorie', models.CharField(blank=True, max_length=120)),
+                ('montant', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('nb_ecritures', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bien', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='compta_mensuelle', to='api.premiumbien')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='premium_compta_mensuelle', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['owner', 'mois'],
+                'indexes': [models.Index(fields=['owner', 'mois'], name='api_premium_owner_i_db0494_idx'), models.Index(fields=['owner', 'bien', 'mois'], name='api_premium_owner_i_f46bd0_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('bien__isnull', False)), fields=('owner', 'bien', 'mois', 'type_ecriture', 'categorie'), name='premium_compta_mensuelle_uniq'), models.UniqueConstraint(condition=models.Q(('bien__isnull', True)), fields=('owner', 'mois', 'type_ecriture', 'categorie'), name='premium_compta_mensuelle_sans_bien_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_compta_mensuelle, migrations.RunPython.noop),
+    ]
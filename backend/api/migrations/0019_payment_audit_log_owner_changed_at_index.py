@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_premium_compta_mensuelle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiumpaymentauditlog',
+            index=models.Index(fields=['owner', 'changed_at'], name='api_premium_owner_i_3a65b3_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_payment_audit_log_owner_changed_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PremiumPaymentAuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois archivé')),
+                ('fichier', models.CharField(max_length=255)),
+                ('nb_lignes', models.IntegerField(default=0)),
+                ('premier_changement', models.DateTimeField(blank=True, null=True)),
+                ('dernier_changement', models.DateTimeField(blank=True, null=True)),
+                ('premier_id', models.BigIntegerField(blank=True, help_text='Plus petit id de ligne archivée', null=True)),
+                ('dernier_id', models.BigIntegerField(blank=True, help_text='Plus grand id de ligne archivée', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='premium_audit_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['owner', '-mois'],
+                'unique_together': {('owner', 'mois')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_premium_payment_audit_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PremiumRgpdPurgeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('declencheur', models.CharField(choices=[('COMMANDE', 'Commande'), ('API', 'API')], max_length=10)),
+                ('date_limite', models.DateField(help_text='Locataires partis au plus tard à cette date')),
+                ('dry_run', models.BooleanField(default=False)),
+                ('nb_locataires', models.IntegerField(default=0)),
+                ('par_proprietaire', models.JSONField(blank=True, default=dict)),
+                ('duree_secondes', models.FloatField(default=0)),
+                ('lance_le', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-lance_le'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='premiumlocataire',
+            index=models.Index(condition=models.Q(('is_purged', False)), fields=['date_depart'], name='premium_locataire_a_purger_idx'),
+        ),
+        migrations.AddField(
+            model_name='premiumrgpdpurgelog',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='premiumrgpdpurgelog',
+            name='owner',
+            field=models.ForeignKey(blank=True, help_text='Périmètre (vide : tous les propriétaires)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='premium_rgpd_purges', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
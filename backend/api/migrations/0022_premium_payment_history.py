@@ -0,0 +1,174 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:59
+
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+HISTORIQUE_PAIEMENTS_TAILLE = 12
+STATUTS = {'PAYE', 'PARTIEL', 'IMPAYE'}
+STATUTS_ENCAISSES = ('PAYE', 'PARTIEL')
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(str(value)[:10]) if value else None
+    except ValueError:
+        return None
+
+
+def _entree(entry, baux):
+    """Entrée JSON libre -> valeurs PremiumPayment, None si inexploitable"""
+    if not isinstance(entry, dict):
+        return None
+    date_paiement = _date(entry.get('date_paiement') or entry.get('date'))
+    try:
+        montant = Decimal(str(entry.get('montant', entry.get('amount'))))
+    except (InvalidOperation, ValueError):
+        return None
+    if date_paiement is None or not montant.is_finite() or montant < 0:
+        return None
+
+    periode_debut = _date(entry.get('periode_debut')) or date_paiement
+    periode_fin = _date(entry.get('periode_fin')) or periode_debut
+    try:
+        bail_id = int(entry.get('bail_id') or entry.get('bail'))
+    except (TypeError, ValueError):
+        bail_id = None
+    if bail_id not in baux:
+        # Bail en cours à la date du paiement, sinon le premier bail du locataire
+        en_cours = [pk for pk, date_entree in baux.items() if date_entree <= date_paiement]
+        bail_id = max(en_cours, key=baux.get) if en_cours else min(baux, key=baux.get)
+    statut = str(entry.get('statut', 'PAYE')).upper()
+    return {
+        'bail_id': bail_id,
+        'date_paiement': date_paiement,
+        'periode_debut': periode_debut,
+        'periode_fin': max(periode_fin, periode_debut),
+        'montant': montant.quantize(Decimal('0.01')),
+        'statut': statut if statut in STATUTS else 'PAYE',
+    }
+
+
+def migrer_historique_paiements(apps, schema_editor):
+    """
+    Convertit les historiques JSON saisis à la main en lignes PremiumPayment
+    (sans doublon bail / date / montant), puis remplace le JSON par le cache des
+    derniers paiements encaissés. Les entrées sans date ou montant exploitable sont
+    conservées à la suite du cache jusqu'au prochain rafraîchissement ; les
+    locataires sans bail gardent leur JSON tel quel.
+    Les paiements créés le sont comme par PremiumPayment.record_side_effects :
+    ligne d'audit INSERT, écriture AUTO_LOYER "Loyer percu" pour un paiement
+    encaissé (payment_id en metadata, la FK est renseignée par la migration
+    0026), puis cumuls mensuels des propriétaires concernés recalculés.
+    """
+    PremiumLocataire = apps.get_model('api', 'PremiumLocataire')
+    PremiumBail = apps.get_model('api', 'PremiumBail')
+    PremiumPayment = apps.get_model('api', 'PremiumPayment')
+    PremiumPaymentAuditLog = apps.get_model('api', 'PremiumPaymentAuditLog')
+    PremiumComptableEcriture = apps.get_model('api', 'PremiumComptableEcriture')
+    PremiumComptaMensuelle = apps.get_model('api', 'PremiumComptaMensuelle')
+
+    locataires = PremiumLocataire.objects.exclude(historique_paiements=[]).filter(
+        is_purged=False
+    ).only('id', 'owner_id', 'historique_paiements')
+
+    owner_ids = set()
+    for locataire in locataires.iterator(chunk_size=500):
+        historique = locataire.historique_paiements if isinstance(locataire.historique_paiements, list) else []
+        baux, bien_ids = {}, {}
+        for bail_id, date_entree, bien_id in PremiumBail.objects.filter(locataire_id=locataire.id).values_list(
+            'id', 'date_entree', 'bien_id'
+        ):
+            baux[bail_id], bien_ids[bail_id] = date_entree, bien_id
+        if not baux:
+            continue
+
+        existants = set(PremiumPayment.objects.filter(bail_id__in=baux).values_list('bail_id', 'date_paiement', 'montant'))
+        nouveaux, restes = [], []
+        for entry in historique:
+            valeurs = _entree(entry, baux)
+            if valeurs is None:
+                restes.append(entry)
+                continue
+            cle = (valeurs['bail_id'], valeurs['date_paiement'], valeurs['montant'])
+            if cle in existants:
+                continue
+            existants.add(cle)
+            nouveaux.append(PremiumPayment(owner_id=locataire.owner_id, **valeurs))
+        nouveaux = PremiumPayment.objects.bulk_create(nouveaux, batch_size=1000)
+        PremiumPaymentAuditLog.objects.bulk_create([
+            PremiumPaymentAuditLog(
+                payment_id=payment.pk, owner_id=payment.owner_id, actor_id=payment.owner_id, action='INSERT',
+                old_data=None, new_data={
+                    'date_paiement': payment.date_paiement.isoformat(),
+                    'periode_debut': payment.periode_debut.isoformat(),
+                    'periode_fin': payment.periode_fin.isoformat(),
+                    'montant': str(payment.montant),
+                    'statut': payment.statut,
+                },
+            )
+            for payment in nouveaux
+        ], batch_size=1000)
+        ecritures = PremiumComptableEcriture.objects.bulk_create([
+            PremiumComptableEcriture(
+                owner_id=payment.owner_id, bien_id=bien_ids[payment.bail_id], bail_id=payment.bail_id,
+                type_ecriture='REVENU', source='AUTO_LOYER', libelle='Loyer percu', categorie='LOYER',
+                date_operation=payment.date_paiement, montant=payment.montant, metadata={'payment_id': payment.pk},
+            )
+            for payment in nouveaux
+            if payment.statut in STATUTS_ENCAISSES
+        ], batch_size=1000)
+        if ecritures:
+            owner_ids.add(locataire.owner_id)
+
+        derniers = PremiumPayment.objects.filter(bail_id__in=baux, statut__in=('PAYE', 'PARTIEL')).order_by('-date_paiement', '-id').values(
+            'id', 'bail_id', 'date_paiement', 'periode_debut', 'periode_fin', 'montant', 'statut',
+        )[:HISTORIQUE_PAIEMENTS_TAILLE]
+        locataire.historique_paiements = [
+            {
+                'id': paiement['id'],
+                'bail_id': paiement['bail_id'],
+                'date_paiement': paiement['date_paiement'].isoformat(),
+                'periode_debut': paiement['periode_debut'].isoformat(),
+                'periode_fin': paiement['periode_fin'].isoformat(),
+                'montant': str(paiement['montant']),
+                'statut': paiement['statut'],
+            }
+            for paiement in derniers
+        ] + restes
+        locataire.save(update_fields=['historique_paiements'])
+
+    if not owner_ids:
+        return
+    PremiumComptaMensuelle.objects.filter(owner_id__in=owner_ids).delete()
+    lignes = PremiumComptableEcriture.objects.filter(owner_id__in=owner_ids).order_by().annotate(
+        mois=TruncMonth('date_operation')
+    ).values('owner_id', 'bien_id', 'mois', 'type_ecriture', 'categorie').annotate(
+        total=Sum('montant'), nombre=Count('id')
+    )
+    PremiumComptaMensuelle.objects.bulk_create([
+        PremiumComptaMensuelle(
+            owner_id=ligne['owner_id'], bien_id=ligne['bien_id'], mois=ligne['mois'],
+            type_ecriture=ligne['type_ecriture'], categorie=ligne['categorie'],
+            montant=ligne['total'], nb_ecritures=ligne['nombre'],
+        )
+        for ligne in lignes.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_premium_rgpd_purge'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiumpayment',
+            index=models.Index(fields=['bail', 'date_paiement'], name='api_premium_bail_id_35687d_idx'),
+        ),
+        migrations.RunPython(migrer_historique_paiements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_premium_payment_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiumbail',
+            index=models.Index(fields=['owner', 'created_at'], name='api_premium_owner_i_066763_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumbail',
+            index=models.Index(fields=['owner', 'bien', 'created_at'], name='api_premium_owner_i_92b959_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumbail',
+            index=models.Index(fields=['owner', 'statut'], name='api_premium_owner_i_26a832_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumbien',
+            index=models.Index(fields=['owner', 'created_at'], name='api_premium_owner_i_292ec6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumbien',
+            index=models.Index(fields=['owner', 'statut'], name='api_premium_owner_i_74396e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumlocataire',
+            index=models.Index(fields=['owner', 'created_at'], name='api_premium_owner_i_3c859f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumpayment',
+            index=models.Index(fields=['owner', 'date_paiement', 'created_at'], name='api_premium_owner_i_d4d7cb_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_premium_owner_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiumbien',
+            index=models.Index(fields=['owner', 'latitude', 'longitude'], name='api_premium_owner_i_0dccd9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='premiumbien',
+            index=models.Index(fields=['latitude', 'longitude'], name='api_premium_latitud_1e50a2_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:11
+
+import math
+
+from django.db import migrations, models
+
+# Copie figée de api.geo.cellule_carte au moment de la migration
+CELLULE_ZOOM = 24
+MERCATOR_MAX_LAT = 85.05112878
+LOT = 1000
+
+
+def cellule_carte(lat, lng):
+    """Tuile Web Mercator au zoom CELLULE_ZOOM, x / y entrelacés (code de Morton)"""
+    n = 1 << CELLULE_ZOOM
+    lat = max(min(float(lat), MERCATOR_MAX_LAT), -MERCATOR_MAX_LAT)
+    x = int((float(lng) + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    x, y = min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+    code = 0
+    for bit in range(CELLULE_ZOOM):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def calculer_cellules(apps, schema_editor):
+    PremiumBien = apps.get_model('api', 'PremiumBien')
+    biens = PremiumBien.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by('id')
+
+    # Lots keyset sur id : mémoire bornée quel que soit le nombre de biens
+    dernier_id = 0
+    while True:
+        lot = list(biens.filter(id__gt=dernier_id).only('id', 'latitude', 'longitude')[:LOT])
+        if not lot:
+            break
+        for bien in lot:
+            bien.cellule = cellule_carte(bien.latitude, bien.longitude)
+        PremiumBien.objects.bulk_update(lot, ['cellule'])
+        dernier_id = lot[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_premium_bien_geo_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='premiumbien',
+            name='cellule',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calculer_cellules, migrations.RunPython.noop),
+    ]
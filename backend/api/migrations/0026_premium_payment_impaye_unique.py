@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Count, Exists, Max, Min, OuterRef, Sum
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, TruncMonth
+from django.utils import timezone
+
+LOT = 1000
+
+
+def lier_paiements(apps, schema_editor):
+    """
+    Écritures AUTO_LOYER : payment renseigné depuis metadata['payment_id'], par
+    lots d'ids (sauf paiement disparu). Les écritures des loyers IMPAYE (générés
+    par le rent-roll avec une écriture "Loyer percu") sont supprimées, puis les
+    cumuls mensuels des propriétaires concernés recalculés.
+    """
+    PremiumPayment = apps.get_model('api', 'PremiumPayment')
+    PremiumComptableEcriture = apps.get_model('api', 'PremiumComptableEcriture')
+    PremiumComptaMensuelle = apps.get_model('api', 'PremiumComptaMensuelle')
+
+    ecritures = PremiumComptableEcriture.objects.filter(source='AUTO_LOYER', metadata__has_key='payment_id')
+    payment_id = Cast(KeyTextTransform('payment_id', 'metadata'), BigIntegerField())
+    bornes = ecritures.aggregate(premier=Min('id'), dernier=Max('id'))
+    if bornes['premier'] is None:
+        return
+
+    owner_ids = set()
+    for debut in range(bornes['premier'], bornes['dernier'] + 1, LOT):
+        lot = ecritures.filter(id__gte=debut, id__lt=debut + LOT)
+        lot.annotate(paiement=payment_id).filter(
+            Exists(PremiumPayment.objects.filter(pk=OuterRef('paiement')))
+        ).update(payment_id=payment_id)
+        a_supprimer = lot.filter(payment__statut='IMPAYE')
+        owner_ids |= set(a_supprimer.order_by().values_list('owner_id', flat=True).distinct())
+        a_supprimer.delete()
+    if not owner_ids:
+        return
+
+    PremiumComptaMensuelle.objects.filter(owner_id__in=owner_ids).delete()
+    lignes = PremiumComptableEcriture.objects.filter(owner_id__in=owner_ids).order_by().annotate(
+        mois=TruncMonth('date_operation')
+    ).values('owner_id', 'bien_id', 'mois', 'type_ecriture', 'categorie').annotate(
+        total=Sum('montant'), nombre=Count('id')
+    )
+    PremiumComptaMensuelle.objects.bulk_create([
+        PremiumComptaMensuelle(
+            owner_id=ligne['owner_id'], bien_id=ligne['bien_id'], mois=ligne['mois'],
+            type_ecriture=ligne['type_ecriture'], categorie=ligne['categorie'],
+            montant=ligne['total'], nb_ecritures=ligne['nombre'],
+        )
+        for ligne in lignes.iterator()
+    ], batch_size=1000)
+
+
+def _instantane(payment):
+    return {
+        'date_paiement': payment.date_paiement.isoformat(),
+        'periode_debut': payment.periode_debut.isoformat(),
+        'periode_fin': payment.periode_fin.isoformat(),
+        'montant': str(payment.montant),
+        'statut': payment.statut,
+    }
+
+
+def fusionner_impayes_en_double(apps, schema_editor):
+    """
+    Loyers IMPAYE saisis à la main pour un même bail et une même période, avant
+    la contrainte d'unicité : fusionnés dans la ligne la plus ancienne. Les
+    doublons exacts (même montant, fin de période et date) sont supprimés, les
+    autres montants additionnés (fin de période la plus tardive). Chaque
+    changement est audité ; les loyers IMPAYE ne figurent pas dans le cache
+    historique des locataires.
+    """
+    PremiumPayment = apps.get_model('api', 'PremiumPayment')
+    PremiumPaymentAuditLog = apps.get_model('api', 'PremiumPaymentAuditLog')
+
+    groupes = list(PremiumPayment.objects.filter(statut='IMPAYE').order_by().values(
+        'bail_id', 'periode_debut',
+    ).annotate(nombre=Count('id')).filter(nombre__gt=1).values_list('bail_id', 'periode_debut'))
+    if not groupes:
+        return
+
+    audit = []
+    for bail_id, periode_debut in groupes:
+        conserve, *doublons = PremiumPayment.objects.filter(
+            statut='IMPAYE', bail_id=bail_id, periode_debut=periode_debut,
+        ).order_by('id')
+        avant = _instantane(conserve)
+        vus = {(conserve.montant, conserve.periode_fin, conserve.date_paiement)}
+        for doublon in doublons:
+            cle = (doublon.montant, doublon.periode_fin, doublon.date_paiement)
+            if cle not in vus:
+                vus.add(cle)
+                conserve.montant += doublon.montant
+                conserve.periode_fin = max(conserve.periode_fin, doublon.periode_fin)
+            audit.append(PremiumPaymentAuditLog(
+                payment=None, owner_id=doublon.owner_id, actor_id=doublon.owner_id, action='DELETE',
+                old_data={**_instantane(doublon), 'payment_id': doublon.pk}, new_data=None,
+            ))
+        PremiumPayment.objects.filter(pk__in=[doublon.pk for doublon in doublons]).delete()
+        if _instantane(conserve) != avant:
+            PremiumPayment.objects.filter(pk=conserve.pk).update(
+                montant=conserve.montant, periode_fin=conserve.periode_fin, updated_at=timezone.now(),
+            )
+            audit.append(PremiumPaymentAuditLog(
+                payment_id=conserve.pk, owner_id=conserve.owner_id, actor_id=conserve.owner_id, action='UPDATE',
+                old_data=avant, new_data=_instantane(conserve),
+            ))
+    PremiumPaymentAuditLog.objects.bulk_create(audit, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_premium_bien_cellule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='premiumcomptableecriture',
+            name='payment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ecritures', to='api.premiumpayment'),
+        ),
+        migrations.RunPython(lier_paiements, migrations.RunPython.noop),
+        migrations.RunPython(fusionner_impayes_en_double, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='premiumpayment',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'IMPAYE')), fields=('bail', 'periode_debut'), name='premium_payment_impaye_bail_periode_uniq'),
+        ),
+    ]
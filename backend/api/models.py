@@ -1,13 +1,20 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Count, Sum, Value, Window
+from django.db.models.functions import Cast, Concat, RowNumber, TruncMonth
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
+from django.utils import timezone
 from django.utils.text import slugify
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, pre_delete, post_delete
+from datetime import date
 from decimal import Decimal
 from django.utils.html import format_html
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.conf import settings
 import hashlib
 import uuid
+from collections import defaultdict
+
+from .geo_utils import cellule_carte
 
 class UserManager(BaseUserManager):
     def create_user(self, email, username, password=None, **extra_fields):
@@ -55,12 +62,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     date_naissance = models.DateField(verbose_name="Date de naissance", null=True, blank=True)
     date_inscription = models.DateTimeField(auto_now_add=True, verbose_name="Date d'inscription")
+    date_modification = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
     is_admin = models.BooleanField(default=False, verbose_name="Est administrateur")
 
     # Le Plan Premium (Notre fameuse option payante)
     PLAN_CHOICES = [('free', 'Gratuit'), ('premium', 'Premium')]
     plan = models.CharField(max_length=10, choices=PLAN_CHOICES, default='free')
 
+    # Compteur maintenu par Favori.ajouter / Favori.retirer (évite un COUNT à chaque bascule)
+    nb_favoris = models.IntegerField(default=0, verbose_name="Nombre de favoris")
+
     # Ajout des relations pour appartements et locations
     appartements = models.ManyToManyField(
         'Appartement',
@@ -374,6 +385,7 @@ class Location(models.Model):
         blank=True,
         verbose_name="Date generation bail"
     )
+    date_modification = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
 
     class Meta:
         verbose_name = "Location"
@@ -407,6 +419,102 @@ class Favori(models.Model):
     def __str__(self):
         return f"Favori de {self.locataire} pour {self.appartement}"
 
+    @staticmethod
+    def ajuster_compteurs(locataire_id, appartement_ids, delta, nombre=None):
+        """
+        Met à jour les compteurs dénormalisés (User.nb_favoris et Appartement.nb_favoris)
+        pour une liste d'appartements ajoutés (delta=1) ou retirés (delta=-1).
+        nombre : lignes réellement insérées / supprimées (défaut: len(appartement_ids)).
+        """
+        if not appartement_ids:
+            return
+        nombre = len(appartement_ids) if nombre is None else nombre
+        User.objects.filter(pk=locataire_id).update(
+            nb_favoris=F('nb_favoris') + delta * nombre
+        )
+        Appartement.objects.filter(pk__in=appartement_ids).update(
+            nb_favoris=F('nb_favoris') + delta
+        )
+
+    @staticmethod
+    def verrouiller(locataire):
+        """
+        Verrouille la ligne du locataire jusqu'à la fin de la transaction : les
+        modifications de favoris d'un même locataire sont sérialisées, les favoris
+        lus ensuite sont à jour.
+        """
+        list(User.objects.select_for_update().filter(pk=locataire.pk).values_list('pk', flat=True))
+
+    @classmethod
+    def ajouter(cls, locataire, appartement_id):
+        """Ajoute un favori. Retourne True si le favori a été créé."""
+        with transaction.atomic():
+            cls.verrouiller(locataire)
+            _, created = cls.objects.get_or_create(locataire=locataire, appartement_id=appartement_id)
+            if created:
+                cls.ajuster_compteurs(locataire.pk, [appartement_id], 1)
+        return created
+
+    @classmethod
+    def retirer(cls, locataire, appartement_id):
+        """Retire un favori. Retourne True si un favori a été supprimé."""
+        with transaction.atomic():
+            cls.verrouiller(locataire)
+            deleted, _ = cls.objects.filter(locataire=locataire, appartement_id=appartement_id).delete()
+            if deleted:
+                cls.ajuster_compteurs(locataire.pk, [appartement_id], -1)
+        return bool(deleted)
+
+    @classmethod
+    def synchroniser(cls, locataire, operations):
+        """
+        Applique un lot d'opérations [{'appartement_id', 'action'}] en une transaction.
+        La dernière opération sur un appartement l'emporte. Le nombre de requêtes
+        ne dépend pas de la taille du lot.
+
+        Retourne (ids favoris finaux, ids d'appartements inconnus ignorés).
+        """
+        actions = {}
+        for operation in operations:
+            actions[operation['appartement_id']] = operation['action']
+
+        with transaction.atomic():
+            # Lu sous verrou : un ajout / retrait concurrent du même locataire attend
+            # la fin de la transaction, les compteurs ne sont pas ajustés deux fois
+            cls.verrouiller(locataire)
+            connus = set(
+                Appartement.objects.filter(pk__in=actions.keys()).values_list('id', flat=True)
+            )
+            existants = set(
+                cls.objects.filter(locataire=locataire).values_list('appartement_id', flat=True)
+            )
+
+            a_ajouter = [
+                appartement_id for appartement_id, action in actions.items()
+                if action == 'add' and appartement_id in connus and appartement_id not in existants
+            ]
+            a_retirer = [
+                appartement_id for appartement_id, action in actions.items()
+                if action == 'remove' and appartement_id in existants
+            ]
+
+            if a_ajouter:
+                cls.objects.bulk_create(
+                    [cls(locataire=locataire, appartement_id=appartement_id) for appartement_id in a_ajouter],
+                    ignore_conflicts=True,
+                )
+                cls.ajuster_compteurs(locataire.pk, a_ajouter, 1)
+
+            if a_retirer:
+                # Un favori supprimé entre-temps en cascade (annonce supprimée) est
+                # déjà décompté par decrementer_favoris_utilisateurs
+                supprimes, _ = cls.objects.filter(locataire=locataire, appartement_id__in=a_retirer).delete()
+                cls.ajuster_compteurs(locataire.pk, a_retirer, -1, nombre=supprimes)
+
+        favoris = (existants | set(a_ajouter)) - set(a_retirer)
+        ignores = sorted(set(actions) - connus)
+        return sorted(favoris), ignores
+
 
 def generate_slug(instance, **kwargs):
     if not instance.slug and instance.titre:
@@ -415,6 +523,18 @@ def generate_slug(instance, **kwargs):
 pre_save.connect(generate_slug, sender=Appartement)
 
 
+def decrementer_favoris_utilisateurs(instance, **kwargs):
+    # Les favoris supprimés en cascade ne passent pas par Favori.retirer
+    User.objects.filter(favoris__appartement=instance).update(nb_favoris=F('nb_favoris') - 1)
+
+
+def decrementer_favoris_appartements(instance, **kwargs):
+    Appartement.objects.filter(favoris__locataire=instance).update(nb_favoris=F('nb_favoris') - 1)
+
+pre_delete.connect(decrementer_favoris_utilisateurs, sender=Appartement)
+pre_delete.connect(decrementer_favoris_appartements, sender=User)
+
+
 class PremiumCategory(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='premium_categories')
     code = models.CharField(max_length=50)
@@ -435,6 +555,7 @@ class PremiumAppartementType(models.Model):
     code = models.CharField(max_length=50)
     label = models.CharField(max_length=120)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('owner', 'code')
@@ -463,15 +584,198 @@ class PremiumBien(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='VACANT')
+    # Cellule carte (api.geo_utils.cellule_carte) recalculée à chaque sauvegarde, pour le regroupement par zoom
+    cellule = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+            models.Index(fields=['owner', 'statut']),
+            # Recherche carte (api.geo) : intervalle sur latitude puis longitude,
+            # pour un propriétaire (PremiumBienViewSet) ou toutes les annonces (AppartementViewSet)
+            models.Index(fields=['owner', 'latitude', 'longitude']),
+            models.Index(fields=['latitude', 'longitude']),
+        ]
 
     def __str__(self):
         return self.titre
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Coordonnées chargées : le cache des annonces n'est invalidé que si elles changent
+        if {'latitude', 'longitude'} <= set(field_names):
+            instance._coordonnees_chargees = instance.coordonnees()
+        return instance
+
+    def coordonnees(self):
+        return tuple(None if value is None else Decimal(str(value)) for value in (self.latitude, self.longitude))
+
+    def save(self, *args, **kwargs):
+        self.cellule = cellule_carte(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'cellule'}
+        super().save(*args, **kwargs)
+
+
+class PremiumLocataireManager(models.Manager):
+    def eligibles_purge(self, date_limite):
+        """Locataires partis au plus tard à date_limite et non encore purgés"""
+        return self.filter(is_purged=False, date_depart__isnull=False, date_depart__lte=date_limite)
+
+    def purger(self, queryset, chunk_size=5000):
+        """
+        Purge RGPD ensembliste : ids lus par lots (keyset sur id, sans instances)
+        puis un UPDATE par lot. Retourne {owner_id: nombre de locataires purgés}.
+
+        Dans chaque lot, les locataires encore non purgés sont verrouillés et
+        relus avant l'UPDATE : un locataire purgé entre-temps (purge concurrente)
+        n'est ni réécrit ni compté.
+        """
+        par_proprietaire = defaultdict(int)
+        dernier_id = 0
+        while True:
+            lot = list(queryset.filter(id__gt=dernier_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not lot:
+                break
+            dernier_id = lot[-1]
+
+            with transaction.atomic(using=self.db):
+                a_purger = list(
+                    self.select_for_update().filter(id__in=lot, is_purged=False).order_by('id').values_list('id', 'owner_id')
+                )
+                if not a_purger:
+                    continue
+                self.filter(id__in=[locataire_id for locataire_id, _ in a_purger]).update(**self.valeurs_purgees())
+            for _, owner_id in a_purger:
+                par_proprietaire[str(owner_id)] += 1
+        return dict(par_proprietaire)
+
+    def rafraichir_historique(self, locataires):
+        """
+        Recalcule le cache historique_paiements (derniers paiements encaissés, du
+        plus récent au plus ancien) des locataires non purgés du queryset : une
+        requête fenêtrée (ROW_NUMBER par locataire) puis un bulk_update, quel que
+        soit leur nombre.
+        """
+        locataire_ids = list(locataires.filter(is_purged=False).order_by().values_list('id', flat=True).distinct())
+        if not locataire_ids:
+            return
+
+        derniers = PremiumPayment.objects.filter(
+            bail__locataire_id__in=locataire_ids, statut__in=PremiumPayment.STATUTS_ENCAISSES,
+        ).annotate(
+            locataire_id=F('bail__locataire_id'),
+            rang=Window(
+                RowNumber(),
+                partition_by=F('bail__locataire_id'),
+                order_by=[F('date_paiement').desc(), F('id').desc()],
+            ),
+        ).filter(rang__lte=PremiumLocataire.HISTORIQUE_PAIEMENTS_TAILLE).order_by('locataire_id', 'rang').values(
+            'locataire_id', 'id', 'bail_id', 'date_paiement', 'periode_debut', 'periode_fin', 'montant', 'statut',
+        )
+
+        historiques = defaultdict(list)
+        for paiement in derniers:
+            historiques[paiement.pop('locataire_id')].append(PremiumLocataire.entree_historique(paiement))
+        self.enregistrer_historiques({locataire_id: historiques[locataire_id] for locataire_id in locataire_ids})
+
+    def fusionner_historique(self, payments):
+        """
+        Paiements créés ou modifiés : fusionnés dans le cache des locataires
+        concernés sans relire leur historique complet (le cache contient déjà les
+        derniers paiements, un paiement n'y entre que s'il est plus récent).
+        Deux requêtes : lecture des caches, bulk_update des seuls caches modifiés.
+        Un paiement non encaissé (IMPAYE) n'entre pas dans le cache et en sort s'il
+        y figurait. Sont recalculés : un cache contenant encore des entrées saisies
+        à la main (voir migration 0022), et un cache complet dont un paiement sort ou
+        recule au-delà de la dernière entrée (le paiement suivant n'est pas dans le
+        cache).
+        """
+        # Valeurs telles que relues en base (dates, montant à 2 décimales)
+        champs = {name: PremiumPayment._meta.get_field(name) for name in PremiumPayment.AUDITED_FIELDS}
+        centimes = Decimal(1).scaleb(-champs['montant'].decimal_places)
+        par_bail = defaultdict(dict)
+        for payment in payments:
+            if payment.statut not in PremiumPayment.STATUTS_ENCAISSES:
+                # Hors du cache : None retire l'entrée du paiement
+                par_bail[payment.bail_id][payment.pk] = None
+                continue
+            valeurs = {name: field.to_python(getattr(payment, name)) for name, field in champs.items()}
+            valeurs['montant'] = valeurs['montant'].quantize(centimes)
+            par_bail[payment.bail_id][payment.pk] = PremiumLocataire.entree_historique(
+                {'id': payment.pk, 'bail_id': payment.bail_id, **valeurs}
+            )
+        if not par_bail:
+            return
+
+        caches, entrees = {}, defaultdict(dict)
+        for bail_id, locataire_id, historique in self.filter(baux__id__in=par_bail, is_purged=False).order_by().values_list(
+            'baux__id', 'id', 'historique_paiements'
+        ):
+            caches[locataire_id] = historique or []
+            entrees[locataire_id].update(par_bail[bail_id])
+
+        def rang(entree):
+            return entree['date_paiement'], entree['id']
+
+        taille = PremiumLocataire.HISTORIQUE_PAIEMENTS_TAILLE
+        historiques, a_recalculer = {}, set()
+        for locataire_id, historique in caches.items():
+            if not all(isinstance(entree, dict) and {'id', 'date_paiement'} <= entree.keys() for entree in historique):
+                a_recalculer.add(locataire_id)
+                continue
+            nouvelles = entrees[locataire_id]
+            if len(historique) >= taille:
+                plancher = min(map(rang, historique))
+                if any(
+                    entree['id'] in nouvelles and (nouvelles[entree['id']] is None or rang(nouvelles[entree['id']]) < plancher)
+                    for entree in historique
+                ):
+                    a_recalculer.add(locataire_id)
+                    continue
+            fusion = [entree for entree in historique if entree['id'] not in nouvelles]
+            fusion += [entree for entree in nouvelles.values() if entree is not None]
+            fusion = sorted(fusion, key=rang, reverse=True)[:taille]
+            if fusion != historique:
+                historiques[locataire_id] = fusion
+
+        if a_recalculer:
+            self.rafraichir_historique(self.filter(id__in=a_recalculer))
+        self.enregistrer_historiques(historiques)
+
+    def enregistrer_historiques(self, historiques):
+        """historiques: {locataire_id: entrées} ; updated_at suit, pour les ETag des locataires"""
+        if not historiques:
+            return
+        now = timezone.now()
+        self.bulk_update(
+            [
+                self.model(id=locataire_id, historique_paiements=historique, updated_at=now)
+                for locataire_id, historique in historiques.items()
+            ],
+            ['historique_paiements', 'updated_at'],
+            batch_size=1000,
+        )
+
+    @staticmethod
+    def valeurs_purgees():
+        return {
+            'email': Concat(Value('purged+'), Cast('id', output_field=models.CharField()), Value('@deleted.local')),
+            'telephone': '',
+            'date_naissance': None,
+            'profession': '',
+            'piece_identite_chiffree': '',
+            'garant_chiffre': '',
+            'historique_paiements': [],
+            'is_purged': True,
+            'updated_at': timezone.now(),
+        }
+
 
 class PremiumLocataire(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='premium_locataires')
@@ -483,18 +787,42 @@ class PremiumLocataire(models.Model):
     profession = models.CharField(max_length=120, blank=True)
     piece_identite_chiffree = models.TextField(blank=True)
     garant_chiffre = models.TextField(blank=True)
+    # Cache des derniers paiements encaissés (PremiumPayment PAYE / PARTIEL), tenu à jour
+    # par PremiumPayment.record_side_effects
     historique_paiements = models.JSONField(default=list, blank=True)
     date_depart = models.DateField(null=True, blank=True)
     is_purged = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    HISTORIQUE_PAIEMENTS_TAILLE = 12
+
+    objects = PremiumLocataireManager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+            # Sélection des locataires à purger (partiel : les purgés ne sont plus indexés)
+            models.Index(fields=['date_depart'], condition=models.Q(is_purged=False), name='premium_locataire_a_purger_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nom} {self.prenoms}"
 
+    @staticmethod
+    def entree_historique(paiement):
+        """Entrée du cache historique_paiements à partir d'un dict de valeurs PremiumPayment"""
+        return {
+            'id': paiement['id'],
+            'bail_id': paiement['bail_id'],
+            'date_paiement': paiement['date_paiement'].isoformat(),
+            'periode_debut': paiement['periode_debut'].isoformat(),
+            'periode_fin': paiement['periode_fin'].isoformat(),
+            'montant': str(paiement['montant']),
+            'statut': paiement['statut'],
+        }
+
     @staticmethod
     def _hash_sensitive(raw_value):
         if not raw_value:
@@ -544,6 +872,11 @@ class PremiumBail(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+            models.Index(fields=['owner', 'bien', 'created_at']),
+            models.Index(fields=['owner', 'statut']),
+        ]
 
 
 class PremiumComptableEcriture(models.Model):
@@ -553,6 +886,11 @@ class PremiumComptableEcriture(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='premium_ecritures')
     bien = models.ForeignKey(PremiumBien, on_delete=models.SET_NULL, null=True, blank=True, related_name='ecritures')
     bail = models.ForeignKey(PremiumBail, on_delete=models.SET_NULL, null=True, blank=True, related_name='ecritures')
+    # Paiement d'une écriture AUTO_LOYER (supprimée par PremiumPayment.delete ; conservée,
+    # comme bien et bail, quand le paiement disparaît avec son bail)
+    payment = models.ForeignKey(
+        'PremiumPayment', on_delete=models.SET_NULL, null=True, blank=True, related_name='ecritures'
+    )
     type_ecriture = models.CharField(max_length=10, choices=TYPE_CHOICES)
     source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='MANUEL')
     libelle = models.CharField(max_length=255)
@@ -570,10 +908,260 @@ class PremiumComptableEcriture(models.Model):
 
     class Meta:
         ordering = ['-date_operation', '-created_at']
+        indexes = [
+            # created_at en fin d'index : l'ordre de liste complet est servi par l'index
+            models.Index(fields=['owner', 'date_operation', 'created_at']),
+            models.Index(fields=['owner', 'bien', 'date_operation', 'created_at']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées : la mise à jour du cumul mensuel n'a pas à relire la ligne
+        if set(PremiumComptaMensuelle.SOURCE_FIELDS) <= set(field_names):
+            instance._rollup_snapshot = instance.rollup_values()
+        return instance
+
+    def rollup_values(self):
+        return (self.owner_id, self.bien_id, self.date_operation, self.type_ecriture, self.categorie, self.montant)
+
+    def save(self, *args, **kwargs):
+        old_values = None
+        if self.pk is not None:
+            old_values = getattr(self, '_rollup_snapshot', None)
+            if old_values is None:
+                old_values = PremiumComptableEcriture.objects.filter(pk=self.pk).values_list(
+                    *PremiumComptaMensuelle.SOURCE_FIELDS
+                ).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            new_values = self.rollup_values()
+            if old_values != new_values:
+                # Ancienne valeur retirée et nouvelle ajoutée en un seul delta net
+                deltas = PremiumComptaMensuelle.objects.cumuler([new_values])
+                if old_values is not None:
+                    PremiumComptaMensuelle.objects.cumuler([old_values], signe=-1, deltas=deltas)
+                PremiumComptaMensuelle.objects.appliquer_deltas(deltas)
+
+        self._rollup_snapshot = self.rollup_values()
+
+
+class PremiumComptaMensuelleManager(models.Manager):
+    # Tentatives d'appliquer() quand un cumul est créé en même temps par une autre transaction
+    TENTATIVES = 3
+
+    def appliquer(self, lignes, signe=1):
+        """
+        Reporte des écritures dans le cumul mensuel.
+        lignes: tuples (owner_id, bien_id, date_operation, type_ecriture, categorie, montant)
+        signe: 1 à l'ajout, -1 au retrait.
+        """
+        self.appliquer_deltas(self.cumuler(lignes, signe))
+
+    @staticmethod
+    def cumuler(lignes, signe=1, deltas=None):
+        """
+        Deltas {(owner_id, bien_id, mois, type_ecriture, categorie): [montant, nombre]}
+        des lignes, ajoutés à deltas s'il est fourni : une modification d'écriture
+        (retrait de l'ancienne, ajout de la nouvelle) devient un seul delta net.
+        """
+        if deltas is None:
+            deltas = defaultdict(lambda: [Decimal('0'), 0])
+        for owner_id, bien_id, date_operation, type_ecriture, categorie, montant in lignes:
+            if isinstance(date_operation, str):
+                date_operation = date.fromisoformat(date_operation)
+            montant = Decimal(str(montant))
+            key = (owner_id, bien_id, date_operation.replace(day=1), type_ecriture, categorie or '')
+            deltas[key][0] += montant * signe
+            deltas[key][1] += signe
+        return deltas
+
+    def appliquer_deltas(self, deltas):
+        """
+        deltas: {(owner_id, bien_id, mois, type_ecriture, categorie): [montant, nombre]}
+
+        Les cumuls existants sont incrémentés (montant = montant + delta, atomique
+        sans verrou) : un UPDATE direct pour une seule clé, sinon lecture des clés
+        existantes puis bulk_update ; les cumuls vidés sont supprimés. Les clés
+        absentes sont créées dans un savepoint : un cumul créé entre-temps par une
+        autre transaction viole la contrainte d'unicité, ces clés sont rejouées
+        (elles deviennent des incréments). Les deltas nuls sont ignorés.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        with transaction.atomic(using=self.db, savepoint=False):
+            for tentative in range(self.TENTATIVES):
+                if not deltas:
+                    return
+                deltas = self._incrementer(deltas)
+                if not deltas:
+                    return
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.bulk_create([
+                            self.model(
+                                owner_id=owner_id, bien_id=bien_id, mois=mois, type_ecriture=type_ecriture,
+                                categorie=categorie, montant=montant, nb_ecritures=nombre,
+                            )
+                            for (owner_id, bien_id, mois, type_ecriture, categorie), (montant, nombre) in deltas.items()
+                        ], batch_size=1000)
+                    return
+                except IntegrityError:
+                    if tentative == self.TENTATIVES - 1:
+                        raise
+
+    def _incrementer(self, deltas):
+        """Incrémente les cumuls existants ; renvoie les deltas des clés à créer"""
+        now = timezone.now()
+        retraits = any(nombre < 0 for _, nombre in deltas.values())
+
+        if len(deltas) == 1:
+            (key, (montant, nombre)), = deltas.items()
+            cumul = self.filter(**dict(zip(('owner_id', 'bien_id', 'mois', 'type_ecriture', 'categorie'), key)))
+            if cumul.update(montant=F('montant') + montant, nb_ecritures=F('nb_ecritures') + nombre, updated_at=now):
+                if retraits:
+                    cumul.filter(nb_ecritures__lte=0).delete()
+                return {}
+            # Retrait sans cumul : déjà supprimé (cascade du propriétaire)
+            return deltas if nombre > 0 else {}
+
+        existants = {
+            (owner_id, bien_id, mois, type_ecriture, categorie): pk
+            for pk, owner_id, bien_id, mois, type_ecriture, categorie in self.filter(
+                owner_id__in={key[0] for key in deltas},
+                mois__in={key[2] for key in deltas},
+            ).order_by().values_list('pk', 'owner_id', 'bien_id', 'mois', 'type_ecriture', 'categorie')
+        }
+
+        a_modifier, a_creer = [], {}
+        for key, (montant, nombre) in deltas.items():
+            pk = existants.get(key)
+            if pk is not None:
+                a_modifier.append(self.model(
+                    pk=pk, montant=F('montant') + montant, nb_ecritures=F('nb_ecritures') + nombre, updated_at=now,
+                ))
+            elif nombre > 0:
+                a_creer[key] = (montant, nombre)
+
+        if a_modifier:
+            self.bulk_update(a_modifier, ['montant', 'nb_ecritures', 'updated_at'], batch_size=1000)
+            if retraits:
+                self.filter(pk__in=[cumul.pk for cumul in a_modifier], nb_ecritures__lte=0).delete()
+        return a_creer
+
+    def detacher_bien(self, bien_ids):
+        """
+        Avant la suppression de biens (bien_id mis à NULL sur les écritures) :
+        leurs cumuls sont fusionnés dans les cumuls sans bien du même mois.
+        """
+        cumuls = self.filter(bien_id__in=bien_ids)
+        deltas = defaultdict(lambda: [Decimal('0'), 0])
+        for owner_id, mois, type_ecriture, categorie, montant, nombre in cumuls.values_list(
+            'owner_id', 'mois', 'type_ecriture', 'categorie', 'montant', 'nb_ecritures'
+        ):
+            delta = deltas[(owner_id, None, mois, type_ecriture, categorie)]
+            delta[0] += montant
+            delta[1] += nombre
+        if deltas:
+            with transaction.atomic(using=self.db):
+                cumuls.delete()
+                self.appliquer_deltas(deltas)
+
+    def reconstruire(self, owner=None):
+        """Recalcule les cumuls depuis les écritures (tous les propriétaires ou un seul)"""
+        ecritures = PremiumComptableEcriture.objects.all()
+        cumuls = self.all()
+        if owner is not None:
+            ecritures = ecritures.filter(owner=owner)
+            cumuls = cumuls.filter(owner=owner)
+
+        lignes = ecritures.order_by().annotate(mois=TruncMonth('date_operation')).values(
+            'owner_id', 'bien_id', 'mois', 'type_ecriture', 'categorie',
+        ).annotate(total=Sum('montant'), nombre=Count('id'))
+
+        with transaction.atomic(using=self.db):
+            cumuls.delete()
+            created = self.bulk_create([
+                self.model(
+                    owner_id=ligne['owner_id'], bien_id=ligne['bien_id'], mois=ligne['mois'],
+                    type_ecriture=ligne['type_ecriture'], categorie=ligne['categorie'],
+                    montant=ligne['total'], nb_ecritures=ligne['nombre'],
+                )
+                for ligne in lignes.iterator()
+            ], batch_size=1000)
+        return len(created)
+
+
+class PremiumComptaMensuelle(models.Model):
+    """
+    Cumul mensuel des écritures comptables par (propriétaire, bien, mois, type, catégorie).
+    Tenu à jour à l'enregistrement / suppression des écritures, y compris les
+    écritures AUTO_LOYER créées en bulk par PremiumPayment.record_side_effects.
+    Reconstructible avec la commande rebuild_compta_mensuelle.
+    """
+    # Champs d'une écriture qui déterminent son cumul (voir PremiumComptableEcriture.rollup_values)
+    SOURCE_FIELDS = ('owner_id', 'bien_id', 'date_operation', 'type_ecriture', 'categorie', 'montant')
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='premium_compta_mensuelle')
+    bien = models.ForeignKey(PremiumBien, on_delete=models.SET_NULL, null=True, blank=True, related_name='compta_mensuelle')
+    mois = models.DateField(help_text='Premier jour du mois')
+    type_ecriture = models.CharField(max_length=10, choices=PremiumComptableEcriture.TYPE_CHOICES)
+    categorie = models.CharField(max_length=120, blank=True)
+    montant = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nb_ecritures = models.IntegerField(default=0)
+    # Mis à jour à chaque incrément : empreinte ETag du tableau de bord sans relire les écritures
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PremiumComptaMensuelleManager()
+
+    class Meta:
+        ordering = ['owner', 'mois']
+        indexes = [
+            models.Index(fields=['owner', 'mois']),
+            models.Index(fields=['owner', 'bien', 'mois']),
+        ]
+        constraints = [
+            # Un cumul par clé ; bien NULL à part (NULL distinct dans un index unique)
+            models.UniqueConstraint(
+                fields=['owner', 'bien', 'mois', 'type_ecriture', 'categorie'],
+                condition=models.Q(bien__isnull=False), name='premium_compta_mensuelle_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['owner', 'mois', 'type_ecriture', 'categorie'],
+                condition=models.Q(bien__isnull=True), name='premium_compta_mensuelle_sans_bien_uniq',
+            ),
+        ]
+
+
+class PremiumPaymentManager(models.Manager):
+    def bulk_record_payments(self, payments, bien_ids=None, batch_size=1000):
+        """
+        Enregistre un lot de paiements (import d'un mois, rent-roll) avec bulk_create,
+        puis leurs lignes d'audit (INSERT) et écritures comptables AUTO_LOYER (paiements
+        encaissés) en bulk.
+        Le nombre de requêtes ne dépend pas du nombre de paiements.
+
+        bien_ids: {bail_id: bien_id} optionnel, si l'appelant le connaît déjà.
+        """
+        payments = list(payments)
+        if not payments:
+            return []
+
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create(payments, batch_size=batch_size)
+            PremiumPayment.record_side_effects(
+                created, is_create=True, bien_ids=bien_ids, batch_size=batch_size
+            )
+        return created
 
 
 class PremiumPayment(models.Model):
     STATUT_CHOICES = [('PAYE', 'Paye'), ('PARTIEL', 'Partiel'), ('IMPAYE', 'Impaye')]
+    # Statuts pour lesquels le loyer est encaissé : écriture AUTO_LOYER "Loyer percu"
+    STATUTS_ENCAISSES = ('PAYE', 'PARTIEL')
+
+    # Champs historisés dans PremiumPaymentAuditLog
+    AUDITED_FIELDS = ('date_paiement', 'periode_debut', 'periode_fin', 'montant', 'statut')
 
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='premium_payments')
     bail = models.ForeignKey(PremiumBail, on_delete=models.CASCADE, related_name='payments')
@@ -585,27 +1173,34 @@ class PremiumPayment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PremiumPaymentManager()
+
     class Meta:
         ordering = ['-date_paiement', '-created_at']
+        indexes = [
+            models.Index(fields=['bail', 'date_paiement']),
+            models.Index(fields=['owner', 'date_paiement', 'created_at']),
+        ]
+        constraints = [
+            # Un seul loyer attendu (rent-roll) par bail et période : une génération
+            # concurrente du même mois échoue au lieu de dupliquer les loyers.
+            # Les paiements reçus (plusieurs versements partiels) ne sont pas concernés.
+            models.UniqueConstraint(
+                fields=['bail', 'periode_debut'], condition=models.Q(statut='IMPAYE'),
+                name='premium_payment_impaye_bail_periode_uniq',
+            ),
+        ]
 
-    def save(self, *args, **kwargs):
-        is_create = self.pk is None
-        old_data = None
-
-        if not is_create:
-            previous = PremiumPayment.objects.filter(pk=self.pk).first()
-            if previous is not None:
-                old_data = {
-                    'date_paiement': previous.date_paiement.isoformat() if previous.date_paiement else None,
-                    'periode_debut': previous.periode_debut.isoformat() if previous.periode_debut else None,
-                    'periode_fin': previous.periode_fin.isoformat() if previous.periode_fin else None,
-                    'montant': str(previous.montant),
-                    'statut': previous.statut,
-                }
-
-        super().save(*args, **kwargs)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Instantané des valeurs chargées : l'audit d'une mise à jour n'a pas à relire la ligne
+        if set(cls.AUDITED_FIELDS) <= set(field_names):
+            instance._loaded_snapshot = instance.audit_snapshot()
+        return instance
 
-        new_data = {
+    def audit_snapshot(self):
+        return {
             'date_paiement': self.date_paiement.isoformat() if self.date_paiement else None,
             'periode_debut': self.periode_debut.isoformat() if self.periode_debut else None,
             'periode_fin': self.periode_fin.isoformat() if self.periode_fin else None,
@@ -613,51 +1208,200 @@ class PremiumPayment(models.Model):
             'statut': self.statut,
         }
 
-        PremiumPaymentAuditLog.objects.create(
-            payment=self,
-            owner=self.owner,
-            actor=self.owner,
-            action='INSERT' if is_create else 'UPDATE',
-            old_data=old_data,
-            new_data=new_data,
-        )
+    @staticmethod
+    def record_side_effects(payments, is_create, old_data=None, bien_ids=None, batch_size=1000):
+        """
+        Insère en bulk les lignes d'audit et tient à jour les écritures AUTO_LOYER :
+        une écriture "Loyer percu" par paiement encaissé (PAYE / PARTIEL), aucune
+        pour un loyer IMPAYE. À la mise à jour, l'écriture suit le statut, le montant
+        et la date du paiement : modifiée sur place, le cumul mensuel recevant un
+        seul delta net (ancienne valeur retirée, nouvelle ajoutée).
+        old_data: {payment_id: instantané} pour les mises à jour.
+        bien_ids: {bail_id: bien_id} déjà connus de l'appelant.
+        """
+        old_data = old_data or {}
+        PremiumPaymentAuditLog.objects.bulk_create([
+            PremiumPaymentAuditLog(
+                payment_id=payment.pk,
+                owner_id=payment.owner_id,
+                actor_id=payment.owner_id,
+                action='INSERT' if is_create else 'UPDATE',
+                old_data=old_data.get(payment.pk),
+                new_data=payment.audit_snapshot(),
+            )
+            for payment in payments
+        ], batch_size=batch_size)
 
         if is_create:
-            PremiumComptableEcriture.objects.create(
-                owner=self.owner,
-                bien=self.bail.bien,
-                bail=self.bail,
+            # Loyers IMPAYE (rent-roll) : ni historique, ni écriture
+            encaisses = [payment for payment in payments if payment.statut in PremiumPayment.STATUTS_ENCAISSES]
+            if encaisses:
+                PremiumLocataire.objects.fusionner_historique(encaisses)
+                PremiumPayment.ecrire_loyers(encaisses, bien_ids=bien_ids, batch_size=batch_size)
+            return
+
+        # Seuls les locataires dont un paiement encaissé (avant ou après) a changé sont mis à jour
+        historises = [
+            payment for payment in payments
+            if old_data.get(payment.pk) != payment.audit_snapshot() and (
+                payment.statut in PremiumPayment.STATUTS_ENCAISSES
+                # Valeurs précédentes inconnues : le paiement a pu figurer dans le cache
+                or (old_data.get(payment.pk) or {'statut': 'PAYE'})['statut'] in PremiumPayment.STATUTS_ENCAISSES
+            )
+        ]
+        if historises:
+            PremiumLocataire.objects.fusionner_historique(historises)
+
+        modifies = {
+            payment.pk: payment for payment in payments
+            if PremiumPayment.ecriture_a_refaire(old_data.get(payment.pk), payment.audit_snapshot())
+        }
+        if not modifies:
+            return
+
+        ecritures = PremiumComptableEcriture.objects.filter(
+            source='AUTO_LOYER', payment_id__in=list(modifies)
+        ).only(*PremiumComptaMensuelle.SOURCE_FIELDS, 'payment_id')
+        a_modifier, a_supprimer, ecrites = [], [], set()
+        for ecriture in ecritures:
+            payment = modifies[ecriture.payment_id]
+            if payment.statut in PremiumPayment.STATUTS_ENCAISSES:
+                ecriture.date_operation = payment.date_paiement
+                ecriture.montant = payment.montant
+                a_modifier.append(ecriture)
+                ecrites.add(payment.pk)
+            else:
+                a_supprimer.append(ecriture.pk)
+
+        if a_supprimer:
+            # Loyer plus encaissé : écriture supprimée (post_delete la retire du cumul)
+            PremiumComptableEcriture.objects.filter(pk__in=a_supprimer).delete()
+
+        deltas = PremiumComptaMensuelle.objects.cumuler(
+            (ecriture._rollup_snapshot for ecriture in a_modifier), signe=-1
+        )
+        if a_modifier:
+            now = timezone.now()
+            for ecriture in a_modifier:
+                ecriture.updated_at = now
+            PremiumComptableEcriture.objects.bulk_update(
+                a_modifier, ['date_operation', 'montant', 'updated_at'], batch_size=batch_size
+            )
+            PremiumComptaMensuelle.objects.cumuler(
+                (ecriture.rollup_values() for ecriture in a_modifier), deltas=deltas
+            )
+
+        # Paiement devenu encaissé (ou écriture manquante) : nouvelle écriture
+        encaisses = [
+            payment for pk, payment in modifies.items()
+            if pk not in ecrites and payment.statut in PremiumPayment.STATUTS_ENCAISSES
+        ]
+        if encaisses:
+            PremiumPayment.ecrire_loyers(encaisses, bien_ids=bien_ids, batch_size=batch_size, deltas=deltas)
+        PremiumComptaMensuelle.objects.appliquer_deltas(deltas)
+
+    @staticmethod
+    def ecriture_a_refaire(avant, apres):
+        """Une mise à jour change-t-elle l'écriture AUTO_LOYER du paiement ?"""
+        if avant is None:
+            # Valeurs précédentes inconnues : écriture réalignée sur le paiement
+            return True
+        encaisse_avant = avant['statut'] in PremiumPayment.STATUTS_ENCAISSES
+        encaisse_apres = apres['statut'] in PremiumPayment.STATUTS_ENCAISSES
+        if encaisse_avant != encaisse_apres:
+            return True
+        return encaisse_apres and (avant['montant'], avant['date_paiement']) != (apres['montant'], apres['date_paiement'])
+
+    @staticmethod
+    def ecrire_loyers(payments, bien_ids=None, batch_size=1000, deltas=None):
+        """
+        Écritures AUTO_LOYER "Loyer percu" des paiements encaissés, reportées dans le
+        cumul mensuel (ou ajoutées à deltas, appliqué ensuite par l'appelant)
+        """
+        # bien_id lu sur le bail déjà chargé, sinon en une requête pour tout le lot
+        bien_ids = dict(bien_ids or {})
+        bien_ids.update(
+            (payment.bail_id, payment.bail.bien_id)
+            for payment in payments
+            if PremiumPayment.bail.is_cached(payment)
+        )
+        missing = {payment.bail_id for payment in payments} - set(bien_ids)
+        if missing:
+            bien_ids.update(PremiumBail.objects.filter(pk__in=missing).values_list('id', 'bien_id'))
+
+        ecritures = PremiumComptableEcriture.objects.bulk_create([
+            PremiumComptableEcriture(
+                owner_id=payment.owner_id,
+                bien_id=bien_ids.get(payment.bail_id),
+                bail_id=payment.bail_id,
+                payment_id=payment.pk,
                 type_ecriture='REVENU',
                 source='AUTO_LOYER',
                 libelle='Loyer percu',
                 categorie='LOYER',
-                date_operation=self.date_paiement,
-                montant=self.montant,
-                metadata={'payment_id': self.id},
+                date_operation=payment.date_paiement,
+                montant=payment.montant,
+                metadata={'payment_id': payment.pk},
             )
+            for payment in payments
+        ], batch_size=batch_size)
+        # bulk_create ne passe pas par save() : report explicite dans le cumul mensuel
+        lignes = (ecriture.rollup_values() for ecriture in ecritures)
+        if deltas is None:
+            PremiumComptaMensuelle.objects.appliquer(lignes)
+        else:
+            PremiumComptaMensuelle.objects.cumuler(lignes, deltas=deltas)
 
-    def delete(self, *args, **kwargs):
-        old_data = {
-            'date_paiement': self.date_paiement.isoformat() if self.date_paiement else None,
-            'periode_debut': self.periode_debut.isoformat() if self.periode_debut else None,
-            'periode_fin': self.periode_fin.isoformat() if self.periode_fin else None,
-            'montant': str(self.montant),
-            'statut': self.statut,
-        }
+    def save(self, *args, **kwargs):
+        is_create = self.pk is None
+        old_data = None
 
-        payment_id = self.id
-        owner = self.owner
+        if not is_create:
+            old_data = getattr(self, '_loaded_snapshot', None)
+            if old_data is None:
+                # Instance construite hors ORM : pas d'instantané, on relit les champs audités
+                previous = PremiumPayment.objects.filter(pk=self.pk).only(*self.AUDITED_FIELDS).first()
+                if previous is not None:
+                    old_data = previous.audit_snapshot()
+
+        if old_data is not None and old_data == self.audit_snapshot():
+            # Ni montant, ni statut, ni dates modifiés : pas d'audit ni d'écriture à revoir
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.record_side_effects(
+                [self],
+                is_create=is_create,
+                old_data={self.pk: old_data} if old_data is not None else None,
+            )
 
-        super().delete(*args, **kwargs)
+        self._loaded_snapshot = self.audit_snapshot()
 
-        PremiumPaymentAuditLog.objects.create(
-            payment=None,
-            owner=owner,
-            actor=owner,
-            action='DELETE',
-            old_data={**old_data, 'payment_id': payment_id},
-            new_data=None,
-        )
+    def delete(self, *args, **kwargs):
+        old_data = self.audit_snapshot()
+        payment_id = self.id
+        owner_id = self.owner_id
+        bail_id = self.bail_id
+
+        with transaction.atomic():
+            # Loyer perçu annulé avec le paiement (post_delete le retire du cumul)
+            self.ecritures.filter(source='AUTO_LOYER').delete()
+            result = super().delete(*args, **kwargs)
+
+            PremiumPaymentAuditLog.objects.create(
+                payment=None,
+                owner_id=owner_id,
+                actor_id=owner_id,
+                action='DELETE',
+                old_data={**old_data, 'payment_id': payment_id},
+                new_data=None,
+            )
+            PremiumLocataire.objects.rafraichir_historique(
+                PremiumLocataire.objects.filter(baux__id=bail_id)
+            )
+        return result
 
 
 class PremiumPaymentAuditLog(models.Model):
@@ -673,6 +1417,52 @@ class PremiumPaymentAuditLog(models.Model):
 
     class Meta:
         ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['owner', 'changed_at']),
+        ]
+
+
+class PremiumPaymentAuditArchive(models.Model):
+    """
+    Mois d'audit archivé pour un propriétaire : les lignes de PremiumPaymentAuditLog
+    du mois ont été déplacées dans un fichier JSONL compressé (gzip).
+    Voir api/audit_archive.py et les commandes archive_audit_logs / restore_audit_logs.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='premium_audit_archives')
+    mois = models.DateField(help_text='Premier jour du mois archivé')
+    fichier = models.CharField(max_length=255)
+    nb_lignes = models.IntegerField(default=0)
+    premier_changement = models.DateTimeField(null=True, blank=True)
+    dernier_changement = models.DateTimeField(null=True, blank=True)
+    premier_id = models.BigIntegerField(null=True, blank=True, help_text='Plus petit id de ligne archivée')
+    dernier_id = models.BigIntegerField(null=True, blank=True, help_text='Plus grand id de ligne archivée')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['owner', '-mois']
+        unique_together = ('owner', 'mois')
+
+
+class PremiumRgpdPurgeLog(models.Model):
+    """Rapport d'une purge RGPD par lots (commande purge_rgpd_locataires ou API)"""
+    DECLENCHEUR_CHOICES = [('COMMANDE', 'Commande'), ('API', 'API')]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='premium_rgpd_purges', help_text='Périmètre (vide : tous les propriétaires)'
+    )
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    declencheur = models.CharField(max_length=10, choices=DECLENCHEUR_CHOICES)
+    date_limite = models.DateField(help_text='Locataires partis au plus tard à cette date')
+    dry_run = models.BooleanField(default=False)
+    nb_locataires = models.IntegerField(default=0)
+    par_proprietaire = models.JSONField(default=dict, blank=True)
+    duree_secondes = models.FloatField(default=0)
+    lance_le = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-lance_le']
 
 
 class DossierLocataire(models.Model):
@@ -706,4 +1496,17 @@ class DossierLocataire(models.Model):
         ordering = ['-date_creation']
 
     def __str__(self):
-        return f"Dossier {self.prenom} {self.nom} - Location #{self.location.id}"
\ No newline at end of file
+        return f"Dossier {self.prenom} {self.nom} - Location #{self.location.id}"
+
+
+def retirer_ecriture_du_cumul(instance, **kwargs):
+    PremiumComptaMensuelle.objects.appliquer([instance.rollup_values()], signe=-1)
+
+
+def detacher_cumuls_du_bien(instance, **kwargs):
+    # Les écritures du bien passent à bien NULL (SET_NULL) : leurs cumuls aussi, sans doublon
+    PremiumComptaMensuelle.objects.detacher_bien([instance.pk])
+
+
+post_delete.connect(retirer_ecriture_du_cumul, sender=PremiumComptableEcriture)
+pre_delete.connect(detacher_cumuls_du_bien, sender=PremiumBien)
@@ -1,5 +1,10 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -20,4 +25,63 @@ class StandardResultsSetPagination(PageNumberPagination):
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'results': data
-        })
\ No newline at end of file
+        })
+
+
+class LinksCursorPagination(CursorPagination):
+    """
+    Pagination par curseur : pas de COUNT ni d'OFFSET, le coût d'une page ne
+    dépend pas de sa position. Réponse {links, results}.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        return Response({
+            'links': {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link()
+            },
+            'results': data
+        })
+
+
+class FavorisCursorPagination(LinksCursorPagination):
+    """
+    Pagination par curseur des favoris (?pagination=cursor), triée par date d'ajout.
+    """
+    ordering = '-date_favori'
+
+
+class AuditLogCursorPagination(LinksCursorPagination):
+    """
+    Historique d'audit des paiements, du plus récent au plus ancien
+    (index owner, changed_at).
+
+    Le curseur (?cursor=) encode la position (changed_at, id) de la dernière
+    ligne servie : même format que la page vienne de la table seule ou de sa
+    fusion avec les mois archivés (api/audit_archive.audit_page). Pagination
+    vers l'avant uniquement.
+    """
+    page_size = 50
+    max_page_size = 200
+    ordering = ('-changed_at', '-id')
+
+    def decode_position(self, request):
+        """Position (changed_at, id) du curseur de la requête, None en première page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            changed_at, pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').rsplit('_', 1)
+            return datetime.fromisoformat(changed_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_position_link(self, request, position):
+        if position is None:
+            return None
+        changed_at, pk = position
+        encoded = urlsafe_b64encode(f'{changed_at.isoformat()}_{pk}'.encode('ascii')).decode('ascii')
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, encoded)
@@ -0,0 +1,39 @@
+"""
+Lecture JSON rapide basée sur orjson (repli sur le JSONParser de DRF).
+
+Les corps UTF-8 sont décodés par orjson ; les autres encodages, et tout corps
+qu'orjson refuse ou lit autrement (JSON invalide, NaN, nombres de 19 chiffres
+et plus), repassent par le JSONParser de DRF, qui garde ses résultats et ses
+messages d'erreur.
+"""
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+# orjson lit en float les entiers au-delà de 64 bits : les corps contenant 19
+# chiffres consécutifs vont au parseur de DRF (recherche en C, sans regex)
+CHIFFRES = bytes(ord('0') if chr(octet).isdigit() else ord(' ') for octet in range(128)) + b' ' * 128
+NOMBRE_LONG = b'0' * 19
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser dont le décodage UTF-8 est fait par orjson quand il est installé"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if NOMBRE_LONG in body.translate(CHIFFRES):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
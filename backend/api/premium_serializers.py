@@ -29,13 +29,18 @@ class PremiumAppartementTypeSerializer(serializers.ModelSerializer):
 class PremiumBienSerializer(serializers.ModelSerializer):
     category_label = serializers.CharField(source='category.label', read_only=True)
     appartement_type_label = serializers.CharField(source='appartement_type.label', read_only=True)
+    # Présente uniquement avec la recherche par rayon (annotation de api.geo)
+    distance_km = serializers.FloatField(read_only=True)
+
+    # Attributs lus par les champs calculés (?fields=, voir api/fieldsets.py)
+    field_sources = {'distance_km': ()}
 
     class Meta:
         model = PremiumBien
         fields = [
             'id', 'category', 'category_label', 'appartement_type', 'appartement_type_label',
             'titre', 'adresse', 'description', 'equipements', 'loyer_hc', 'charges',
-            'latitude', 'longitude', 'statut', 'created_at', 'updated_at'
+            'latitude', 'longitude', 'statut', 'created_at', 'updated_at', 'distance_km'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'category_label', 'appartement_type_label']
 
@@ -68,7 +73,8 @@ class PremiumLocataireSerializer(serializers.ModelSerializer):
             'piece_identite', 'garant', 'historique_paiements', 'date_depart', 'is_purged',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'is_purged', 'created_at', 'updated_at']
+        # historique_paiements : cache des derniers paiements encaissés, voir /premium/locataires/<id>/paiements/
+        read_only_fields = ['id', 'historique_paiements', 'is_purged', 'created_at', 'updated_at']
 
     def create(self, validated_data):
         piece_identite = validated_data.pop('piece_identite', '')
@@ -106,6 +112,9 @@ class PremiumBailSerializer(serializers.ModelSerializer):
     bien_titre = serializers.CharField(source='bien.titre', read_only=True)
     locataire_nom = serializers.SerializerMethodField()
 
+    # Attributs lus par les champs calculés (?fields=, voir api/fieldsets.py)
+    field_sources = {'locataire_nom': ('locataire.nom', 'locataire.prenoms')}
+
     class Meta:
         model = PremiumBail
         fields = [
@@ -167,6 +176,13 @@ class PremiumPaymentAuditLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'payment', 'action', 'old_data', 'new_data', 'changed_at']
 
 
+class PremiumPaymentAuditLogListSerializer(serializers.ModelSerializer):
+    """Ligne d'audit sans les instantanés JSON (récupérés à la demande)"""
+    class Meta:
+        model = PremiumPaymentAuditLog
+        fields = ['id', 'payment', 'action', 'changed_at']
+
+
 class PremiumPaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = PremiumPayment
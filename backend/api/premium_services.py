@@ -0,0 +1,429 @@
+"""
+Traitements de masse du module Premium (hors cycle requête / réponse unitaire).
+"""
+import calendar
+import csv
+import io
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Count, Q
+
+from .models import PremiumBail, PremiumLocataire, PremiumPayment, PremiumRgpdPurgeLog
+
+CENTIME = Decimal('0.01')
+
+
+def parse_month(value):
+    """'YYYY-MM' -> date du premier jour du mois (ValueError si invalide)"""
+    try:
+        year, month = (int(part) for part in str(value).split('-'))
+        return date(year, month, 1)
+    except (TypeError, ValueError):
+        raise ValueError("Mois invalide, format attendu: YYYY-MM")
+
+
+def month_bounds(month_start):
+    last_day = calendar.monthrange(month_start.year, month_start.month)[1]
+    return month_start, month_start.replace(day=last_day)
+
+
+def period_bounds(value):
+    """
+    Période -> (premier jour, dernier jour) inclus.
+    Formats: 'YYYY', 'YYYY-MM', 'YYYY-Tn' / 'YYYY-Qn' (trimestre), 'YYYY-MM-DD'.
+    """
+    text = str(value).strip().upper()
+    try:
+        if len(text) == 4:
+            year = int(text)
+            return date(year, 1, 1), date(year, 12, 31)
+        if len(text) == 7 and text[5] in ('T', 'Q'):
+            year, quarter = int(text[:4]), int(text[6])
+            if not 1 <= quarter <= 4:
+                raise ValueError
+            start = date(year, 3 * quarter - 2, 1)
+            return start, month_bounds(date(year, 3 * quarter, 1))[1]
+        if len(text) == 7:
+            return month_bounds(parse_month(text))
+        day = date.fromisoformat(text)
+        return day, day
+    except ValueError:
+        raise ValueError("Période invalide, formats acceptés: YYYY, YYYY-MM, YYYY-Tn, YYYY-MM-DD")
+
+
+def full_years_between(start, end):
+    """Nombre d'anniversaires de start atteints à la date end"""
+    years = end.year - start.year
+    if (end.month, end.day) < (start.month, start.day):
+        years -= 1
+    return max(years, 0)
+
+
+def expected_rent(loyer_hc, charges, revision_annuelle, date_entree, month_start):
+    """
+    Loyer attendu pour le mois : (loyer_hc + charges) révisé de revision_annuelle %
+    à chaque anniversaire du bail (révision composée).
+    """
+    base = (loyer_hc or Decimal('0')) + (charges or Decimal('0'))
+    years = full_years_between(date_entree, month_start)
+    if not years or not revision_annuelle:
+        return base.quantize(CENTIME, rounding=ROUND_HALF_UP)
+    factor = (Decimal('1') + revision_annuelle / Decimal('100')) ** years
+    return (base * factor).quantize(CENTIME, rounding=ROUND_HALF_UP)
+
+
+def prorata(montant, month_start, debut, fin):
+    """
+    Loyer mensuel ramené aux jours occupés [debut, fin] du mois (bornes incluses,
+    None : pas de borne) ; montant entier si le bail couvre tout le mois.
+    """
+    month_start, month_end = month_bounds(month_start)
+    debut = max(debut, month_start) if debut else month_start
+    fin = min(fin, month_end) if fin else month_end
+    jours = (fin - debut).days + 1
+    if jours >= month_end.day:
+        return montant
+    return (montant * max(jours, 0) / month_end.day).quantize(CENTIME, rounding=ROUND_HALF_UP)
+
+
+def generate_rent_roll(month_start, owner=None, dry_run=False, chunk_size=2000):
+    """
+    Génère les PremiumPayment IMPAYE du mois pour chaque bail ACTIF en cours sur
+    le mois, avec leurs lignes d'audit (bulk). Aucune écriture comptable : le
+    loyer n'est comptabilisé qu'une fois le paiement passé PAYE / PARTIEL.
+    Un bail commencé ou terminé en cours de mois est facturé au prorata des
+    jours occupés, sur la période correspondante.
+
+    Idempotent : un bail ayant déjà un paiement couvrant une partie du mois est
+    ignoré, et la contrainte premium_payment_impaye_bail_periode_uniq fait échouer
+    une génération concurrente du même mois.
+    Les baux sont lus en values_list (pas d'instances) et les insertions faites par
+    lots de chunk_size, le tout dans une transaction.
+    """
+    month_start, month_end = month_bounds(month_start)
+
+    baux = PremiumBail.objects.filter(
+        Q(date_sortie__isnull=True) | Q(date_sortie__gte=month_start),
+        statut='ACTIF',
+        date_entree__lte=month_end,
+    )
+    deja_couverts = PremiumPayment.objects.filter(
+        bail__in=baux,
+        periode_debut__lte=month_end,
+        periode_fin__gte=month_start,
+    )
+    if owner is not None:
+        baux = baux.filter(owner=owner)
+        deja_couverts = deja_couverts.filter(owner=owner)
+
+    deja_couverts = set(deja_couverts.values_list('bail_id', flat=True))
+    rows = baux.order_by('id').values_list(
+        'id', 'owner_id', 'bien_id', 'date_entree', 'date_sortie', 'revision_annuelle',
+        'bien__loyer_hc', 'bien__charges',
+    )
+
+    report = {
+        'mois': month_start.strftime('%Y-%m'),
+        'baux_actifs': 0,
+        'deja_presents': 0,
+        'crees': 0,
+        'montant_total': Decimal('0'),
+    }
+
+    pending = []
+    bien_ids = {}
+
+    def flush():
+        if not dry_run:
+            PremiumPayment.objects.bulk_record_payments(pending, bien_ids=bien_ids, batch_size=chunk_size)
+        pending.clear()
+        bien_ids.clear()
+
+    with transaction.atomic():
+        # Lignes matérialisées avant les insertions (tuples, pas d'instances)
+        for bail_id, owner_id, bien_id, date_entree, date_sortie, revision, loyer_hc, charges in list(rows):
+            report['baux_actifs'] += 1
+            if bail_id in deja_couverts:
+                report['deja_presents'] += 1
+                continue
+
+            periode_debut = max(date_entree, month_start)
+            periode_fin = min(date_sortie, month_end) if date_sortie else month_end
+            montant = prorata(
+                expected_rent(loyer_hc, charges, revision, date_entree, month_start),
+                month_start, periode_debut, periode_fin,
+            )
+            pending.append(PremiumPayment(
+                owner_id=owner_id,
+                bail_id=bail_id,
+                date_paiement=periode_debut,
+                periode_debut=periode_debut,
+                periode_fin=periode_fin,
+                montant=montant,
+                statut='IMPAYE',
+            ))
+            bien_ids[bail_id] = bien_id
+            report['crees'] += 1
+            report['montant_total'] += montant
+
+            if len(pending) >= chunk_size:
+                flush()
+
+        if pending:
+            flush()
+
+    return report
+
+
+def month_index(value):
+    """date -> index de mois absolu (année * 12 + mois - 1)"""
+    return value.year * 12 + value.month - 1
+
+
+def month_from_index(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def echeance_loyer(jour, date_entree):
+    """
+    Date d'exigibilité du loyer du mois de jour : settings.PREMIUM_LOYER_JOUR_ECHEANCE
+    (borné à la fin du mois), pas avant l'entrée dans les lieux.
+    """
+    month_start, month_end = month_bounds(jour.replace(day=1))
+    echeance = month_start.replace(day=min(max(settings.PREMIUM_LOYER_JOUR_ECHEANCE, 1), month_end.day))
+    return max(echeance, date_entree)
+
+
+def compute_arrears(owner=None, as_of=None, bien_id=None):
+    """
+    Impayés par bail ACTIF, de son mois d'entrée jusqu'au mois as_of inclus
+    (ou jusqu'à date_sortie). Les mois d'entrée et de sortie en cours de mois
+    sont attendus au prorata des jours occupés (comme generate_rent_roll).
+    Le mois de as_of n'est compté qu'une fois le loyer exigible (échéance, voir
+    echeance_loyer).
+
+    Les montants des paiements PAYE / PARTIEL sont répartis uniformément sur les
+    mois de leur période [periode_debut, periode_fin] ; un mois est en retard si
+    le montant réparti est inférieur au loyer attendu (expected_rent). Les
+    paiements IMPAYE (générés par le rent-roll) ne couvrent rien.
+
+    Deux requêtes values_list (baux, paiements) puis un passage en mémoire :
+    aucune requête par bail.
+    """
+    as_of = as_of or date.today()
+    last_index = month_index(as_of)
+    _, as_of_end = month_bounds(as_of.replace(day=1))
+
+    baux = PremiumBail.objects.filter(statut='ACTIF', date_entree__lte=as_of_end)
+    if owner is not None:
+        baux = baux.filter(owner=owner)
+    if bien_id:
+        baux = baux.filter(bien_id=bien_id)
+
+    payments = PremiumPayment.objects.filter(
+        bail__in=baux,
+        statut__in=('PAYE', 'PARTIEL'),
+        periode_debut__lte=as_of_end,
+    ).order_by().values_list('bail_id', 'periode_debut', 'periode_fin', 'montant')
+
+    paid = defaultdict(Decimal)
+    for bail_id, periode_debut, periode_fin, montant in payments.iterator(chunk_size=5000):
+        first = month_index(periode_debut)
+        last = max(month_index(periode_fin), first)
+        if first == last:
+            paid[(bail_id, first)] += montant
+            continue
+        share = montant / (last - first + 1)
+        for index in range(first, last + 1):
+            paid[(bail_id, index)] += share
+
+    rows = baux.order_by('id').values_list(
+        'id', 'bien_id', 'bien__titre', 'locataire__nom', 'locataire__prenoms',
+        'date_entree', 'date_sortie', 'revision_annuelle', 'bien__loyer_hc', 'bien__charges',
+    )
+
+    zero = Decimal('0')
+    result = []
+    total_du = zero
+    for (bail_id, bail_bien_id, bien_titre, nom, prenoms, date_entree, date_sortie,
+         revision, loyer_hc, charges) in rows:
+        first = month_index(date_entree)
+        last_sortie = month_index(date_sortie) if date_sortie else None
+        last = min(last_index, last_sortie) if date_sortie else last_index
+        if last == last_index and as_of < echeance_loyer(as_of, date_entree):
+            last -= 1
+        # Le 1er du mois index a passé l'anniversaire n° (index - anniversaire) // 12
+        anniversaire = first + (1 if date_entree.day > 1 else 0)
+
+        # Loyer attendu par année de bail (la révision change à chaque anniversaire)
+        rent_by_years = {}
+        mois_impayes = []
+        montant_du = zero
+        for index in range(first, last + 1):
+            years = max((index - anniversaire) // 12, 0)
+            expected = rent_by_years.get(years)
+            if expected is None:
+                expected = rent_by_years[years] = expected_rent(
+                    loyer_hc, charges, revision, date_entree, month_from_index(index)
+                )
+            if (index == first and date_entree.day > 1) or (date_sortie and index == last_sortie):
+                expected = prorata(expected, month_from_index(index), date_entree, date_sortie)
+            recu = paid.get((bail_id, index), zero)
+            if recu < expected:
+                # Parts de paiements multi-mois : arrondi au centime avant comparaison
+                recu = recu.quantize(CENTIME, rounding=ROUND_HALF_UP)
+                if recu < expected:
+                    mois_impayes.append(f'{index // 12:04d}-{index % 12 + 1:02d}')
+                    montant_du += expected - recu
+
+        if mois_impayes:
+            total_du += montant_du
+            result.append({
+                'bail_id': bail_id,
+                'bien_id': bail_bien_id,
+                'bien_titre': bien_titre,
+                'locataire_nom': f"{nom} {prenoms}".strip(),
+                'mois_impayes': mois_impayes,
+                'montant_du': montant_du,
+            })
+
+    result.sort(key=lambda item: item['montant_du'], reverse=True)
+    return {
+        'mois': as_of.strftime('%Y-%m'),
+        'nb_baux_en_retard': len(result),
+        'total_du': total_du,
+        'baux': result,
+    }
+
+
+EXPORT_CSV_COLUMNS = (
+    'id', 'date_operation', 'type_ecriture', 'source', 'categorie', 'libelle',
+    'montant', 'bien_id', 'bien_titre', 'bail_id',
+)
+
+# Colonnes du Fichier des Écritures Comptables (article A47 A-1 du LPF)
+EXPORT_FEC_COLUMNS = (
+    'JournalCode', 'JournalLib', 'EcritureNum', 'EcritureDate', 'CompteNum', 'CompteLib',
+    'CompAuxNum', 'CompAuxLib', 'PieceRef', 'PieceDate', 'EcritureLib', 'Debit', 'Credit',
+    'EcritureLet', 'DateLet', 'ValidDate', 'Montantdevise', 'Idevise',
+)
+
+# Plan de comptes simplifié : une écriture = deux lignes équilibrées, le compte
+# de gestion (produit ou charge) et sa contrepartie en banque.
+# type -> (journal, libellé journal, compte, libellé compte, compte débité)
+FEC_COMPTES = {
+    'REVENU': ('VE', 'Ventes', '706000', 'Loyers et prestations', False),
+    'DEPENSE': ('AC', 'Achats', '615000', 'Entretien et charges', True),
+}
+FEC_CONTREPARTIE = ('512000', 'Banque')
+
+
+def _fec_text(value):
+    """Le FEC ne gère pas les guillemets : séparateur et retours à la ligne remplacés"""
+    return (value or '').replace('|', ' ').replace('\r', ' ').replace('\n', ' ').replace('"', "'")
+
+
+def _stream_rows(header, rows, format_rows, delimiter, chunk_rows):
+    """
+    Génère le fichier par blocs de chunk_rows enregistrements (mémoire constante).
+    format_rows: enregistrement -> lignes du fichier.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+    writer.writerow(header)
+    count = 0
+    for row in rows:
+        writer.writerows(format_rows(row))
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ecritures_csv(queryset, chunk_size=2000):
+    """Export CSV des écritures (values_list + iterator, sans instances)"""
+    rows = queryset.order_by('date_operation', 'id').values_list(
+        'id', 'date_operation', 'type_ecriture', 'source', 'categorie', 'libelle',
+        'montant', 'bien_id', 'bien__titre', 'bail_id',
+    ).iterator(chunk_size=chunk_size)
+
+    def format_rows(row):
+        return [[value.isoformat() if isinstance(value, date) else value for value in row]]
+
+    return _stream_rows(EXPORT_CSV_COLUMNS, rows, format_rows, ',', chunk_size)
+
+
+def iter_ecritures_fec(queryset, chunk_size=2000):
+    """
+    Export au format FEC : colonnes fixes séparées par '|', dates AAAAMMJJ, décimales à virgule.
+    Chaque écriture donne deux lignes de même EcritureNum, débit et crédit égaux :
+    revenu = banque au débit / 706000 au crédit, dépense = 615000 au débit / banque au crédit.
+    """
+    rows = queryset.order_by('date_operation', 'id').values_list(
+        'id', 'date_operation', 'type_ecriture', 'libelle', 'montant',
+        'bien_id', 'bien__titre', 'bail_id', 'created_at',
+    ).iterator(chunk_size=chunk_size)
+
+    def format_rows(row):
+        ecriture_id, date_operation, type_ecriture, libelle, montant, bien_id, bien_titre, bail_id, created_at = row
+        journal_code, journal_lib, compte_num, compte_lib, compte_debite = FEC_COMPTES[type_ecriture]
+        montant = f'{montant:.2f}'.replace('.', ',')
+        date_fec = date_operation.strftime('%Y%m%d')
+        debut = [journal_code, journal_lib, ecriture_id, date_fec]
+        fin = [bail_id or ecriture_id, date_fec, _fec_text(libelle)]
+        validation = ['', '', created_at.strftime('%Y%m%d'), '', '']
+
+        def montants(debit):
+            return [montant, '0,00'] if debit else ['0,00', montant]
+
+        return [
+            debut + [compte_num, compte_lib, bien_id or '', _fec_text(bien_titre)] + fin
+            + montants(compte_debite) + validation,
+            debut + [*FEC_CONTREPARTIE, '', ''] + fin + montants(not compte_debite) + validation,
+        ]
+
+    return _stream_rows(EXPORT_FEC_COLUMNS, rows, format_rows, '|', chunk_size)
+
+
+def purge_departed_locataires(retention_jours=None, owner=None, actor=None, declencheur='COMMANDE',
+                              dry_run=False, chunk_size=5000):
+    """
+    Purge RGPD de tous les locataires partis depuis plus de retention_jours
+    (défaut: settings.RGPD_RETENTION_DAYS), tous propriétaires ou un seul.
+    Un UPDATE par lot de chunk_size, aucune instance chargée.
+    Le rapport est enregistré dans PremiumRgpdPurgeLog.
+    """
+    retention_jours = settings.RGPD_RETENTION_DAYS if retention_jours is None else retention_jours
+    date_limite = timezone.now().date() - timedelta(days=retention_jours)
+
+    eligibles = PremiumLocataire.objects.eligibles_purge(date_limite)
+    if owner is not None:
+        eligibles = eligibles.filter(owner=owner)
+
+    debut = time.perf_counter()
+    if dry_run:
+        par_proprietaire = {
+            str(ligne['owner_id']): ligne['total']
+            for ligne in eligibles.order_by().values('owner_id').annotate(total=Count('id'))
+        }
+    else:
+        par_proprietaire = PremiumLocataire.objects.purger(eligibles, chunk_size=chunk_size)
+
+    return PremiumRgpdPurgeLog.objects.create(
+        owner=owner,
+        actor=actor,
+        declencheur=declencheur,
+        date_limite=date_limite,
+        dry_run=dry_run,
+        nb_locataires=sum(par_proprietaire.values()),
+        par_proprietaire=par_proprietaire,
+        duree_secondes=round(time.perf_counter() - debut, 3),
+    )
@@ -1,8 +1,14 @@
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Sum, Q, OuterRef, Subquery, Value
+from django.db.models.functions import Concat, Trim
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
-from rest_framework import viewsets, status
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, generics, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -14,10 +20,28 @@ from .models import (
     PremiumLocataire,
     PremiumBail,
     PremiumComptableEcriture,
+    PremiumComptaMensuelle,
     PremiumPayment,
     PremiumPaymentAuditLog,
+    PremiumPaymentAuditArchive,
 )
+from .audit_archive import archived_log, audit_page
+from .columnar import ColumnarListMixin
+from .fieldsets import SparseFieldsetMixin
+from .geo import GeoFilterBackend
+from .caching import ConditionalGetMixin, ConditionalAPIViewMixin, conditional_get, aggregate_fingerprint
+from .pagination import AuditLogCursorPagination
 from .permissions import IsPremiumUser
+from .premium_services import (
+    parse_month,
+    month_bounds,
+    period_bounds,
+    generate_rent_roll,
+    compute_arrears,
+    purge_departed_locataires,
+    iter_ecritures_csv,
+    iter_ecritures_fec,
+)
 from .premium_serializers import (
     PremiumCategorySerializer,
     PremiumAppartementTypeSerializer,
@@ -27,10 +51,11 @@ from .premium_serializers import (
     PremiumComptableEcritureSerializer,
     PremiumPaymentSerializer,
     PremiumPaymentAuditLogSerializer,
+    PremiumPaymentAuditLogListSerializer,
 )
 
 
-class PremiumOwnedModelViewSet(viewsets.ModelViewSet):
+class PremiumOwnedModelViewSet(ConditionalGetMixin, ColumnarListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsPremiumUser]
 
     def get_queryset(self):
@@ -53,6 +78,10 @@ class PremiumAppartementTypeViewSet(PremiumOwnedModelViewSet):
 class PremiumBienViewSet(PremiumOwnedModelViewSet):
     queryset = PremiumBien.objects.select_related('category', 'appartement_type').all()
     serializer_class = PremiumBienSerializer
+    conditional_timestamp_fields = ('updated_at', 'category__updated_at', 'appartement_type__updated_at')
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, GeoFilterBackend]
+    # distance_km (recherche par rayon) est trié par GeoFilterBackend
+    ordering_fields = ['titre', 'loyer_hc', 'charges', 'statut', 'created_at', 'updated_at']
 
 
 class PremiumLocataireViewSet(PremiumOwnedModelViewSet):
@@ -66,10 +95,29 @@ class PremiumLocataireViewSet(PremiumOwnedModelViewSet):
             queryset = queryset.filter(baux__bien_id=bien_id).distinct()
         return queryset
 
+    @action(detail=True, methods=['get'])
+    def paiements(self, request, pk=None):
+        """Historique paginé des paiements du locataire (tous ses baux), du plus récent au plus ancien"""
+        locataire = self.get_object()
+        payments = PremiumPayment.objects.filter(
+            owner=request.user, bail__locataire=locataire
+        ).order_by('-date_paiement', '-id')
+
+        page = self.paginate_queryset(payments)
+        if page is not None:
+            serializer = PremiumPaymentSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = PremiumPaymentSerializer(payments, many=True)
+        return Response(serializer.data)
+
 
 class PremiumBailViewSet(PremiumOwnedModelViewSet):
     queryset = PremiumBail.objects.select_related('bien', 'locataire').all()
     serializer_class = PremiumBailSerializer
+    conditional_timestamp_fields = ('updated_at', 'bien__updated_at', 'locataire__updated_at')
+    # ?format=columnar : locataire_nom calculé en SQL
+    columnar_fields = {'locataire_nom': Trim(Concat('locataire__nom', Value(' '), 'locataire__prenoms'))}
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -91,11 +139,45 @@ class PremiumComptaEntryViewSet(PremiumOwnedModelViewSet):
         if bien_id:
             queryset = queryset.filter(bien_id=bien_id)
 
+        # Prédicats d'intervalle (index owner, date_operation) plutôt que
+        # date_operation__startswith qui convertit la colonne en texte
         if period:
-            queryset = queryset.filter(date_operation__startswith=period)
+            try:
+                start, end = period_bounds(period)
+            except ValueError as error:
+                raise ValidationError({'error': str(error)})
+            queryset = queryset.filter(date_operation__range=(start, end))
+
+        date_debut = self.request.query_params.get('date_debut')
+        date_fin = self.request.query_params.get('date_fin')
+        try:
+            if date_debut:
+                queryset = queryset.filter(date_operation__gte=date.fromisoformat(date_debut))
+            if date_fin:
+                queryset = queryset.filter(date_operation__lte=date.fromisoformat(date_fin))
+        except ValueError:
+            raise ValidationError({'error': "Date invalide, format attendu: YYYY-MM-DD"})
 
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export en streaming (?modele=csv|fec) avec les filtres periode / date_debut / date_fin / bien_id"""
+        modele = request.query_params.get('modele', 'csv').lower()
+        if modele not in ('csv', 'fec'):
+            return Response({'error': "Modèle d'export invalide (csv ou fec)"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        horodatage = timezone.now().strftime('%Y%m%d')
+        if modele == 'fec':
+            response = StreamingHttpResponse(iter_ecritures_fec(queryset), content_type='text/plain; charset=utf-8')
+            filename = f'FEC{horodatage}.txt'
+        else:
+            response = StreamingHttpResponse(iter_ecritures_csv(queryset), content_type='text/csv; charset=utf-8')
+            filename = f'ecritures_{horodatage}.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 
 class PremiumPaymentViewSet(PremiumOwnedModelViewSet):
     queryset = PremiumPayment.objects.select_related('bail').all()
@@ -109,55 +191,302 @@ class PremiumPaymentViewSet(PremiumOwnedModelViewSet):
         return queryset
 
 
-class PremiumPaymentAuditLogListView(APIView):
+class PremiumPaymentAuditLogListView(generics.ListAPIView):
+    """
+    Historique d'audit paginé par curseur, filtrable par paiement (payment_id),
+    action (INSERT,UPDATE,DELETE) et période (date_debut / date_fin).
+    Les instantanés old_data / new_data ne sont inclus qu'avec ?payload=1.
+
+    Si la période recouvre des mois archivés (voir api/audit_archive.py), la page
+    fusionne la table et les archives ; le curseur est le même dans les deux cas
+    (voir AuditLogCursorPagination).
+    """
     permission_classes = [IsAuthenticated, IsPremiumUser]
+    pagination_class = AuditLogCursorPagination
+    filter_backends = []
+
+    def include_payload(self):
+        return self.request.query_params.get('payload') in ('1', 'true')
+
+    def get_serializer_class(self):
+        if self.include_payload():
+            return PremiumPaymentAuditLogSerializer
+        return PremiumPaymentAuditLogListSerializer
+
+    def get_filters(self):
+        if hasattr(self, '_filters'):
+            return self._filters
+
+        params = self.request.query_params
+        filters = {'payment_id': None, 'actions': None, 'debut': None, 'fin': None}
+
+        payment_id = params.get('payment_id')
+        if payment_id:
+            if not payment_id.isdigit():
+                raise ValidationError({'error': 'payment_id invalide'})
+            filters['payment_id'] = int(payment_id)
+
+        actions = [value.strip().upper() for value in params.get('action', '').split(',') if value.strip()]
+        if actions:
+            valides = {choice for choice, _ in PremiumPaymentAuditLog.ACTION_CHOICES}
+            if not set(actions) <= valides:
+                raise ValidationError({'error': 'Action invalide (INSERT, UPDATE, DELETE)'})
+            filters['actions'] = set(actions)
+
+        # Bornes en datetime (pas de __date) pour rester sur l'index (owner, changed_at)
+        try:
+            if params.get('date_debut'):
+                debut = date.fromisoformat(params['date_debut'])
+                filters['debut'] = timezone.make_aware(datetime.combine(debut, time.min))
+            if params.get('date_fin'):
+                fin = date.fromisoformat(params['date_fin']) + timedelta(days=1)
+                filters['fin'] = timezone.make_aware(datetime.combine(fin, time.min))
+        except ValueError:
+            raise ValidationError({'error': 'Date invalide, format attendu: YYYY-MM-DD'})
+
+        self._filters = filters
+        return filters
 
-    def get(self, request):
-        logs = PremiumPaymentAuditLog.objects.filter(owner=request.user)[:200]
-        serializer = PremiumPaymentAuditLogSerializer(logs, many=True)
-        return Response(serializer.data)
+    def get_queryset(self):
+        filters = self.get_filters()
+        logs = PremiumPaymentAuditLog.objects.filter(owner=self.request.user)
+        if not self.include_payload():
+            logs = logs.defer('old_data', 'new_data')
+
+        if filters['payment_id'] is not None:
+            # Les lignes d'un paiement supprimé n'ont plus de payment_id : DELETE retrouvé via old_data
+            logs = logs.filter(
+                Q(payment_id=filters['payment_id'])
+                | Q(action='DELETE', old_data__payment_id=filters['payment_id'])
+            )
+        if filters['actions']:
+            logs = logs.filter(action__in=filters['actions'])
+        if filters['debut']:
+            logs = logs.filter(changed_at__gte=filters['debut'])
+        if filters['fin']:
+            logs = logs.filter(changed_at__lt=filters['fin'])
+        return logs
+
+    def get_archives(self):
+        filters = self.get_filters()
+        archives = PremiumPaymentAuditArchive.objects.filter(owner=self.request.user)
+        if filters['debut']:
+            archives = archives.filter(dernier_changement__gte=filters['debut'])
+        if filters['fin']:
+            archives = archives.filter(premier_changement__lt=filters['fin'])
+        return archives
+
+    def archive_matches(self, row):
+        filters = self.get_filters()
+        if filters['payment_id'] is not None and row['payment_id'] != filters['payment_id']:
+            if row['action'] != 'DELETE' or (row['old_data'] or {}).get('payment_id') != filters['payment_id']:
+                return False
+        if filters['actions'] and row['action'] not in filters['actions']:
+            return False
+        if filters['debut'] and row['changed_at'] < filters['debut']:
+            return False
+        if filters['fin'] and row['changed_at'] >= filters['fin']:
+            return False
+        return True
+
+    def list(self, request, *args, **kwargs):
+        logs, suivant = audit_page(
+            self.get_queryset(),
+            self.get_archives(),
+            self.archive_matches,
+            self.paginator.get_page_size(request),
+            avant=self.paginator.decode_position(request),
+            payload=self.include_payload(),
+        )
+        return Response({
+            'links': {'next': self.paginator.get_position_link(request, suivant), 'previous': None},
+            'results': self.get_serializer(logs, many=True).data,
+        })
+
+
+class PremiumPaymentAuditLogDetailView(generics.RetrieveAPIView):
+    """Ligne d'audit complète, avec old_data / new_data, y compris archivée"""
+    permission_classes = [IsAuthenticated, IsPremiumUser]
+    serializer_class = PremiumPaymentAuditLogSerializer
+
+    def get_queryset(self):
+        return PremiumPaymentAuditLog.objects.filter(owner=self.request.user)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            log = archived_log(self.request.user, self.kwargs['pk'])
+            if log is None:
+                raise
+            return log
 
 
-class PremiumDashboardView(APIView):
+class PremiumDashboardView(ConditionalAPIViewMixin, APIView):
     permission_classes = [IsAuthenticated, IsPremiumUser]
 
-    def get(self, request):
+    def get_conditional_fingerprint(self, request):
         user = request.user
         bien_id = request.query_params.get('bien_id')
 
         biens = PremiumBien.objects.filter(owner=user)
         baux = PremiumBail.objects.filter(owner=user)
-        ecritures = PremiumComptableEcriture.objects.filter(owner=user)
+        # Le cumul mensuel (lu par get) plutôt que tout le grand livre : chaque
+        # écriture ajoutée, modifiée ou supprimée y met à jour updated_at
+        cumuls = PremiumComptaMensuelle.objects.filter(owner=user)
 
         if bien_id:
             biens = biens.filter(id=bien_id)
             baux = baux.filter(bien_id=bien_id)
-            ecritures = ecritures.filter(bien_id=bien_id)
+            cumuls = cumuls.filter(bien_id=bien_id)
 
-        revenus = ecritures.filter(type_ecriture='REVENU').aggregate(total=Sum('montant'))['total'] or Decimal('0')
-        depenses = ecritures.filter(type_ecriture='DEPENSE').aggregate(total=Sum('montant'))['total'] or Decimal('0')
+        return (
+            aggregate_fingerprint(biens, 'updated_at'),
+            aggregate_fingerprint(baux, 'updated_at'),
+            aggregate_fingerprint(cumuls, 'updated_at'),
+        )
+
+    @conditional_get
+    def get(self, request):
+        user = request.user
+        bien_id = request.query_params.get('bien_id')
+
+        biens = PremiumBien.objects.filter(owner=user)
+        baux = PremiumBail.objects.filter(owner=user)
+        # Totaux lus dans le cumul mensuel plutôt que sur tout l'historique des écritures
+        cumuls = PremiumComptaMensuelle.objects.filter(owner=user)
+
+        if bien_id:
+            biens = biens.filter(id=bien_id)
+            baux = baux.filter(bien_id=bien_id)
+            cumuls = cumuls.filter(bien_id=bien_id)
+
+        # Une requête d'agrégation conditionnelle par table
+        patrimoine = biens.aggregate(
+            total_biens=Count('id'),
+            loues=Count('id', filter=Q(statut='LOUE')),
+            vacants=Count('id', filter=Q(statut='VACANT')),
+            travaux=Count('id', filter=Q(statut='TRAVAUX')),
+        )
+        totaux_baux = baux.aggregate(
+            total=Count('id'),
+            actifs=Count('id', filter=Q(statut='ACTIF')),
+            termines=Count('id', filter=Q(statut='TERMINE')),
+        )
+        totaux = cumuls.aggregate(
+            revenus=Sum('montant', filter=Q(type_ecriture='REVENU')),
+            depenses=Sum('montant', filter=Q(type_ecriture='DEPENSE')),
+        )
+        revenus = totaux['revenus'] or Decimal('0')
+        depenses = totaux['depenses'] or Decimal('0')
 
         payload = {
-            'patrimoine': {
-                'total_biens': biens.count(),
-                'loues': biens.filter(statut='LOUE').count(),
-                'vacants': biens.filter(statut='VACANT').count(),
-                'travaux': biens.filter(statut='TRAVAUX').count(),
-            },
+            'patrimoine': patrimoine,
             'comptabilite': {
                 'revenus': float(revenus),
                 'depenses': float(depenses),
                 'benefice_net': float(revenus - depenses),
             },
-            'baux': {
-                'total': baux.count(),
-                'actifs': baux.filter(statut='ACTIF').count(),
-                'termines': baux.filter(statut='TERMINE').count(),
-            },
+            'baux': totaux_baux,
         }
 
+        if request.query_params.get('detail') == 'biens':
+            payload['biens'] = self.get_detail_biens(biens)
+
         return Response(payload)
 
+    def get_detail_biens(self, biens):
+        """Ventilation par bien (?detail=biens) : une requête, agrégats en sous-requêtes corrélées"""
+        def total(queryset, aggregate):
+            return Subquery(
+                queryset.filter(bien=OuterRef('pk')).order_by().values('bien').annotate(total=aggregate).values('total')
+            )
+
+        cumuls = PremiumComptaMensuelle.objects.all()
+        baux = PremiumBail.objects.all()
+        lignes = biens.order_by('titre', 'id').values('id', 'titre', 'statut').annotate(
+            revenus=total(cumuls.filter(type_ecriture='REVENU'), Sum('montant')),
+            depenses=total(cumuls.filter(type_ecriture='DEPENSE'), Sum('montant')),
+            baux_actifs=total(baux.filter(statut='ACTIF'), Count('id')),
+        )
+
+        detail = []
+        for ligne in lignes:
+            revenus = ligne['revenus'] or Decimal('0')
+            depenses = ligne['depenses'] or Decimal('0')
+            detail.append({
+                'id': ligne['id'],
+                'titre': ligne['titre'],
+                'statut': ligne['statut'],
+                'revenus': float(revenus),
+                'depenses': float(depenses),
+                'benefice_net': float(revenus - depenses),
+                'baux_actifs': ligne['baux_actifs'] or 0,
+            })
+        return detail
+
+
+class PremiumComptaSummaryView(APIView):
+    """Revenus, dépenses et net mois par mois (et par catégorie) depuis le cumul mensuel"""
+    permission_classes = [IsAuthenticated, IsPremiumUser]
+
+    def get(self, request):
+        cumuls = PremiumComptaMensuelle.objects.filter(owner=request.user)
+
+        bien_id = request.query_params.get('bien_id')
+        if bien_id:
+            cumuls = cumuls.filter(bien_id=bien_id)
+
+        period = request.query_params.get('periode')
+        if period:
+            try:
+                start, end = period_bounds(period)
+            except ValueError as error:
+                return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            cumuls = cumuls.filter(mois__range=(start.replace(day=1), end))
+
+        lignes = cumuls.order_by('mois').values('mois', 'type_ecriture', 'categorie').annotate(total=Sum('montant'))
+
+        mois = {}
+        for ligne in lignes:
+            entree = mois.setdefault(ligne['mois'], {
+                'mois': ligne['mois'].strftime('%Y-%m'),
+                'revenus': Decimal('0'),
+                'depenses': Decimal('0'),
+                'categories': {},
+            })
+            cle = 'revenus' if ligne['type_ecriture'] == 'REVENU' else 'depenses'
+            entree[cle] += ligne['total']
+            categorie = entree['categories'].setdefault(
+                ligne['categorie'] or 'AUTRE', {'revenus': Decimal('0'), 'depenses': Decimal('0')}
+            )
+            categorie[cle] += ligne['total']
+
+        resultats = []
+        revenus, depenses = Decimal('0'), Decimal('0')
+        for entree in mois.values():
+            revenus += entree['revenus']
+            depenses += entree['depenses']
+            resultats.append({
+                'mois': entree['mois'],
+                'revenus': float(entree['revenus']),
+                'depenses': float(entree['depenses']),
+                'net': float(entree['revenus'] - entree['depenses']),
+                'categories': {
+                    nom: {key: float(value) for key, value in valeurs.items()}
+                    for nom, valeurs in entree['categories'].items()
+                },
+            })
+
+        return Response({
+            'mois': resultats,
+            'total': {
+                'revenus': float(revenus),
+                'depenses': float(depenses),
+                'net': float(revenus - depenses),
+            },
+        })
+
 
 class PremiumRgpdPurgeView(APIView):
     permission_classes = [IsAuthenticated, IsPremiumUser]
@@ -179,3 +508,79 @@ class PremiumRgpdPurgeView(APIView):
 
         locataire.purge_sensitive_data()
         return Response({'message': 'Purge RGPD executee'})
+
+
+class PremiumRgpdBatchPurgeView(APIView):
+    """Purge par lots de tous les locataires du propriétaire partis depuis plus de retention_jours"""
+    permission_classes = [IsAuthenticated, IsPremiumUser]
+
+    def post(self, request):
+        retention_jours = request.data.get('retention_jours')
+        if retention_jours is not None:
+            try:
+                retention_jours = int(retention_jours)
+            except (TypeError, ValueError):
+                retention_jours = -1
+            if retention_jours < 0:
+                return Response({'error': 'retention_jours doit etre un entier positif'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rapport = purge_departed_locataires(
+            retention_jours=retention_jours,
+            owner=request.user,
+            actor=request.user,
+            declencheur='API',
+            dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true'),
+        )
+        return Response({
+            'id': rapport.id,
+            'date_limite': rapport.date_limite,
+            'dry_run': rapport.dry_run,
+            'nb_locataires': rapport.nb_locataires,
+            'duree_secondes': rapport.duree_secondes,
+        }, status=status.HTTP_200_OK if rapport.dry_run else status.HTTP_201_CREATED)
+
+
+class PremiumRentRollView(APIView):
+    """Génère les loyers attendus (paiements IMPAYE) du mois pour tous les baux actifs"""
+    permission_classes = [IsAuthenticated, IsPremiumUser]
+
+    def post(self, request):
+        mois = request.data.get('mois') or timezone.now().strftime('%Y-%m')
+        try:
+            month_start = parse_month(mois)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+        report = generate_rent_roll(month_start, owner=request.user, dry_run=dry_run)
+        report['montant_total'] = float(report['montant_total'])
+        report['dry_run'] = dry_run
+
+        return Response(
+            report,
+            status=status.HTTP_201_CREATED if report['crees'] and not dry_run else status.HTTP_200_OK,
+        )
+
+
+class PremiumArrearsView(APIView):
+    """Impayés par bail actif : mois non couverts et montant restant dû"""
+    permission_classes = [IsAuthenticated, IsPremiumUser]
+
+    def get(self, request):
+        mois = request.query_params.get('mois')
+        as_of = None
+        if mois:
+            try:
+                as_of = month_bounds(parse_month(mois))[1]
+            except ValueError as error:
+                return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = compute_arrears(
+            owner=request.user,
+            as_of=as_of or timezone.now().date(),
+            bien_id=request.query_params.get('bien_id'),
+        )
+        report['total_du'] = float(report['total_du'])
+        for bail in report['baux']:
+            bail['montant_du'] = float(bail['montant_du'])
+        return Response(report)
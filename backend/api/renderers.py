@@ -0,0 +1,59 @@
+"""
+Rendu JSON rapide basé sur orjson (repli sur le JSONRenderer de DRF).
+
+La sortie est celle de rest_framework.renderers.JSONRenderer :
+- les DecimalField des sérialiseurs arrivent déjà en chaînes
+  (COERCE_DECIMAL_TO_STRING), les dates / dates-heures déjà formatées selon
+  DATE_FORMAT / DATETIME_FORMAT : orjson les recopie telles quelles ;
+- les valeurs Python brutes (Decimal, datetime, date, time, lazy strings...)
+  passent par l'encodeur de DRF, UUID en forme canonique comme DRF ;
+- \\u2028 et \\u2029 sont échappés.
+Seule différence : NaN et Infinity deviennent null au lieu de lever une erreur.
+
+orjson n'est utilisé que pour la sortie compacte sans indentation (le cas des
+clients de l'API) ; l'indentation, l'API navigable, UNICODE_JSON=False ou
+COMPACT_JSON=False, et tout ce qu'orjson refuse (entiers de plus de 64 bits...)
+repassent par json de la bibliothèque standard.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer dont la sortie compacte est produite par orjson quand il est installé"""
+
+    def use_orjson(self, indent):
+        return orjson is not None and indent is None and self.compact and not self.ensure_ascii
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not self.use_orjson(indent):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """Format colonnes {columns, rows} des listes (voir api/columnar.py)"""
+    media_type = 'application/vnd.columnar+json'
+    format = 'columnar'
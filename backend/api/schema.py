@@ -0,0 +1,65 @@
+"""
+Schéma OpenAPI statique.
+
+Le schéma est généré au build :
+
+    python manage.py spectacular --file schema.yml --validate
+
+puis servi par schema_statique (settings.STATIC_OPENAPI_SCHEMA, actif hors
+DEBUG) sans l'introspection de drf-spectacular à chaque requête. Le fichier
+est lu une fois par processus ; le JSON (Swagger UI, clients qui le demandent)
+est dérivé du YAML au premier appel.
+"""
+import hashlib
+import json
+from functools import lru_cache
+
+import yaml
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+YAML_CONTENT_TYPE = 'application/vnd.oai.openapi; charset=utf-8'
+JSON_CONTENT_TYPE = 'application/vnd.oai.openapi+json'
+
+
+@lru_cache(maxsize=None)
+def charger_schema(path, format):
+    """Contenu (octets) du schéma au format 'yaml' ou 'json'"""
+    try:
+        with open(path, 'rb') as fichier:
+            contenu = fichier.read()
+    except FileNotFoundError:
+        raise Http404("Schéma OpenAPI absent : lancer python manage.py spectacular --file schema.yml")
+    if format == 'json':
+        contenu = json.dumps(yaml.safe_load(contenu), ensure_ascii=False).encode('utf-8')
+    return contenu
+
+
+def format_demande(request):
+    requested = request.GET.get('format', '')
+    if requested in ('json', 'openapi-json'):
+        return 'json'
+    if requested:
+        return 'yaml'
+    return 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+
+
+def schema_etag(request):
+    contenu = charger_schema(settings.OPENAPI_SCHEMA_FILE, format_demande(request))
+    return hashlib.sha1(contenu).hexdigest()
+
+
+@require_safe
+@condition(etag_func=schema_etag)
+def schema_statique(request):
+    """Schéma OpenAPI généré au build (?format=json ou Accept JSON pour la version JSON)"""
+    format = format_demande(request)
+    response = HttpResponse(
+        charger_schema(settings.OPENAPI_SCHEMA_FILE, format),
+        content_type=JSON_CONTENT_TYPE if format == 'json' else YAML_CONTENT_TYPE,
+    )
+    response['Vary'] = 'Accept'
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300))
+    return response
@@ -35,13 +35,20 @@ class AppartementListSerializer(serializers.ModelSerializer):
     Sérialiseur pour la liste des appartements (version simplifiée)
     """
     photo_principale_url = serializers.SerializerMethodField()
+    # Présents uniquement si le queryset les annote : is_favori pour l'utilisateur
+    # connecté (Exists), distance_km avec la recherche par rayon (api.geo)
+    is_favori = serializers.BooleanField(read_only=True)
+    distance_km = serializers.FloatField(read_only=True)
+
+    # Attributs lus par les champs calculés (?fields=, voir api/fieldsets.py)
+    field_sources = {'photo_principale_url': ('photo_principale',), 'is_favori': (), 'distance_km': ()}
 
     class Meta:
         model = Appartement
         fields = [
             'id', 'slug', 'titre', 'ville', 'type_bien', 'loyer_mensuel', 'surface',
             'nb_pieces', 'disponible', 'photo_principale_url',
-            'nb_vues', 'nb_favoris'
+            'nb_vues', 'nb_favoris', 'is_favori', 'distance_km'
         ]
     
     @extend_schema_field(CharField(allow_null=True))
@@ -60,6 +67,9 @@ class AppartementDetailSerializer(serializers.ModelSerializer):
     proprietaire_telephone = serializers.CharField(source='proprietaire.telephone', read_only=True, allow_blank=True, allow_null=True)
     caution_mois = serializers.SerializerMethodField()
 
+    # Attributs lus par les champs calculés (?fields=, voir api/fieldsets.py)
+    field_sources = {'photo_principale_url': ('photo_principale',), 'caution_mois': ('caution', 'loyer_mensuel')}
+
     @extend_schema_field(CharField(allow_null=True))
     def get_photo_principale_url(self, obj):
         """Retourne l'URL de la photo principale ou None si absente"""
@@ -170,6 +180,9 @@ class LocationListSerializer(serializers.ModelSerializer):
     locataire_nom = serializers.CharField(source='locataire.username', read_only=True, allow_null=True)
     bail_pdf_url = serializers.SerializerMethodField()
 
+    # Attributs lus par les champs calculés (?fields=, voir api/fieldsets.py)
+    field_sources = {'bail_pdf_url': ('bail_pdf',)}
+
     @extend_schema_field(CharField(allow_null=True))
     def get_bail_pdf_url(self, obj):
         if not getattr(obj, 'bail_pdf', None):
@@ -199,6 +212,9 @@ class LocationDetailSerializer(serializers.ModelSerializer):
     locataire = UserSerializer(read_only=True)
     duree_sejour = serializers.SerializerMethodField()
     bail_pdf_url = serializers.SerializerMethodField()
+
+    # Attributs lus par les champs calculés (?fields=, voir api/fieldsets.py)
+    field_sources = {'duree_sejour': ('date_debut', 'date_fin'), 'bail_pdf_url': ('bail_pdf',)}
     
     @extend_schema_field(serializers.IntegerField())
     def get_duree_sejour(self, obj):
@@ -378,6 +394,13 @@ class FavoriCreateSerializer(serializers.Serializer):
     action = serializers.ChoiceField(choices=['add', 'remove'])
 
 
+class FavoriSyncSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour synchroniser un lot de favoris (clients hors ligne)
+    """
+    operations = FavoriCreateSerializer(many=True, allow_empty=True, max_length=1000)
+
+
 # ========== SÉRIALISEURS DIVERS ==========
 
 class DisponibiliteSerializer(serializers.Serializer):
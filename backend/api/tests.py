@@ -1,3 +1,1593 @@
-from django.test import TestCase
+import csv
+import json
+import shutil
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .models import (
+    User,
+    Appartement,
+    Favori,
+    Location,
+    Photo,
+    PremiumBien,
+    PremiumLocataire,
+    PremiumBail,
+    PremiumComptableEcriture,
+    PremiumComptaMensuelle,
+    PremiumPayment,
+    PremiumPaymentAuditLog,
+    PremiumPaymentAuditArchive,
+    PremiumRgpdPurgeLog,
+)
+from .audit_archive import archive_audit_logs, restore_audit_archives
+from .caching import APPARTEMENTS_CACHE_NAMESPACE, get_generation
+from .fieldsets import parse_field_tree, prune_serializer, shape_queryset
+from .parsers import FastJSONParser
+from .premium_services import compute_arrears, generate_rent_roll, purge_departed_locataires
+from .renderers import FastJSONRenderer
+from .schema import schema_statique
+from .serializers import LocationDetailSerializer
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / If-None-Match sur les endpoints de lecture"""
+
+    def setUp(self):
+        cache.clear()
+        self.proprietaire = User.objects.create_user(
+            email='proprietaire@example.com', username='proprietaire', password='secret', plan='premium'
+        )
+        self.appartement = Appartement.objects.create(
+            proprietaire=self.proprietaire, titre='Studio centre', description='Lumineux',
+            adresse='1 rue de la Paix', loyer_mensuel=500,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.proprietaire)
+
+    def assertNotModifiedThenModified(self, url, modify):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        modify()
+        response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_appartement_list(self):
+        def modify():
+            self.appartement.titre = 'Studio renove'
+            self.appartement.save()
+
+        self.assertNotModifiedThenModified('/api/appartements/', modify)
+
+    def test_appartement_list_etag_depends_on_query(self):
+        etag = self.client.get('/api/appartements/?ville=Paris')['ETag']
+        response = self.client.get('/api/appartements/?ville=Lyon', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_appartement_retrieve_counts_views_on_304(self):
+        # Anonyme : 304 servi par le cache de réponses, la vue est comptée quand même
+        url = f'/api/appartements/{self.appartement.slug}/'
+        client = APIClient()
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.appartement.refresh_from_db()
+        self.assertEqual(self.appartement.nb_vues, 2)
+
+    def test_appartement_etag_follows_counters(self):
+        # nb_vues / nb_favoris sont dans la réponse : chaque consultation change l'ETag du détail
+        url = f'/api/appartements/{self.appartement.slug}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['nb_vues'], 2)
+
+        def modify():
+            Favori.ajouter(self.proprietaire, self.appartement.id)
+
+        self.assertNotModifiedThenModified('/api/appartements/', modify)
+
+    def test_location_detail_follows_nested_objects(self):
+        locataire = User.objects.create_user(email='awa@example.com', username='awa', password='secret')
+        location = Location.objects.create(
+            appartement=self.appartement, locataire=locataire, nom_locataire='Awa',
+            email_locataire='awa@example.com', telephone_locataire='0102030405',
+            date_debut='2026-01-01', date_fin='2026-02-01', montant_total=500,
+        )
+        url = f'/api/locations/{location.id}/'
+
+        def modify_locataire():
+            locataire.telephone = '0700000000'
+            locataire.save()
+
+        def modify_compteurs():
+            Favori.ajouter(locataire, self.appartement.id)
+
+        self.assertNotModifiedThenModified(url, modify_locataire)
+        self.assertNotModifiedThenModified(url, modify_compteurs)
+
+    def test_location_list(self):
+        location = Location.objects.create(
+            appartement=self.appartement, nom_locataire='Awa', email_locataire='awa@example.com',
+            telephone_locataire='0102030405', date_debut='2026-01-01', date_fin='2026-02-01',
+            montant_total=500,
+        )
+
+        def modify():
+            location.statut = 'CONFIRME'
+            location.save()
+
+        self.assertNotModifiedThenModified('/api/locations/', modify)
+
+    def test_premium_bien_list(self):
+        bien = self.appartement.bien or PremiumBien.objects.create(
+            owner=self.proprietaire, titre='Bien', adresse='1 rue de la Paix'
+        )
+
+        def modify():
+            bien.statut = 'LOUE'
+            bien.save()
+
+        self.assertNotModifiedThenModified('/api/premium/biens/', modify)
+
+    def test_premium_dashboard(self):
+        def modify():
+            PremiumBien.objects.create(owner=self.proprietaire, titre='Garage', adresse='2 rue de la Paix')
+
+        self.assertNotModifiedThenModified('/api/premium/dashboard/', modify)
+
+    def test_proprietaire_dashboard(self):
+        def modify():
+            self.appartement.disponible = False
+            self.appartement.save()
+
+        self.assertNotModifiedThenModified('/api/dashboard/proprietaire/', modify)
+
+
+class PremiumDashboardTests(TestCase):
+    """Tableau de bord Premium : une requête d'agrégation par table"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='premium@example.com', username='premium', password='secret', plan='premium'
+        )
+        locataire = PremiumLocataire.objects.create(
+            owner=self.owner, nom='Kone', prenoms='Awa', email='awa@example.com'
+        )
+        for index, statut in enumerate(['LOUE', 'LOUE', 'VACANT', 'TRAVAUX']):
+            bien = PremiumBien.objects.create(
+                owner=self.owner, titre=f'Bien {index}', adresse='1 rue de la Paix', statut=statut
+            )
+            PremiumBail.objects.create(
+                owner=self.owner, bien=bien, locataire=locataire, date_entree=date(2026, 1, 1),
+                statut='ACTIF' if statut == 'LOUE' else 'TERMINE',
+            )
+            PremiumComptableEcriture.objects.create(
+                owner=self.owner, bien=bien, type_ecriture='REVENU', libelle='Loyer',
+                date_operation=date(2026, 1, 5), montant=500,
+            )
+            PremiumComptableEcriture.objects.create(
+                owner=self.owner, bien=bien, type_ecriture='DEPENSE', libelle='Entretien',
+                date_operation=date(2026, 1, 20), montant=100,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_dashboard_totals(self):
+        # Empreinte ETag (3 tables) + une agrégation par section
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/premium/dashboard/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['patrimoine'], {'total_biens': 4, 'loues': 2, 'vacants': 1, 'travaux': 1})
+        self.assertEqual(response.data['baux'], {'total': 4, 'actifs': 2, 'termines': 2})
+        self.assertEqual(response.data['comptabilite'], {'revenus': 2000.0, 'depenses': 400.0, 'benefice_net': 1600.0})
+        self.assertNotIn('biens', response.data)
+
+    def test_dashboard_etag_follows_monthly_rollup(self):
+        response = self.client.get('/api/premium/dashboard/?detail=biens')
+        etag = response['ETag']
+
+        # Empreinte sur le cumul mensuel, pas sur les écritures
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/premium/dashboard/?detail=biens', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('api_premiumcomptableecriture' in query['sql'] for query in queries.captured_queries))
+
+        # Écriture déplacée d'un bien à l'autre : totaux inchangés, détail par bien modifié
+        ecriture = PremiumComptableEcriture.objects.filter(owner=self.owner, type_ecriture='REVENU').first()
+        ecriture.bien = PremiumBien.objects.filter(owner=self.owner).exclude(pk=ecriture.bien_id).first()
+        ecriture.save()
+        response = self.client.get('/api/premium/dashboard/?detail=biens', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['comptabilite']['revenus'], 2000.0)
+        etag = response['ETag']
+
+        ecriture.delete()
+        response = self.client.get('/api/premium/dashboard/?detail=biens', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['comptabilite']['revenus'], 1500.0)
+
+    def test_dashboard_detail_biens_single_extra_query(self):
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/premium/dashboard/?detail=biens')
+
+        self.assertEqual(len(response.data['biens']), 4)
+        bien = response.data['biens'][0]
+        self.assertEqual(bien['titre'], 'Bien 0')
+        self.assertEqual(bien['revenus'], 500.0)
+        self.assertEqual(bien['benefice_net'], 400.0)
+        self.assertEqual(bien['baux_actifs'], 1)
+
+    def test_dashboard_query_count_does_not_grow_with_biens(self):
+        PremiumBien.objects.bulk_create([
+            PremiumBien(owner=self.owner, titre=f'Extra {index}', adresse='2 rue de la Paix')
+            for index in range(20)
+        ])
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/premium/dashboard/?detail=biens')
+        self.assertEqual(len(response.data['biens']), 24)
+
+
+class ListQueryPlanTests(TestCase):
+    """Plans d'exécution des listes Premium : aucun parcours séquentiel"""
+
+    def test_premium_list_endpoints_use_indexes(self):
+        out = StringIO()
+        call_command('explain_list_queries', prefix='api/premium/', fail=True, stdout=out)
+
+        output = out.getvalue()
+        self.assertNotIn('SEQ SCAN', output)
+        for path in ['/api/premium/biens/', '/api/premium/baux/?bien_id=1', '/api/premium/payments/',
+                     '/api/premium/comptabilite/ecritures/?bien_id=1', '/api/premium/locataires/']:
+            self.assertIn(f'OK       {path}\n', output)
+
+    def test_unfiltered_public_list_is_flagged(self):
+        out = StringIO()
+        call_command('explain_list_queries', prefix='api/locations/', stdout=out)
+        self.assertIn('SEQ SCAN /api/locations/', out.getvalue())
+
+
+class AppartementQueryCountTests(TestCase):
+    """Liste, détail et réservations d'une annonce : nombre de requêtes constant"""
+
+    def setUp(self):
+        cache.clear()
+        self.proprietaire = User.objects.create_user(
+            email='bailleur@example.com', username='bailleur', password='secret', telephone='0700000000'
+        )
+        self.locataire = User.objects.create_user(
+            email='locataire@example.com', username='locataire', password='secret'
+        )
+        self.appartement = self.creer_appartement(0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.locataire)
+
+    def creer_appartement(self, index):
+        appartement = Appartement.objects.create(
+            proprietaire=self.proprietaire, titre=f'Studio {index}', description='Lumineux',
+            adresse='1 rue de la Paix', loyer_mensuel=500,
+        )
+        for ordre in range(3):
+            Photo.objects.create(
+                appartement=appartement, image=f'appartements/photos/{index}-{ordre}.jpg',
+                legende=f'Photo {ordre}', ordre=2 - ordre,
+            )
+        return appartement
+
+    def creer_location(self, mois):
+        return Location.objects.create(
+            appartement=self.appartement, locataire=self.locataire, nom_locataire='Awa Kone',
+            email_locataire='awa@example.com', telephone_locataire='0700000001',
+            date_debut=date(2026, mois, 1), date_fin=date(2026, mois, 10), statut='CONFIRME', montant_total=500,
+        )
+
+    def test_list_query_count_does_not_grow(self):
+        # Empreinte ETag (annonces + favoris), comptage, page
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/appartements/')
+        self.assertEqual(response.status_code, 200)
+
+        for index in range(1, 10):
+            self.creer_appartement(index)
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/appartements/')
+        self.assertEqual(response.data['count'], 10)
+        self.assertIn('photo_principale_url', response.data['results'][0])
+
+    def test_retrieve_loads_owner_and_photos_once(self):
+        url = f'/api/appartements/{self.appartement.slug}/'
+        # Compteur de vues, empreinte ETag (annonce, photos), annonce + propriétaire, photos
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['proprietaire_telephone'], '0700000000')
+        self.assertEqual([photo['legende'] for photo in response.data['photos']], ['Photo 2', 'Photo 1', 'Photo 0'])
+
+        # Même ordre d'affichage : ordre d'ajout
+        Photo.objects.create(appartement=self.appartement, image='appartements/photos/0-3.jpg', legende='Photo 3', ordre=0)
+        response = self.client.get(url)
+        self.assertEqual([photo['legende'] for photo in response.data['photos']], ['Photo 2', 'Photo 3', 'Photo 1', 'Photo 0'])
+
+    def test_locations_query_count_does_not_grow(self):
+        url = f'/api/appartements/{self.appartement.slug}/locations/'
+        self.creer_location(1)
+        # Annonce, comptage, page (locations + appartement + locataire)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 1)
+
+        for mois in range(2, 8):
+            self.creer_location(mois)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(response.data['results'][0]['locataire_nom'], 'locataire')
+
+
+class FastJSONRendererTests(TestCase):
+    """Rendu / lecture orjson identiques au JSONRenderer / JSONParser de DRF"""
+
+    def setUp(self):
+        owner = User.objects.create_user(
+            email='json@example.com', username='json', password='secret', plan='premium'
+        )
+        bien = PremiumBien.objects.create(owner=owner, titre='Villa Cocody', adresse='Abidjan')
+        PremiumComptableEcriture.objects.create(
+            owner=owner, bien=bien, type_ecriture='REVENU', libelle='Loyer é',
+            date_operation=date(2026, 1, 5), montant=Decimal('123456.78'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def assertSameRendering(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_serializer_output(self):
+        for url in ['/api/premium/biens/', '/api/premium/comptabilite/ecritures/']:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertSameRendering(response.data)
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_raw_python_values(self):
+        self.assertSameRendering({
+            'decimal': Decimal('10.50'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'date': date(2026, 1, 5),
+            'datetime': datetime(2026, 1, 5, 10, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2026, 1, 5, 10, 30),
+            'lazy': gettext_lazy('Bonjour'),
+            'cles': {1: 'un', None: 'rien'},
+            'grand': 2 ** 70,
+            'texte': 'ligne\u2028suivante',
+        })
+
+    def test_parser_matches_drf(self):
+        for body in [b'{"montant": "12.50", "n": 3, "x": 1.5, "l": [true, null]}', b'{"n": 123456789012345678901234567890}']:
+            self.assertEqual(
+                FastJSONParser().parse(BytesIO(body)),
+                JSONParser().parse(BytesIO(body)),
+            )
+        for body in [b'{"n": NaN}', b'{invalide']:
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(BytesIO(body))
+
+
+class StaticSchemaTests(TestCase):
+    """Schéma OpenAPI servi depuis schema.yml, sans introspection"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_yaml_json_and_etag(self):
+        response = schema_statique(self.factory.get('/schema/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('application/vnd.oai.openapi'))
+        self.assertTrue(response.content.startswith(b'openapi: 3.0.3'))
+
+        response = schema_statique(self.factory.get('/schema/', HTTP_ACCEPT='application/json'))
+        schema = json.loads(response.content)
+        self.assertIn('/api/appartements/', schema['paths'])
+
+        with self.assertNumQueries(0):
+            response = schema_statique(self.factory.get('/schema/?format=json', HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_file(self):
+        with override_settings(OPENAPI_SCHEMA_FILE='/nonexistent/schema.yml'):
+            with self.assertRaises(Http404):
+                schema_statique(self.factory.get('/schema/'))
+
+
+class ColumnarFormatTests(TestCase):
+    """?format=columnar : mêmes valeurs que le JSON, en colonnes"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='colonnes@example.com', username='colonnes', password='secret', plan='premium'
+        )
+        appartement = Appartement.objects.create(
+            proprietaire=self.owner, titre='Studio', description='Lumineux', adresse='1 rue de la Paix', loyer_mensuel=500,
+        )
+        for mois in range(1, 4):
+            Location.objects.create(
+                appartement=appartement, locataire=self.owner, nom_locataire='Awa Kone',
+                email_locataire='awa@example.com', telephone_locataire='0700000001',
+                date_debut=date(2026, mois, 1), date_fin=date(2026, mois, 10), statut='PAYE',
+                montant_total=Decimal('1250.50'), bail_pdf='baux_numeriques/bail.pdf' if mois == 1 else '',
+            )
+        bien = PremiumBien.objects.create(owner=self.owner, titre='Villa', adresse='Abidjan', loyer_hc=Decimal('100.00'))
+        locataire = PremiumLocataire.objects.create(owner=self.owner, nom='Kone', prenoms='Awa', email='awa@example.com')
+        PremiumBail.objects.create(owner=self.owner, bien=bien, locataire=locataire, date_entree=date(2026, 1, 1))
+        PremiumComptableEcriture.objects.create(
+            owner=self.owner, bien=bien, type_ecriture='REVENU', libelle='Loyer',
+            date_operation=date(2026, 1, 5), montant=Decimal('500.00'), metadata={'periode': '2026-01'},
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def assertSameValues(self, url):
+        data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        response = self.client.get(url, HTTP_ACCEPT='application/vnd.columnar+json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.columnar+json')
+
+        columnar = response.json()
+        self.assertEqual(columnar['count'], data['count'])
+        self.assertNotIn('results', columnar)
+        self.assertEqual(
+            [dict(zip(columnar['columns'], row)) for row in columnar['rows']],
+            [{name: row.get(name) for name in columnar['columns']} for row in data['results']],
+        )
+        return columnar
+
+    def test_same_values_as_json(self):
+        for url in ['/api/premium/biens/', '/api/premium/baux/', '/api/premium/comptabilite/ecritures/',
+                    '/api/premium/locataires/', '/api/premium/payments/']:
+            self.assertSameValues(url)
+
+        columnar = self.assertSameValues('/api/locations/?ordering=date_debut')
+        self.assertIn('bail_pdf_url', columnar['columns'])
+        self.assertEqual(columnar['rows'][0][columnar['columns'].index('montant_total')], '1250.50')
+
+    def test_format_param_fields_and_page_size(self):
+        response = self.client.get('/api/locations/?format=columnar&fields=id,statut&page_size=1000')
+        self.assertEqual(response.json()['columns'], ['id', 'statut'])
+        self.assertEqual(len(response.json()['rows']), 3)
+
+        location = Location.objects.first()
+        response = self.client.get(f'/api/locations/{location.pk}/?format=columnar')
+        self.assertEqual(response.status_code, 404)
+
+
+class FavorisTests(TestCase):
+    """Compteurs nb_favoris et pagination de la liste des favoris"""
+
+    def setUp(self):
+        self.proprietaire = User.objects.create_user(
+            email='bailleur@example.com', username='bailleur', password='secret'
+        )
+        self.locataire = User.objects.create_user(
+            email='locataire@example.com', username='locataire', password='secret'
+        )
+        self.appartements = [
+            Appartement.objects.create(
+                proprietaire=self.proprietaire, titre=f'Studio {index}', description='Lumineux',
+                adresse='1 rue de la Paix', loyer_mensuel=500,
+            )
+            for index in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.locataire)
+
+    def assertCompteurs(self, nb_locataire, nb_appartement, appartement=None):
+        self.locataire.refresh_from_db(fields=['nb_favoris'])
+        appartement = appartement or self.appartements[0]
+        appartement.refresh_from_db(fields=['nb_favoris'])
+        self.assertEqual(self.locataire.nb_favoris, nb_locataire)
+        self.assertEqual(appartement.nb_favoris, nb_appartement)
+
+    def test_add_and_remove_update_counters(self):
+        appartement_id = self.appartements[0].id
+        for _ in range(2):
+            response = self.client.post('/api/favoris/', {'appartement_id': appartement_id, 'action': 'add'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['favoris_count'], 1)
+        self.assertCompteurs(1, 1)
+
+        for _ in range(2):
+            response = self.client.post('/api/favoris/', {'appartement_id': appartement_id, 'action': 'remove'})
+            self.assertEqual(response.data['favoris_count'], 0)
+        self.assertCompteurs(0, 0)
+
+    def test_cascade_delete_decrements_counters(self):
+        Favori.ajouter(self.locataire, self.appartements[0].id)
+        Favori.ajouter(self.locataire, self.appartements[1].id)
+        self.appartements[0].delete()
+        self.assertCompteurs(1, 1, appartement=self.appartements[1])
+
+    def test_sync_counts_only_rows_written(self):
+        premier, deuxieme, troisieme = (appartement.id for appartement in self.appartements[:3])
+        Favori.ajouter(self.locataire, premier)
+        Favori.ajouter(self.locataire, deuxieme)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/favoris/sync/', {'operations': [
+                {'appartement_id': premier, 'action': 'add'},
+                {'appartement_id': troisieme, 'action': 'add'},
+                {'appartement_id': troisieme, 'action': 'add'},
+                {'appartement_id': deuxieme, 'action': 'remove'},
+                {'appartement_id': self.appartements[4].id, 'action': 'remove'},
+                {'appartement_id': 999999, 'action': 'add'},
+            ]}, format='json')
+        self.assertEqual(response.data['favoris'], [premier, troisieme])
+        self.assertEqual(response.data['ignores'], [999999])
+        self.assertCompteurs(2, 1)
+        for appartement, attendu in zip(self.appartements[1:3], [0, 1]):
+            appartement.refresh_from_db(fields=['nb_favoris'])
+            self.assertEqual(appartement.nb_favoris, attendu)
+
+        # Ligne du locataire verrouillée avant la lecture de ses favoris
+        verrou = next(index for index, query in enumerate(queries) if '"api_user"' in query['sql'])
+        lecture = next(index for index, query in enumerate(queries) if 'FROM "api_favori"' in query['sql'])
+        self.assertLess(verrou, lecture)
+        if connection.features.has_select_for_update:
+            self.assertIn('FOR UPDATE', queries[verrou]['sql'])
+
+    def test_is_favori_only_when_annotated(self):
+        Favori.ajouter(self.locataire, self.appartements[0].id)
+        response = self.client.get('/api/appartements/?page_size=10')
+        favoris = {appartement['id']: appartement['is_favori'] for appartement in response.data['results']}
+        self.assertEqual(favoris, {appartement.id: appartement == self.appartements[0] for appartement in self.appartements})
+
+        # Anonyme : champ absent, le frontend garde son état local
+        response = APIClient().get('/api/appartements/?page_size=10')
+        self.assertTrue(all('is_favori' not in appartement for appartement in response.data['results']))
+
+        # Annonce imbriquée dans le détail d'une réservation : non annotée
+        location = Location.objects.create(
+            appartement=self.appartements[0], locataire=self.locataire, nom_locataire='Awa Kone',
+            email_locataire='awa@example.com', telephone_locataire='0700000001',
+            date_debut=date(2026, 3, 1), date_fin=date(2026, 3, 10), montant_total=500,
+        )
+        response = self.client.get(f'/api/locations/{location.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['appartement']['id'], self.appartements[0].id)
+        self.assertNotIn('is_favori', response.data['appartement'])
+
+    def ajouter_favoris(self):
+        # Dates d'ajout distinctes : le plus récent en premier
+        for index, appartement in enumerate(self.appartements):
+            Favori.ajouter(self.locataire, appartement.id)
+            Favori.objects.filter(appartement=appartement).update(
+                date_ajout=datetime(2026, 1, index + 1, tzinfo=dt_timezone.utc)
+            )
+        return [appartement.id for appartement in reversed(self.appartements)]
+
+    def test_page_number_pagination(self):
+        attendus = self.ajouter_favoris()
+        response = self.client.get('/api/favoris/?page_size=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['total_pages'], 3)
+
+        ids = []
+        for page in range(1, 4):
+            response = self.client.get(f'/api/favoris/?page_size=2&page={page}')
+            ids += [appartement['id'] for appartement in response.data['results']]
+            self.assertTrue(all(appartement['is_favori'] for appartement in response.data['results']))
+        self.assertEqual(ids, attendus)
+        self.assertIsNone(response.data['links']['next'])
+
+    def test_cursor_pagination(self):
+        attendus = self.ajouter_favoris()
+        url, ids, pages = '/api/favoris/?pagination=cursor&page_size=2', [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [appartement['id'] for appartement in response.data['results']]
+            url = response.data['links']['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, attendus)
+
+        # Un favori ajouté entre deux pages ne décale pas la suite
+        response = self.client.get('/api/favoris/?pagination=cursor&page_size=2')
+        Favori.ajouter(self.locataire, Appartement.objects.create(
+            proprietaire=self.proprietaire, titre='Nouveau', description='Neuf', adresse='2 rue', loyer_mensuel=400,
+        ).id)
+        response = self.client.get(response.data['links']['next'])
+        self.assertEqual([appartement['id'] for appartement in response.data['results']], attendus[2:4])
+
+
+class BulkRecordPaymentsTests(TestCase):
+    """bulk_record_payments : mêmes effets de bord qu'un save() par paiement"""
+
+    def creer_proprietaire(self, nom):
+        owner = User.objects.create_user(email=f'{nom}@example.com', username=nom, password='secret', plan='premium')
+        bien = PremiumBien.objects.create(owner=owner, titre='Villa', adresse='Abidjan')
+        locataire = PremiumLocataire.objects.create(owner=owner, nom='Kone', prenoms='Awa', email='awa@example.com')
+        bail = PremiumBail.objects.create(owner=owner, bien=bien, locataire=locataire, date_entree=date(2026, 1, 1))
+        return owner, bail
+
+    def paiements(self, owner, bail):
+        return [
+            PremiumPayment(
+                owner=owner, bail_id=bail.id, date_paiement=date(2026, mois, 5), periode_debut=date(2026, mois, 1),
+                periode_fin=date(2026, mois, 28), montant=Decimal('500.00') + mois, statut='PAYE',
+            )
+            for mois in (1, 2, 2, 3)
+        ]
+
+    def effets(self, owner):
+        """Effets de bord d'un propriétaire, sans les identifiants"""
+        audit = [
+            (log.action, log.old_data, log.new_data)
+            for log in PremiumPaymentAuditLog.objects.filter(owner=owner).order_by('payment__date_paiement', 'id')
+        ]
+        ecritures = list(
+            PremiumComptableEcriture.objects.filter(owner=owner).order_by('date_operation', 'montant').values_list(
+                'type_ecriture', 'source', 'libelle', 'categorie', 'date_operation', 'montant',
+            )
+        )
+        cumuls = list(
+            PremiumComptaMensuelle.objects.filter(owner=owner).order_by('mois', 'type_ecriture').values_list(
+                'mois', 'type_ecriture', 'categorie', 'montant', 'nb_ecritures',
+            )
+        )
+        historique = [
+            {key: value for key, value in entree.items() if key not in ('id', 'bail_id')}
+            for entree in PremiumLocataire.objects.get(owner=owner).historique_paiements
+        ]
+        return audit, ecritures, cumuls, historique
+
+    def test_bulk_matches_per_row_save(self):
+        owner_save, bail_save = self.creer_proprietaire('unitaire')
+        owner_bulk, bail_bulk = self.creer_proprietaire('lot')
+
+        for payment in self.paiements(owner_save, bail_save):
+            payment.save()
+        created = PremiumPayment.objects.bulk_record_payments(self.paiements(owner_bulk, bail_bulk))
+
+        self.assertTrue(all(payment.pk for payment in created))
+        self.assertEqual(self.effets(owner_bulk), self.effets(owner_save))
+        ecriture = PremiumComptableEcriture.objects.filter(owner=owner_bulk).first()
+        self.assertEqual(ecriture.bien_id, bail_bulk.bien_id)
+        self.assertIn(ecriture.payment_id, {payment.pk for payment in created})
+        self.assertEqual(PremiumComptaMensuelle.objects.filter(owner=owner_bulk, mois=date(2026, 2, 1)).get().nb_ecritures, 2)
+
+    def test_bulk_query_count_does_not_grow(self):
+        owner, bail = self.creer_proprietaire('requetes')
+        # Paiements, audit, caches historique, bulk_update historique, bien des baux,
+        # écritures, cumuls existants, nouveaux cumuls (+ 2 savepoints x 2)
+        with self.assertNumQueries(12):
+            PremiumPayment.objects.bulk_record_payments(self.paiements(owner, bail))
+        # Cumuls tous existants : bulk_update, sans savepoint de création
+        with self.assertNumQueries(10):
+            PremiumPayment.objects.bulk_record_payments(self.paiements(owner, bail) * 5)
+
+    def test_save_query_counts(self):
+        owner, bail = self.creer_proprietaire('unitaire')
+        PremiumPayment.objects.bulk_record_payments(self.paiements(owner, bail)[:1])
+
+        payment = self.paiements(owner, bail)[0]
+        payment.bail = bail
+        # INSERT, audit, cache historique, bulk_update historique, écriture,
+        # incrément du cumul du mois (+ savepoint x 2)
+        with self.assertNumQueries(8):
+            payment.save()
+
+        payment = PremiumPayment.objects.get(pk=payment.pk)
+        payment.montant = Decimal('650.00')
+        # UPDATE, audit, cache historique, bulk_update historique, écriture lue puis
+        # modifiée sur place, un seul incrément net du cumul (+ savepoint x 2)
+        with self.assertNumQueries(9):
+            payment.save()
+        ecriture = PremiumComptableEcriture.objects.get(payment=payment)
+        self.assertEqual(ecriture.montant, Decimal('650.00'))
+        cumul = PremiumComptaMensuelle.objects.get(owner=owner, mois=date(2026, 1, 1))
+        self.assertEqual((cumul.montant, cumul.nb_ecritures), (Decimal('1151.00'), 2))
+
+        # Ni montant, ni statut, ni dates : UPDATE seul
+        with self.assertNumQueries(1):
+            payment.save()
+        self.assertEqual(PremiumPaymentAuditLog.objects.filter(payment=payment, action='UPDATE').count(), 1)
+
+    def test_delete_removes_rent_entry(self):
+        owner, bail = self.creer_proprietaire('suppression')
+        premier, deuxieme = PremiumPayment.objects.bulk_record_payments(self.paiements(owner, bail)[1:3])
+        self.assertEqual(PremiumComptableEcriture.objects.get(payment=premier).metadata, {'payment_id': premier.pk})
+
+        premier.delete()
+        self.assertEqual(list(PremiumComptableEcriture.objects.values_list('payment_id', flat=True)), [deuxieme.pk])
+        cumul = PremiumComptaMensuelle.objects.get(owner=owner)
+        self.assertEqual((cumul.montant, cumul.nb_ecritures), (Decimal('502.00'), 1))
+
+    def test_update_audits_loaded_snapshot(self):
+        owner, bail = self.creer_proprietaire('maj')
+        PremiumPayment.objects.bulk_record_payments(self.paiements(owner, bail)[:1])
+
+        payment = PremiumPayment.objects.get(owner=owner)
+        avant = payment.audit_snapshot()
+        payment.statut = 'PARTIEL'
+        payment.periode_fin = date(2026, 1, 31)
+        # UPDATE, audit, cache historique, bulk_update historique (+ savepoint x 2) :
+        # anciennes valeurs prises dans l'instantané de from_db, pas de relecture,
+        # écriture AUTO_LOYER inchangée (montant et date identiques)
+        with self.assertNumQueries(6):
+            payment.save()
+
+        log = PremiumPaymentAuditLog.objects.get(owner=owner, action='UPDATE')
+        self.assertEqual(log.old_data, avant)
+        self.assertEqual(log.new_data, {**avant, 'statut': 'PARTIEL', 'periode_fin': '2026-01-31'})
+        self.assertEqual(PremiumLocataire.objects.get(owner=owner).historique_paiements[0]['statut'], 'PARTIEL')
+
+        # Instance construite hors ORM : les valeurs précédentes sont relues
+        detachee = PremiumPayment(**{
+            field.attname: getattr(payment, field.attname) for field in PremiumPayment._meta.concrete_fields
+        })
+        detachee.statut = 'PAYE'
+        detachee.save()
+        log = PremiumPaymentAuditLog.objects.filter(owner=owner, action='UPDATE').order_by('-id').first()
+        self.assertEqual(log.old_data['statut'], 'PARTIEL')
+
+
+class ComptaMensuelleTests(TestCase):
+    """Cumul mensuel tenu à jour par appliquer() : identique au cumul du grand livre"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='cumul@example.com', username='cumul', password='secret', plan='premium')
+        self.bien = PremiumBien.objects.create(owner=self.owner, titre='Villa', adresse='Abidjan')
+        self.autre_bien = PremiumBien.objects.create(owner=self.owner, titre='Studio', adresse='Abidjan')
+
+    def ecriture(self, **kwargs):
+        valeurs = {
+            'owner': self.owner, 'bien': self.bien, 'type_ecriture': 'DEPENSE', 'libelle': 'Travaux',
+            'categorie': 'Entretien', 'date_operation': date(2026, 3, 10), 'montant': Decimal('100.00'),
+        }
+        valeurs.update(kwargs)
+        return PremiumComptableEcriture.objects.create(**valeurs)
+
+    def cumuls(self):
+        return sorted(
+            PremiumComptaMensuelle.objects.filter(owner=self.owner).values_list(
+                'bien_id', 'mois', 'type_ecriture', 'categorie', 'montant', 'nb_ecritures',
+            ),
+            key=str,
+        )
+
+    def grand_livre(self):
+        """Cumul recalculé depuis toutes les écritures du propriétaire"""
+        PremiumComptaMensuelle.objects.reconstruire(owner=self.owner)
+        return self.cumuls()
+
+    def assertCumulsExacts(self):
+        cumuls = self.cumuls()
+        self.assertEqual(cumuls, self.grand_livre())
+        return cumuls
+
+    def test_create_update_delete(self):
+        ecriture = self.ecriture()
+        self.ecriture(montant=Decimal('50.00'))
+        self.ecriture(bien=self.autre_bien, type_ecriture='REVENU', categorie='Loyer', date_operation=date(2026, 4, 2))
+        self.assertCumulsExacts()
+
+        ecriture.montant = Decimal('80.00')
+        ecriture.date_operation = date(2026, 5, 1)
+        ecriture.save()
+        self.assertCumulsExacts()
+
+        ecriture.delete()
+        cumuls = self.assertCumulsExacts()
+        self.assertEqual(len(cumuls), 2)
+
+    def test_bulk_and_removal_to_zero(self):
+        lignes = [
+            (self.owner.id, self.bien.id, date(2026, mois, 1), 'REVENU', 'Loyer', Decimal('500.00'))
+            for mois in (1, 1, 2)
+        ]
+        PremiumComptaMensuelle.objects.appliquer(lignes)
+        PremiumComptaMensuelle.objects.appliquer(lignes[:1])
+        cumul = PremiumComptaMensuelle.objects.get(owner=self.owner, mois=date(2026, 1, 1))
+        self.assertEqual((cumul.montant, cumul.nb_ecritures), (Decimal('1500.00'), 3))
+
+        # Cumul vidé supprimé, les autres décrémentés
+        PremiumComptaMensuelle.objects.appliquer(lignes, signe=-1)
+        self.assertEqual(
+            list(PremiumComptaMensuelle.objects.filter(owner=self.owner).values_list('mois', flat=True)),
+            [date(2026, 1, 1)],
+        )
+        PremiumComptaMensuelle.objects.appliquer(lignes[:1], signe=-1)
+        self.assertFalse(PremiumComptaMensuelle.objects.filter(owner=self.owner).exists())
+
+    def test_bien_deletion_merges_into_unassigned(self):
+        self.ecriture()
+        self.ecriture(bien=None, montant=Decimal('30.00'))
+        self.ecriture(bien=self.autre_bien, montant=Decimal('20.00'))
+
+        self.bien.delete()
+        cumuls = self.assertCumulsExacts()
+        self.assertIn((None, date(2026, 3, 1), 'DEPENSE', 'Entretien', Decimal('130.00'), 2), cumuls)
+
+        # Écriture suivante sans bien : incrément du cumul fusionné
+        self.ecriture(bien=None)
+        self.assertCumulsExacts()
+
+    def test_duplicate_key_rejected(self):
+        self.ecriture()
+        self.ecriture(bien=None)
+        for bien in (self.bien, None):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                PremiumComptaMensuelle.objects.create(
+                    owner=self.owner, bien=bien, mois=date(2026, 3, 1), type_ecriture='DEPENSE',
+                    categorie='Entretien', montant=Decimal('1.00'), nb_ecritures=1,
+                )
+
+
+class HistoriquePaiementsTests(TestCase):
+    """Cache historique_paiements des locataires : fusion à la création, ETag, portée du recalcul"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='histo@example.com', username='histo', password='secret', plan='premium')
+        bien = PremiumBien.objects.create(owner=self.owner, titre='Villa', adresse='Abidjan')
+        self.locataire = PremiumLocataire.objects.create(owner=self.owner, nom='Kone', prenoms='Awa', email='awa@example.com')
+        self.autre = PremiumLocataire.objects.create(owner=self.owner, nom='Diallo', prenoms='Moussa', email='moussa@example.com')
+        self.bail = PremiumBail.objects.create(owner=self.owner, bien=bien, locataire=self.locataire, date_entree=date(2024, 1, 1))
+        self.autre_bail = PremiumBail.objects.create(owner=self.owner, bien=bien, locataire=self.autre, date_entree=date(2024, 1, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def paiement(self, bail, mois, annee=2025, **kwargs):
+        return PremiumPayment(
+            owner=self.owner, bail=bail, date_paiement=date(annee, mois, 5), periode_debut=date(annee, mois, 1),
+            periode_fin=date(annee, mois, 28), montant=Decimal('500'), **kwargs
+        )
+
+    def historique_recalcule(self, locataire):
+        PremiumLocataire.objects.rafraichir_historique(PremiumLocataire.objects.filter(pk=locataire.pk))
+        return PremiumLocataire.objects.get(pk=locataire.pk).historique_paiements
+
+    def test_merged_cache_matches_full_refresh(self):
+        PremiumPayment.objects.bulk_record_payments([self.paiement(self.bail, mois) for mois in range(1, 13)])
+        # Paiement antérieur (hors des 12 derniers) puis paiements récents, sur les deux baux
+        PremiumPayment.objects.bulk_record_payments(
+            [self.paiement(self.bail, 6, annee=2024)]
+            + [self.paiement(bail, mois, annee=2026) for mois in (1, 2) for bail in (self.bail, self.autre_bail)]
+        )
+        for locataire in (self.locataire, self.autre):
+            historique = PremiumLocataire.objects.get(pk=locataire.pk).historique_paiements
+            self.assertEqual(historique, self.historique_recalcule(locataire))
+        self.assertEqual(len(historique), 2)
+        self.assertEqual(len(PremiumLocataire.objects.get(pk=self.locataire.pk).historique_paiements), 12)
+        self.assertEqual(historique[0]['montant'], '500.00')
+
+    def test_updated_payment_merged_into_cache(self):
+        PremiumPayment.objects.bulk_record_payments([self.paiement(self.bail, mois) for mois in range(1, 13)])
+        ancien = self.paiement(self.bail, 6, annee=2024)
+        ancien.save()
+        payments = {payment.date_paiement: payment for payment in PremiumPayment.objects.filter(bail=self.bail)}
+
+        # Montant modifié, paiement ancien ramené dans les 12 derniers, puis un paiement
+        # du cache reculé au-delà de la dernière entrée (l'ancien doit y revenir)
+        modifications = [
+            (date(2025, 12, 5), {'montant': Decimal('650')}),
+            (date(2024, 6, 5), {'date_paiement': date(2025, 11, 20)}),
+            (date(2025, 3, 5), {'date_paiement': date(2023, 1, 5)}),
+        ]
+        for date_paiement, valeurs in modifications:
+            payment = payments[date_paiement]
+            for champ, valeur in valeurs.items():
+                setattr(payment, champ, valeur)
+            payment.save()
+            historique = PremiumLocataire.objects.get(pk=self.locataire.pk).historique_paiements
+            self.assertEqual(historique, self.historique_recalcule(self.locataire))
+        self.assertEqual(historique[0]['montant'], '650.00')
+        self.assertNotIn('2023-01-05', [entree['date_paiement'] for entree in historique])
+
+    def test_unpaid_rent_kept_out_of_cache(self):
+        PremiumPayment.objects.bulk_record_payments([self.paiement(self.bail, mois) for mois in range(1, 13)])
+        updated_at = PremiumLocataire.objects.get(pk=self.locataire.pk).updated_at
+        # Loyers IMPAYE en lot (rent-roll) : INSERT + audit (+ savepoint x 2), cache intact
+        with self.assertNumQueries(4):
+            PremiumPayment.objects.bulk_record_payments(
+                [self.paiement(bail, 1, annee=2026, statut='IMPAYE') for bail in (self.bail, self.autre_bail)]
+            )
+        locataire = PremiumLocataire.objects.get(pk=self.locataire.pk)
+        self.assertEqual(locataire.updated_at, updated_at)
+        self.assertNotIn('2026-01-05', [entree['date_paiement'] for entree in locataire.historique_paiements])
+
+        # Loyer payé : entre dans le cache ; repassé IMPAYE : en sort, le suivant revient
+        loyer = PremiumPayment.objects.get(bail=self.bail, statut='IMPAYE')
+        loyer.statut = 'PAYE'
+        loyer.save()
+        self.assertEqual(PremiumLocataire.objects.get(pk=self.locataire.pk).historique_paiements[0]['id'], loyer.pk)
+        loyer.statut = 'IMPAYE'
+        loyer.save()
+        historique = PremiumLocataire.objects.get(pk=self.locataire.pk).historique_paiements
+        self.assertEqual(historique, self.historique_recalcule(self.locataire))
+        self.assertEqual([entree['date_paiement'] for entree in historique][::11], ['2025-12-05', '2025-01-05'])
+        self.assertEqual(PremiumLocataire.objects.get(pk=self.autre.pk).historique_paiements, [])
+
+    def test_legacy_cache_entries_recomputed(self):
+        PremiumLocataire.objects.filter(pk=self.locataire.pk).update(historique_paiements=[{'date': '2020-01-01'}])
+        PremiumPayment.objects.bulk_record_payments([self.paiement(self.bail, 1)])
+        historique = PremiumLocataire.objects.get(pk=self.locataire.pk).historique_paiements
+        self.assertEqual([entree['date_paiement'] for entree in historique], ['2025-01-05'])
+
+    def test_locataire_etag_changes_with_history(self):
+        url = f'/api/premium/locataires/{self.locataire.pk}/'
+        etag = self.client.get(url)['ETag']
+        payment = self.paiement(self.bail, 1)
+        payment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['historique_paiements']), 1)
+
+        etag = response['ETag']
+        payment.statut = 'PARTIEL'
+        payment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['historique_paiements'][0]['statut'], 'PARTIEL')
+
+    def test_unchanged_update_skips_refresh(self):
+        payment = self.paiement(self.bail, 1)
+        payment.save()
+        updated_at = PremiumLocataire.objects.get(pk=self.locataire.pk).updated_at
+        # UPDATE seul : ni audit, ni historique, ni écriture
+        with self.assertNumQueries(1):
+            payment.save()
+        self.assertEqual(PremiumLocataire.objects.get(pk=self.locataire.pk).updated_at, updated_at)
+
+
+class RentRollTests(TestCase):
+    """Rent-roll : loyers IMPAYE sans écriture, prorata, idempotence"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='rentroll@example.com', username='rentroll', password='secret', plan='premium'
+        )
+        self.bien = PremiumBien.objects.create(
+            owner=self.owner, titre='Villa', adresse='Abidjan', loyer_hc=Decimal('900.00'), charges=Decimal('100.00')
+        )
+        self.locataire = PremiumLocataire.objects.create(owner=self.owner, nom='Kone', prenoms='Awa', email='awa@example.com')
+
+    def creer_bail(self, date_entree, date_sortie=None):
+        return PremiumBail.objects.create(
+            owner=self.owner, bien=self.bien, locataire=self.locataire, date_entree=date_entree, date_sortie=date_sortie,
+        )
+
+    def test_unpaid_rent_books_no_revenue_until_paid(self):
+        self.creer_bail(date(2026, 1, 1))
+        report = generate_rent_roll(date(2026, 3, 1), owner=self.owner)
+        self.assertEqual(report['crees'], 1)
+        self.assertFalse(PremiumComptableEcriture.objects.filter(owner=self.owner).exists())
+        self.assertFalse(PremiumComptaMensuelle.objects.filter(owner=self.owner).exists())
+
+        payment = PremiumPayment.objects.get(owner=self.owner)
+        payment.statut = 'PAYE'
+        payment.date_paiement = date(2026, 3, 4)
+        payment.save()
+        ecriture = PremiumComptableEcriture.objects.get(owner=self.owner)
+        self.assertEqual((ecriture.source, ecriture.libelle, ecriture.montant), ('AUTO_LOYER', 'Loyer percu', Decimal('1000.00')))
+        self.assertEqual(ecriture.date_operation, date(2026, 3, 4))
+        self.assertEqual(ecriture.metadata, {'payment_id': payment.pk})
+
+        payment.statut = 'PARTIEL'
+        payment.montant = Decimal('400.00')
+        payment.save()
+        cumul = PremiumComptaMensuelle.objects.get(owner=self.owner)
+        self.assertEqual((cumul.montant, cumul.nb_ecritures), (Decimal('400.00'), 1))
+
+        payment.statut = 'IMPAYE'
+        payment.save()
+        self.assertFalse(PremiumComptableEcriture.objects.filter(owner=self.owner).exists())
+        self.assertFalse(PremiumComptaMensuelle.objects.filter(owner=self.owner).exists())
+
+    def test_idempotent(self):
+        bail = self.creer_bail(date(2026, 1, 1))
+        generate_rent_roll(date(2026, 3, 1), owner=self.owner)
+        report = generate_rent_roll(date(2026, 3, 1), owner=self.owner)
+        self.assertEqual((report['crees'], report['deja_presents']), (0, 1))
+
+        # Génération concurrente : le second loyer IMPAYE de la période est refusé
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PremiumPayment.objects.bulk_create([PremiumPayment(
+                owner=self.owner, bail=bail, date_paiement=date(2026, 3, 1), periode_debut=date(2026, 3, 1),
+                periode_fin=date(2026, 3, 31), montant=Decimal('1000.00'), statut='IMPAYE',
+            )])
+        # Plusieurs versements reçus sur la même période restent possibles
+        for _ in range(2):
+            PremiumPayment.objects.create(
+                owner=self.owner, bail=bail, date_paiement=date(2026, 3, 10), periode_debut=date(2026, 3, 1),
+                periode_fin=date(2026, 3, 31), montant=Decimal('500.00'), statut='PARTIEL',
+            )
+
+    def test_mid_month_lease_is_prorated(self):
+        entree = self.creer_bail(date(2026, 3, 16))
+        sortie = self.creer_bail(date(2025, 1, 1), date_sortie=date(2026, 3, 10))
+        report = generate_rent_roll(date(2026, 3, 1), owner=self.owner)
+        self.assertEqual(report['crees'], 2)
+
+        payment = PremiumPayment.objects.get(bail=entree)
+        # 16 jours sur 31
+        self.assertEqual(payment.montant, Decimal('516.13'))
+        self.assertEqual((payment.periode_debut, payment.periode_fin), (date(2026, 3, 16), date(2026, 3, 31)))
+        payment = PremiumPayment.objects.get(bail=sortie)
+        self.assertEqual(payment.montant, Decimal('322.58'))
+        self.assertEqual((payment.periode_debut, payment.periode_fin), (date(2026, 3, 1), date(2026, 3, 10)))
+        self.assertEqual(report['montant_total'], Decimal('838.71'))
+
+        # Loyer proratisé payé : le mois d'entrée n'est pas en retard
+        PremiumPayment.objects.filter(bail=entree).update(statut='PAYE')
+        arrears = compute_arrears(owner=self.owner, as_of=date(2026, 3, 31))
+        self.assertEqual([bail['bail_id'] for bail in arrears['baux']], [sortie.id])
+
+
+class ArrearsTests(TestCase):
+    """Impayés : versements partiels et mois en cours avant échéance"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='impayes@example.com', username='impayes', password='secret', plan='premium'
+        )
+        bien = PremiumBien.objects.create(
+            owner=self.owner, titre='Villa', adresse='Abidjan', loyer_hc=Decimal('900.00'), charges=Decimal('100.00')
+        )
+        locataire = PremiumLocataire.objects.create(owner=self.owner, nom='Kone', prenoms='Awa', email='awa@example.com')
+        self.bail = PremiumBail.objects.create(owner=self.owner, bien=bien, locataire=locataire, date_entree=date(2026, 1, 1))
+        for mois, montant, statut in [(1, '1000.00', 'PAYE'), (2, '250.00', 'PARTIEL'), (2, '150.00', 'PARTIEL')]:
+            PremiumPayment.objects.create(
+                owner=self.owner, bail=self.bail, date_paiement=date(2026, mois, 3), periode_debut=date(2026, mois, 1),
+                periode_fin=date(2026, mois, 28), montant=Decimal(montant), statut=statut,
+            )
+
+    def impayes(self, as_of):
+        report = compute_arrears(owner=self.owner, as_of=as_of)
+        bail, = report['baux']
+        return bail['mois_impayes'], bail['montant_du']
+
+    def test_partial_payment_leaves_balance(self):
+        self.assertEqual(self.impayes(date(2026, 2, 28)), (['2026-02'], Decimal('600.00')))
+
+    @override_settings(PREMIUM_LOYER_JOUR_ECHEANCE=5)
+    def test_current_month_counted_from_due_date(self):
+        self.assertEqual(self.impayes(date(2026, 3, 4)), (['2026-02'], Decimal('600.00')))
+        self.assertEqual(self.impayes(date(2026, 3, 5)), (['2026-02', '2026-03'], Decimal('1600.00')))
+
+        # Mois demandé via l'API : fin du mois, loyer exigible
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get('/api/premium/impayes/?mois=2026-03')
+        self.assertEqual(response.data['baux'][0]['mois_impayes'], ['2026-02', '2026-03'])
+
+    @override_settings(PREMIUM_LOYER_JOUR_ECHEANCE=5)
+    def test_lease_starting_after_as_of(self):
+        PremiumBail.objects.filter(pk=self.bail.pk).update(date_entree=date(2026, 3, 10))
+        self.assertEqual(compute_arrears(owner=self.owner, as_of=date(2026, 3, 8))['baux'], [])
+
+
+class ComptaExportTests(TestCase):
+    """Export des écritures : contenu des lignes CSV et FEC"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='export@example.com', username='export', password='secret', plan='premium'
+        )
+        self.bien = PremiumBien.objects.create(owner=self.owner, titre='Villa | Cocody\nLot 2', adresse='Abidjan')
+        self.revenu = PremiumComptableEcriture.objects.create(
+            owner=self.owner, bien=self.bien, type_ecriture='REVENU', libelle='Loyer "mars"', categorie='LOYER',
+            date_operation=date(2026, 3, 5), montant=Decimal('1234.50'),
+        )
+        self.depense = PremiumComptableEcriture.objects.create(
+            owner=self.owner, type_ecriture='DEPENSE', libelle='Plomberie', categorie='TRAVAUX',
+            date_operation=date(2026, 3, 20), montant=Decimal('200.00'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def export(self, modele):
+        response = self.client.get(f'/api/premium/comptabilite/ecritures/export/?modele={modele}&periode=2026-03')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_rows(self):
+        rows = list(csv.reader(StringIO(self.export('csv'))))
+        self.assertEqual(rows[0][:3], ['id', 'date_operation', 'type_ecriture'])
+        self.assertEqual(rows[1], [
+            str(self.revenu.id), '2026-03-05', 'REVENU', 'MANUEL', 'LOYER', 'Loyer "mars"', '1234.50',
+            str(self.bien.id), 'Villa | Cocody\nLot 2', '',
+        ])
+        self.assertEqual(rows[2][2:7], ['DEPENSE', 'MANUEL', 'TRAVAUX', 'Plomberie', '200.00'])
+        self.assertEqual(len(rows), 3)
+
+    def test_fec_lines_are_balanced(self):
+        lines = self.export('fec').splitlines()
+        header = lines[0].split('|')
+        self.assertEqual(len(header), 18)
+        rows = [dict(zip(header, line.split('|'))) for line in lines[1:]]
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(len(line.split('|')) == 18 for line in lines))
+
+        def montant(value):
+            return Decimal(value.replace(',', '.'))
+
+        for ecriture in (self.revenu, self.depense):
+            lignes = [row for row in rows if row['EcritureNum'] == str(ecriture.id)]
+            self.assertEqual(len(lignes), 2)
+            self.assertEqual(sum(montant(row['Debit']) for row in lignes), ecriture.montant)
+            self.assertEqual(sum(montant(row['Credit']) for row in lignes), ecriture.montant)
+
+        vente, banque, achat, paiement = rows
+        self.assertEqual(
+            [vente[key] for key in ('JournalCode', 'EcritureDate', 'CompteNum', 'CompAuxNum', 'CompAuxLib', 'EcritureLib', 'Debit', 'Credit')],
+            ['VE', '20260305', '706000', str(self.bien.id), 'Villa   Cocody Lot 2', "Loyer 'mars'", '0,00', '1234,50'],
+        )
+        self.assertEqual([banque['CompteNum'], banque['Debit'], banque['Credit']], ['512000', '1234,50', '0,00'])
+        self.assertEqual([achat['JournalCode'], achat['CompteNum'], achat['Debit']], ['AC', '615000', '200,00'])
+        self.assertEqual([paiement['CompteNum'], paiement['Credit']], ['512000', '200,00'])
+
+
+class FacetTests(TestCase):
+    """?facets= : chaque facette est comptée sans son propre filtre"""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(email='facettes@example.com', username='facettes', password='secret')
+        annonces = [
+            ('Paris', 'APPARTEMENT', 120000, 45, True), ('Paris', 'MAISON', 450000, 120, True),
+            ('Paris', 'APPARTEMENT', 60000, 18, False), ('Lyon', 'APPARTEMENT', 80000, None, True),
+            ('Abidjan', 'BUREAU', 2000000, 300, True),
+        ]
+        for index, (ville, type_bien, loyer, surface, disponible) in enumerate(annonces):
+            Appartement.objects.create(
+                proprietaire=owner, titre=f'Annonce {index}', description='Lumineux', adresse='1 rue de la Paix',
+                ville=ville, type_bien=type_bien, loyer_mensuel=loyer, surface=surface, disponible=disponible,
+            )
+        self.client = APIClient()
+
+    def test_facets_exclude_their_own_filter(self):
+        response = self.client.get('/api/appartements/?ville=Paris&type_bien=APPARTEMENT&facets=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        facets = response.data['facets']
+
+        # ville : filtrée sur type_bien seulement, les autres villes restent proposées
+        self.assertEqual(facets['ville'], [
+            {'valeur': 'Paris', 'nombre': 2}, {'valeur': 'Lyon', 'nombre': 1},
+        ])
+        # type_bien : filtrée sur ville seulement
+        self.assertEqual(facets['type_bien'], [
+            {'valeur': 'APPARTEMENT', 'nombre': 2}, {'valeur': 'MAISON', 'nombre': 1},
+        ])
+        # Facettes sans filtre actif : comptées sur les deux filtres
+        self.assertEqual({item['valeur']: item['nombre'] for item in facets['disponible']}, {True: 1, False: 1})
+        self.assertEqual(sum(tranche['nombre'] for tranche in facets['loyer_mensuel']), 2)
+
+    def test_subset_and_unknown_facet(self):
+        response = self.client.get('/api/appartements/?facets=ville')
+        self.assertEqual(list(response.data['facets']), ['ville'])
+        self.assertEqual(response.data['facets']['ville'][0], {'valeur': 'Paris', 'nombre': 3})
+
+        response = self.client.get('/api/appartements/?facets=prix')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+        self.assertNotIn('facets', self.client.get('/api/appartements/').data)
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?expand= : réponse élaguée, colonnes et jointures limitées"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email='champs@example.com', username='champs', password='secret', plan='premium', telephone='0700000000'
+        )
+        self.appartement = Appartement.objects.create(
+            proprietaire=self.owner, titre='Studio', description='Lumineux ' * 50, adresse='1 rue de la Paix',
+            loyer_mensuel=500, caution=1000,
+        )
+        self.photo = Photo.objects.create(appartement=self.appartement, image='appartements/photos/1.jpg', legende='Salon', ordre=1)
+        self.location = Location.objects.create(
+            appartement=self.appartement, locataire=self.owner, nom_locataire='Awa Kone', email_locataire='awa@example.com',
+            telephone_locataire='0700000001', date_debut=date(2026, 1, 1), date_fin=date(2026, 2, 1), montant_total=500,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, [query['sql'] for query in queries]
+
+    def test_list_reads_requested_columns_only(self):
+        response, queries = self.get('/api/appartements/?fields=slug,titre,photo_principale_url')
+        self.assertEqual(response.data['results'], [{
+            'slug': self.appartement.slug, 'titre': 'Studio', 'photo_principale_url': None,
+        }])
+        page = next(sql for sql in queries if 'LIMIT' in sql and '"api_appartement"."titre"' in sql)
+        self.assertNotIn('"api_appartement"."description"', page)
+        self.assertNotIn('"api_appartement"."adresse"', page)
+
+    def test_shape_queryset_only_columns(self):
+        serializer = LocationDetailSerializer()
+        prune_serializer(serializer, parse_field_tree('statut,appartement.titre'), {})
+        queryset = shape_queryset(Location.objects.select_related('appartement', 'locataire'), serializer)
+        colonnes, differe = queryset.query.deferred_loading
+        self.assertFalse(differe)
+        self.assertEqual(set(colonnes), {'id', 'statut', 'appartement', 'appartement__titre'})
+        self.assertEqual(set(queryset.query.select_related), {'appartement'})
+
+    def test_retrieve_nested_and_expand(self):
+        url = f'/api/appartements/{self.appartement.slug}/'
+        response, queries = self.get(url + '?fields=titre,caution_mois,proprietaire_telephone')
+        self.assertEqual(response.data, {'titre': 'Studio', 'caution_mois': 2, 'proprietaire_telephone': '0700000000'})
+        # Photos non demandées : pas de préchargement
+        self.assertFalse(any('"api_photo"."image"' in sql for sql in queries))
+
+        response, _ = self.get(url + '?fields=titre,photos')
+        self.assertEqual(response.data['photos'], [self.photo.pk])
+        response, _ = self.get(url + '?fields=titre,photos.legende')
+        self.assertEqual(response.data['photos'], [{'legende': 'Salon'}])
+        response, _ = self.get(url + '?fields=titre&expand=photos')
+        self.assertEqual(set(response.data['photos'][0]), {'id', 'image', 'legende'})
+
+    def test_location_query_count(self):
+        url = f'/api/locations/{self.location.pk}/?fields=statut,appartement.titre,duree_sejour'
+        # Empreinte ETag, location + annonce (une jointure, sans le locataire)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data, {'statut': 'RESERVE', 'appartement': {'titre': 'Studio'}, 'duree_sejour': 31})
+
+        response, queries = self.get('/api/locations/?fields=id,appartement_titre')
+        self.assertEqual(response.data['results'], [{'id': self.location.pk, 'appartement_titre': 'Studio'}])
+        self.assertFalse(any('"api_user"."email"' in sql for sql in queries[-1:]))
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/appartements/?fields=titre,inconnu')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('inconnu', response.data['error'])
+        response = self.client.get(f'/api/appartements/{self.appartement.slug}/?fields=titre.x')
+        self.assertEqual(response.status_code, 400)
+
+
+class ComptaEntryFilterTests(TestCase):
+    """Filtres periode / date_debut / date_fin des écritures"""
+
+    def setUp(self):
+        owner = User.objects.create_user(email='filtres@example.com', username='filtres', password='secret', plan='premium')
+        for jour in (date(2025, 12, 31), date(2026, 1, 1), date(2026, 1, 15), date(2026, 2, 1), date(2026, 4, 1)):
+            PremiumComptableEcriture.objects.create(
+                owner=owner, type_ecriture='REVENU', libelle=jour.isoformat(), date_operation=jour, montant=100,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def dates(self, query):
+        response = self.client.get(f'/api/premium/comptabilite/ecritures/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(ecriture['date_operation'] for ecriture in response.data['results'])
+
+    def test_periods_and_date_range(self):
+        self.assertEqual(self.dates('periode=2026-01'), ['2026-01-01', '2026-01-15'])
+        self.assertEqual(self.dates('periode=2026-T1'), ['2026-01-01', '2026-01-15', '2026-02-01'])
+        self.assertEqual(self.dates('periode=2026'), ['2026-01-01', '2026-01-15', '2026-02-01', '2026-04-01'])
+        self.assertEqual(self.dates('date_debut=2026-01-01&date_fin=2026-02-01'), ['2026-01-01', '2026-01-15', '2026-02-01'])
+        self.assertEqual(self.dates('date_fin=2026-01-01'), ['2025-12-31', '2026-01-01'])
+        self.assertEqual(self.dates('periode=2026-01&date_debut=2026-01-02'), ['2026-01-15'])
+
+    def test_invalid_values(self):
+        url = '/api/premium/comptabilite/ecritures/'
+        response = self.client.get(url, {'periode': '2026-13'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Période invalide', response.data['error'])
+
+        # periode valide, date invalide : message des dates
+        for params in ({'periode': '2026-01', 'date_debut': '01/01/2026'}, {'date_fin': '2026-02-30'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'Date invalide, format attendu: YYYY-MM-DD')
+
+
+class AuditArchiveTests(TestCase):
+    """Archivage / restauration de l'audit, liste fusionnée et détail d'une ligne archivée"""
+
+    def setUp(self):
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root, ignore_errors=True)
+        settings_override = override_settings(AUDIT_ARCHIVE_ROOT=self.archive_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = User.objects.create_user(email='audit@example.com', username='audit', password='secret', plan='premium')
+        bien = PremiumBien.objects.create(owner=self.owner, titre='Villa', adresse='Abidjan')
+        locataire = PremiumLocataire.objects.create(owner=self.owner, nom='Kone', prenoms='Awa', email='awa@example.com')
+        bail = PremiumBail.objects.create(owner=self.owner, bien=bien, locataire=locataire, date_entree=date(2025, 1, 1))
+        payments = [
+            PremiumPayment.objects.create(
+                owner=self.owner, bail=bail, date_paiement=date(2026, 1, 5), periode_debut=date(2026, 1, 1),
+                periode_fin=date(2026, 1, 31), montant=Decimal('100.00') + index, statut='PAYE',
+            )
+            for index in range(6)
+        ]
+        payments[0].delete()
+
+        # Deux mois archivables (avant le début du mois M-2), les dernières lignes restent en base
+        now = timezone.now()
+        logs = list(PremiumPaymentAuditLog.objects.filter(owner=self.owner).order_by('id'))
+        for index, log in enumerate(logs[:6]):
+            jours = 150 if index < 3 else 95
+            log.changed_at = now - timedelta(days=jours) + timedelta(minutes=index)
+        # Deux lignes à la même date : départage par id
+        logs[2].changed_at = logs[1].changed_at
+        PremiumPaymentAuditLog.objects.bulk_update(logs[:6], ['changed_at'])
+        self.attendus = list(
+            PremiumPaymentAuditLog.objects.order_by('-changed_at', '-id').values_list('id', 'changed_at')
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def archiver(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive_audit_logs(mois_conserves=2)
+
+    def parcourir(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [log['id'] for log in response.data['results']]
+            url = response.data['links']['next']
+            if url:
+                self.assertIn('cursor=', url)
+            pages += 1
+        return ids, pages
+
+    def test_merged_pages_use_same_cursor(self):
+        url = '/api/premium/payments/audit-logs/?page_size=2'
+        avant_archivage = self.parcourir(url)
+        self.assertEqual(avant_archivage, ([pk for pk, _ in self.attendus], 4))
+
+        report = self.archiver()
+        self.assertEqual((report['mois_archives'], report['lignes_archivees']), (2, 6))
+        self.assertEqual(PremiumPaymentAuditLog.objects.filter(owner=self.owner).count(), 1)
+        self.assertEqual(self.parcourir(url), avant_archivage)
+
+        # Curseur de la table seule repris sur la liste fusionnée
+        premiere = self.client.get(url).data['links']['next']
+        PremiumPaymentAuditArchive.objects.all().delete()
+        self.assertEqual([log['id'] for log in self.client.get(premiere).data['results']], [])
+        self.assertEqual(self.client.get(url + '&cursor=invalide').status_code, 404)
+
+    def test_archived_detail(self):
+        archive_id = self.attendus[-1][0]
+        self.archiver()
+        self.assertFalse(PremiumPaymentAuditLog.objects.filter(pk=archive_id).exists())
+        # Détail lu dans le seul fichier dont la plage d'ids contient la ligne
+        archive = PremiumPaymentAuditArchive.objects.get(premier_id__lte=archive_id, dernier_id__gte=archive_id)
+        self.assertEqual(archive.premier_id, archive_id)
+
+        response = self.client.get(f'/api/premium/payments/audit-logs/{archive_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['action'], 'INSERT')
+        self.assertEqual(response.data['new_data']['montant'], '100.00')
+        self.assertIsNone(response.data['payment'])
+        self.assertEqual(self.client.get('/api/premium/payments/audit-logs/999999/').status_code, 404)
+
+        autre = User.objects.create_user(email='autre@example.com', username='autre', password='secret', plan='premium')
+        self.client.force_authenticate(autre)
+        self.assertEqual(self.client.get(f'/api/premium/payments/audit-logs/{archive_id}/').status_code, 404)
+
+    def test_archive_restore_round_trip(self):
+        self.archiver()
+        fichiers = list(PremiumPaymentAuditArchive.objects.values_list('fichier', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            report = restore_audit_archives(owner=self.owner)
+
+        self.assertEqual(report, {'archives_restaurees': 2, 'lignes_restaurees': 6})
+        self.assertFalse(PremiumPaymentAuditArchive.objects.exists())
+        self.assertEqual(
+            list(PremiumPaymentAuditLog.objects.order_by('-changed_at', '-id').values_list('id', 'changed_at')),
+            self.attendus,
+        )
+        # Paiement supprimé depuis : référence remise à NULL
+        self.assertIsNone(PremiumPaymentAuditLog.objects.get(pk=self.attendus[-1][0]).payment_id)
+        storage = FileSystemStorage(location=self.archive_root)
+        self.assertFalse(any(storage.exists(fichier) for fichier in fichiers))
+
+
+@override_settings(RGPD_RETENTION_DAYS=365)
+class RgpdPurgeTests(TestCase):
+    """Purge RGPD par lots : date limite de rétention, champs effacés, comptage par propriétaire"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='rgpd@example.com', username='rgpd', password='secret', plan='premium')
+        self.autre = User.objects.create_user(email='rgpd2@example.com', username='rgpd2', password='secret', plan='premium')
+        self.limite = timezone.now().date() - timedelta(days=365)
+
+    def locataire(self, owner, date_depart, **kwargs):
+        return PremiumLocataire.objects.create(
+            owner=owner, nom='Kone', prenoms='Awa', email='awa@example.com', telephone='0700000000',
+            date_naissance=date(1990, 1, 1), profession='Comptable', piece_identite_chiffree='chiffre',
+            garant_chiffre='chiffre', historique_paiements=[{'id': 1}], date_depart=date_depart, **kwargs
+        )
+
+    def test_retention_cutoff_and_counts(self):
+        purges = [
+            self.locataire(self.owner, self.limite),
+            self.locataire(self.owner, self.limite - timedelta(days=30)),
+            self.locataire(self.autre, self.limite - timedelta(days=1)),
+        ]
+        conserves = [
+            self.locataire(self.owner, self.limite + timedelta(days=1)),
+            self.locataire(self.owner, None),
+        ]
+        self.locataire(self.autre, self.limite - timedelta(days=1), is_purged=True)
+
+        log = purge_departed_locataires(chunk_size=2)
+
+        self.assertEqual(log.date_limite, self.limite)
+        self.assertEqual(log.nb_locataires, 3)
+        self.assertEqual(log.par_proprietaire, {str(self.owner.pk): 2, str(self.autre.pk): 1})
+        self.assertEqual(PremiumRgpdPurgeLog.objects.count(), 1)
+        self.assertEqual(
+            set(PremiumLocataire.objects.filter(is_purged=True, email__startswith='purged+').values_list('id', flat=True)),
+            {locataire.id for locataire in purges},
+        )
+        for locataire in conserves:
+            locataire.refresh_from_db()
+            self.assertFalse(locataire.is_purged)
+            self.assertEqual(locataire.telephone, '0700000000')
+
+    def test_blanked_fields(self):
+        locataire = self.locataire(self.owner, self.limite)
+        updated_at = locataire.updated_at
+        purge_departed_locataires()
+
+        locataire.refresh_from_db()
+        self.assertTrue(locataire.is_purged)
+        self.assertEqual(locataire.email, f'purged+{locataire.id}@deleted.local')
+        self.assertEqual(
+            (locataire.telephone, locataire.date_naissance, locataire.profession,
+             locataire.piece_identite_chiffree, locataire.garant_chiffre, locataire.historique_paiements),
+            ('', None, '', '', '', []),
+        )
+        # Nom et prénoms conservés (baux et comptabilité), ETag modifié
+        self.assertEqual((locataire.nom, locataire.prenoms), ('Kone', 'Awa'))
+        self.assertGreater(locataire.updated_at, updated_at)
+
+    def test_already_purged_rows_not_counted(self):
+        # Locataire purgé entre la lecture des ids et l'UPDATE (purge concurrente)
+        a_purger = self.locataire(self.owner, self.limite)
+        deja_purge = self.locataire(self.owner, self.limite)
+        PremiumLocataire.objects.purger(PremiumLocataire.objects.filter(pk=deja_purge.pk))
+        purge_le = PremiumLocataire.objects.get(pk=deja_purge.pk).updated_at
+
+        par_proprietaire = PremiumLocataire.objects.purger(
+            PremiumLocataire.objects.filter(pk__in=[a_purger.pk, deja_purge.pk])
+        )
+        self.assertEqual(par_proprietaire, {str(self.owner.pk): 1})
+        # Ni réécrit ni compté
+        self.assertEqual(PremiumLocataire.objects.get(pk=deja_purge.pk).updated_at, purge_le)
+        self.assertEqual(PremiumLocataire.objects.purger(PremiumLocataire.objects.filter(pk=a_purger.pk)), {})
+
+
+class GeoOrderingTests(TestCase):
+    """?ordering= avec la recherche par rayon : distance_km triée par GeoFilterBackend"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='geo@example.com', username='geo', password='secret', plan='premium')
+        # Abidjan (Plateau) puis de plus en plus loin vers l'est
+        for titre, longitude, loyer in (('Loin', '-3.90', 100), ('Proche', '-4.02', 300), ('Moyen', '-3.96', 200)):
+            PremiumBien.objects.create(
+                owner=self.owner, titre=titre, adresse='Abidjan', latitude=Decimal('5.32'),
+                longitude=Decimal(longitude), loyer_hc=loyer,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.rayon = 'latitude=5.32&longitude=-4.02&rayon_km=50'
+
+    def titres(self, query):
+        response = self.client.get(f'/api/premium/biens/?{query}')
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return [bien['titre'] for bien in response.data['results']]
+
+    def test_ordering_by_distance(self):
+        self.assertEqual(self.titres(self.rayon), ['Proche', 'Moyen', 'Loin'])
+        self.assertEqual(self.titres(f'{self.rayon}&ordering=distance_km'), ['Proche', 'Moyen', 'Loin'])
+        self.assertEqual(self.titres(f'{self.rayon}&ordering=-distance_km'), ['Loin', 'Moyen', 'Proche'])
+        self.assertEqual(self.titres(f'{self.rayon}&ordering=statut,-distance_km,owner__password'), ['Loin', 'Moyen', 'Proche'])
+
+    def test_declared_ordering_fields(self):
+        self.assertEqual(self.titres(f'{self.rayon}&ordering=loyer_hc'), ['Loin', 'Moyen', 'Proche'])
+        self.assertEqual(self.titres('ordering=-loyer_hc'), ['Proche', 'Moyen', 'Loin'])
+        # distance_km sans rayon, champ non déclaré : ignorés, pas d'erreur
+        self.assertEqual(len(self.titres('ordering=distance_km')), 3)
+        self.assertEqual(len(self.titres('ordering=owner__password')), 3)
+
+
+class BienCacheInvalidationTests(TestCase):
+    """Cache des annonces : invalidé seulement quand les coordonnées d'un bien lié changent"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='carte@example.com', username='carte', password='secret', plan='premium')
+        self.bien = PremiumBien.objects.create(
+            owner=self.owner, titre='Villa', adresse='Abidjan', latitude=Decimal('5.32'), longitude=Decimal('-4.02'),
+        )
+        self.appartement = Appartement.objects.create(
+            proprietaire=self.owner, titre='Villa Cocody', description='Lumineux', adresse='Abidjan',
+            loyer_mensuel=500, bien=self.bien,
+        )
+        self.bien = PremiumBien.objects.get(pk=self.bien.pk)
+
+    def assertInvalide(self, attendu, action):
+        generation = get_generation(APPARTEMENTS_CACHE_NAMESPACE)
+        action()
+        self.assertEqual(get_generation(APPARTEMENTS_CACHE_NAMESPACE) != generation, attendu)
+
+    def test_only_coordinate_changes_of_linked_bien(self):
+        def statut():
+            self.bien.statut = 'LOUE'
+            self.bien.save()
+
+        def memes_coordonnees():
+            self.bien.latitude = '5.32'
+            self.bien.save()
+
+        def coordonnees():
+            self.bien.latitude = Decimal('5.33')
+            self.bien.save()
+
+        self.assertInvalide(False, statut)
+        self.assertInvalide(False, memes_coordonnees)
+        self.assertInvalide(False, lambda: self.bien.save(update_fields=['titre']))
+        self.assertInvalide(True, coordonnees)
+        # Instantané remis à jour après la sauvegarde
+        self.assertInvalide(False, statut)
+
+    def test_unlinked_bien(self):
+        autre = PremiumBien.objects.create(owner=self.owner, titre='Garage', adresse='Abidjan')
+
+        def coordonnees():
+            autre.latitude, autre.longitude = Decimal('5.30'), Decimal('-4.00')
+            autre.save()
+
+        self.assertInvalide(False, coordonnees)
+        self.assertInvalide(False, autre.delete)
+
+    def test_delete_linked_bien(self):
+        self.assertInvalide(True, self.bien.delete)
+        self.appartement.refresh_from_db()
+        self.assertIsNone(self.appartement.bien_id)
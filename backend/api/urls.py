@@ -13,7 +13,7 @@ from .views import (
     ChangePasswordView, UpdatePlanView,
     
     # Favoris
-    FavorisView,
+    FavorisView, FavorisSyncView,
     
     # Dashboards
     ProprietaireDashboardView, LocataireDashboardView,
@@ -34,7 +34,12 @@ from .premium_views import (
     PremiumPaymentViewSet,
     PremiumDashboardView,
     PremiumPaymentAuditLogListView,
+    PremiumPaymentAuditLogDetailView,
     PremiumRgpdPurgeView,
+    PremiumRgpdBatchPurgeView,
+    PremiumRentRollView,
+    PremiumArrearsView,
+    PremiumComptaSummaryView,
 )
 
 # Router pour les ViewSets
@@ -66,6 +71,7 @@ auth_patterns = [
 # URLs spécifiques aux rôles
 role_patterns = [
     path('favoris/', FavorisView.as_view(), name='favoris'),
+    path('favoris/sync/', FavorisSyncView.as_view(), name='favoris_sync'),
     path('dashboard/proprietaire/', ProprietaireDashboardView.as_view(), name='dashboard_proprietaire'),
     path('dashboard/locataire/', LocataireDashboardView.as_view(), name='dashboard_locataire'),
 ]
@@ -74,7 +80,12 @@ urlpatterns = [
     # Premium (custom endpoints before router to avoid route conflicts)
     path('premium/dashboard/', PremiumDashboardView.as_view(), name='premium_dashboard'),
     path('premium/payments/audit-logs/', PremiumPaymentAuditLogListView.as_view(), name='premium_payment_audit_logs'),
+    path('premium/payments/audit-logs/<int:pk>/', PremiumPaymentAuditLogDetailView.as_view(), name='premium_payment_audit_log_detail'),
     path('premium/rgpd/purge/', PremiumRgpdPurgeView.as_view(), name='premium_rgpd_purge'),
+    path('premium/rgpd/purge-batch/', PremiumRgpdBatchPurgeView.as_view(), name='premium_rgpd_purge_batch'),
+    path('premium/rent-roll/', PremiumRentRollView.as_view(), name='premium_rent_roll'),
+    path('premium/comptabilite/summary/', PremiumComptaSummaryView.as_view(), name='premium_compta_summary'),
+    path('premium/impayes/', PremiumArrearsView.as_view(), name='premium_arrears'),
 
     # API principale
     path('', include(router.urls)),
@@ -5,10 +5,12 @@ from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, I
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, F, Exists, OuterRef, Prefetch, Value, Min, Max
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.http import FileResponse
+from django.conf import settings
+from django.utils.cache import patch_cache_control
 from django.core.files.base import ContentFile
 from typing import TYPE_CHECKING
 from django.contrib.auth.models import AbstractBaseUser
@@ -35,7 +37,7 @@ from .serializers import (
     DossierLocataireSerializer,
 
     # Favoris
-    FavoriCreateSerializer,
+    FavoriCreateSerializer, FavoriSyncSerializer,
 
     # Divers
     DisponibiliteSerializer
@@ -43,8 +45,19 @@ from .serializers import (
 from .permissions import (
     IsAdminOrReadOnly, IsOwnerOrAdmin, IsProprietaire, IsLocataire, CanManageAppartement
 )
-from .pagination import StandardResultsSetPagination
+from .pagination import StandardResultsSetPagination, FavorisCursorPagination
 from .utils import send_reservation_confirmation_email, send_bail_generated_email
+from .facets import FacetedListMixin
+from .columnar import ColumnarListMixin
+from .fieldsets import SparseFieldsetMixin, shape_queryset
+from .parsers import FastJSONParser
+from .geo import GeoFilterBackend, bbox_q, cluster_cells, parse_bbox, parse_tile
+from .geo_utils import CELLULE_ZOOM, tile_cellules
+from .caching import (
+    APPARTEMENTS_CACHE_NAMESPACE, anonymous_cache_key, public_cache_key, cached_response, store_response,
+    get_last_modified,
+    ConditionalGetMixin, ConditionalAPIViewMixin, conditional_get, aggregate_fingerprint,
+)
 import logging
 
 User = get_user_model()
@@ -54,6 +67,12 @@ logger = logging.getLogger(__name__)
 if TYPE_CHECKING:
     from .models import User
 
+# Colonnes lues par AppartementListSerializer (photo_principale pour photo_principale_url)
+APPARTEMENT_LIST_COLUMNS = (
+    'id', 'slug', 'titre', 'ville', 'type_bien', 'loyer_mensuel', 'surface',
+    'nb_pieces', 'disponible', 'photo_principale', 'nb_vues', 'nb_favoris',
+)
+
 
 # ========== VUES AUTHENTIFICATION ==========
 
@@ -248,20 +267,32 @@ class UpdatePlanView(generics.GenericAPIView):
 
 # ========== VUES APPARTEMENTS ==========
 
-class AppartementViewSet(viewsets.ModelViewSet):
+class AppartementViewSet(ConditionalGetMixin, FacetedListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les appartements
     """
     queryset = Appartement.objects.all()
+    conditional_timestamp_fields = ('date_modification',)
+    # Compteurs exposés par les sérialiseurs, mis à jour par .update()
+    conditional_counter_fields = ('nb_vues', 'nb_favoris')
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, GeoFilterBackend]
     filterset_fields = ['disponible', 'ville', 'nb_pieces', 'proprietaire', 'type_bien']
+    # Coordonnées portées par le bien Premium lié
+    geo_field_prefix = 'bien__'
+    # ?facets= : comptes par valeur et tranches de loyer (CFA) / surface (m²)
+    facet_fields = ['ville', 'type_bien', 'nb_pieces', 'disponible']
+    facet_histograms = {
+        'loyer_mensuel': [0, 50000, 100000, 150000, 200000, 300000, 500000, 1000000],
+        'surface': [0, 20, 40, 60, 80, 100, 150, 200],
+    }
+    facet_cache_namespace = APPARTEMENTS_CACHE_NAMESPACE
     search_fields = ['titre', 'description', 'adresse', 'ville']
     ordering_fields = ['loyer_mensuel', 'surface', 'date_creation', 'nb_vues']
     ordering = ['-date_creation']
     pagination_class = StandardResultsSetPagination
     lookup_field = 'slug'
-    parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
+    parser_classes = [parsers.MultiPartParser, parsers.FormParser, FastJSONParser]
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -277,15 +308,82 @@ class AppartementViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticatedOrReadOnly()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+
+        if self.action == 'list':
+            # Colonnes lues par AppartementListSerializer uniquement (pas de description)
+            queryset = shape_queryset(queryset, AppartementListSerializer())
+            # Indicateur favori en une sous-requête EXISTS (rien pour les anonymes)
+            if user.is_authenticated:
+                queryset = queryset.annotate(
+                    is_favori=Exists(
+                        Favori.objects.filter(locataire=user, appartement=OuterRef('pk'))
+                    )
+                )
+        elif self.action == 'retrieve':
+            # Téléphone du propriétaire en jointure, photos en une requête dans l'ordre d'affichage
+            queryset = queryset.select_related('proprietaire').prefetch_related(
+                Prefetch('photos', queryset=Photo.objects.order_by('ordre', 'id'))
+            )
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save(proprietaire=self.request.user)
     
+    def list(self, request, *args, **kwargs):
+        """Liste servie depuis le cache versionné pour les visiteurs anonymes"""
+        cache_key = anonymous_cache_key(request, APPARTEMENTS_CACHE_NAMESPACE)
+        if cache_key is None:
+            return super().list(request, *args, **kwargs)
+
+        cached = cached_response(request, cache_key)
+        if cached is not None:
+            return cached
+
+        last_modified = get_last_modified(APPARTEMENTS_CACHE_NAMESPACE)
+        response = super().list(request, *args, **kwargs)
+        return store_response(cache_key, response, last_modified)
+
     def retrieve(self, request, *args, **kwargs):
         """Incrémente le compteur de vues à la consultation"""
-        instance = self.get_object()
-        instance.incrementer_vues()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        # Le comptage des vues est fait avant toute réponse (hit de cache, 304 ou 200)
+        # en une seule requête UPDATE
+        Appartement.objects.filter(
+            **{self.lookup_field: kwargs[self.lookup_field]}
+        ).update(nb_vues=F('nb_vues') + 1)
+
+        cache_key = anonymous_cache_key(request, APPARTEMENTS_CACHE_NAMESPACE)
+        if cache_key is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        cached = cached_response(request, cache_key)
+        if cached is not None:
+            return cached
+
+        last_modified = get_last_modified(APPARTEMENTS_CACHE_NAMESPACE)
+        response = super().retrieve(request, *args, **kwargs)
+        return store_response(cache_key, response, last_modified)
+
+    def get_conditional_fingerprint(self, request):
+        fingerprint = super().get_conditional_fingerprint(request)
+
+        # is_favori dépend des favoris de l'utilisateur
+        if self.action == 'list' and request.user.is_authenticated:
+            fingerprint += aggregate_fingerprint(
+                Favori.objects.filter(locataire=request.user), 'date_ajout'
+            )
+
+        # Le détail inclut les photos
+        if self.action == 'retrieve':
+            fingerprint += aggregate_fingerprint(
+                Photo.objects.filter(
+                    **{f'appartement__{self.lookup_field}': self.kwargs[self.lookup_field]}
+                ),
+                'date_upload',
+            )
+        return fingerprint
     
     @action(detail=True, methods=['get'])
     def locations(self, request, slug=None):
@@ -293,7 +391,7 @@ class AppartementViewSet(viewsets.ModelViewSet):
         appartement = self.get_object()
         locations = appartement.locations.filter(
             Q(statut__in=['RESERVE', 'CONFIRME', 'PAYE'])
-        ).order_by('date_debut')
+        ).select_related('appartement', 'locataire').order_by('date_debut')
         
         page = self.paginate_queryset(locations)
         if page is not None:
@@ -302,6 +400,59 @@ class AppartementViewSet(viewsets.ModelViewSet):
         
         serializer = LocationListSerializer(locations, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        Annonces disponibles regroupées par cellule de carte (nombre, centroïde, loyers min / max).
+        ?tile=z/x/y : une tuile (forme à privilégier, mise en cache par tuile)
+        ?bbox=min_lng,min_lat,max_lng,max_lat&zoom=z : un rectangle quelconque
+        """
+        # Réponse identique pour tous les utilisateurs : cache partagé, invalidé
+        # avec les annonces et les coordonnées des biens
+        cache_key = public_cache_key(request, APPARTEMENTS_CACHE_NAMESPACE)
+        max_age = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300)
+        if cache_key is not None:
+            cached = cached_response(request, cache_key)
+            if cached is not None:
+                patch_cache_control(cached, public=True, max_age=max_age)
+                return cached
+
+        appartements = Appartement.objects.filter(disponible=True)
+        try:
+            if request.query_params.get('tile'):
+                zoom, x, y = parse_tile(request.query_params['tile'])
+                # Les cellules d'une tuile forment un intervalle de la colonne indexée
+                appartements = appartements.filter(bien__cellule__range=tile_cellules(zoom, x, y))
+            elif request.query_params.get('bbox'):
+                zoom = request.query_params.get('zoom', '')
+                if not zoom.isdigit() or int(zoom) > CELLULE_ZOOM:
+                    raise ValueError(f"zoom doit être un entier entre 0 et {CELLULE_ZOOM}")
+                zoom = int(zoom)
+                appartements = appartements.filter(bbox_q(parse_bbox(request.query_params['bbox']), 'bien__'))
+            else:
+                raise ValueError("Paramètre tile (z/x/y) ou bbox et zoom requis")
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cells = cluster_cells(
+            appartements, zoom, prefix='bien__',
+            loyer_min=Min('loyer_mensuel'), loyer_max=Max('loyer_mensuel'), slug=Min('slug'),
+        )
+        for cell in cells:
+            # Le slug n'a de sens que pour une annonce isolée (marqueur cliquable)
+            if cell['nombre'] > 1:
+                del cell['slug']
+
+        response = Response({
+            'zoom': zoom,
+            'total': sum(cell['nombre'] for cell in cells),
+            'clusters': cells,
+        })
+        patch_cache_control(response, public=True, max_age=max_age)
+        if cache_key is None:
+            return response
+        return store_response(cache_key, response, get_last_modified(APPARTEMENTS_CACHE_NAMESPACE))
     
     @action(detail=True, methods=['post'])
     def check_disponibilite(self, request, slug=None):
@@ -368,11 +519,12 @@ class AppartementViewSet(viewsets.ModelViewSet):
 
 # ========== VUES LOCATIONS ==========
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(ConditionalGetMixin, ColumnarListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les locations
     """
     queryset = Location.objects.all()
+    conditional_timestamp_fields = ('date_modification', 'appartement__date_modification', 'locataire__date_modification')
     permission_classes = [IsOwnerOrAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['statut', 'appartement', 'locataire']
@@ -381,6 +533,8 @@ class LocationViewSet(viewsets.ModelViewSet):
     ordering = ['-date_reservation']
     pagination_class = StandardResultsSetPagination
     serializer_class = LocationListSerializer
+    # ?format=columnar : URL du bail lue directement dans la colonne bail_pdf
+    columnar_fields = {'bail_pdf_url': 'bail_pdf'}
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -404,6 +558,10 @@ class LocationViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return queryset.none()
 
+        if self.action in ('list', 'retrieve'):
+            # Champs appartement_* / locataire_nom (liste) et objets imbriqués (détail)
+            queryset = queryset.select_related('appartement', 'locataire')
+
         if hasattr(user, 'is_staff') and user.is_staff:
             return queryset
 
@@ -412,7 +570,14 @@ class LocationViewSet(viewsets.ModelViewSet):
             Q(locataire=user) |
             Q(email_locataire=user.email)
         ).distinct()
-    
+
+    def get_conditional_fingerprint(self, request):
+        # Le détail imbrique l'annonce avec ses compteurs nb_vues / nb_favoris
+        counter_fields = ('appartement__nb_vues', 'appartement__nb_favoris') if self.action == 'retrieve' else ()
+        return aggregate_fingerprint(
+            self.get_conditional_queryset(), *self.conditional_timestamp_fields, counter_fields=counter_fields,
+        )
+
     def perform_create(self, serializer):
         location = serializer.save()
         
@@ -701,13 +866,29 @@ class FavorisView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsLocataire]
     serializer_class = FavoriCreateSerializer
 
+    @property
+    def paginator(self):
+        """Pagination par curseur sur demande (?pagination=cursor), sinon pagination standard"""
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            if request is not None and request.query_params.get('pagination') == 'cursor':
+                self._paginator = FavorisCursorPagination()
+            else:
+                self._paginator = StandardResultsSetPagination()
+        return self._paginator
+
     def get(self, request):
         """Liste des favoris"""
         try:
             locataire = request.user
-            favoris = Favori.objects.filter(locataire=locataire).select_related('appartement').all()
-            # Sérialiser les appartements liés aux objets Favori (évite d'essayer de sérialiser des Favori avec AppartementListSerializer)
-            appartements = [f.appartement for f in favoris if getattr(f, 'appartement', None) is not None]
+            # Jointure sur Favori : filtrage, tri et pagination faits en base,
+            # en ne chargeant que les colonnes utiles à AppartementListSerializer
+            appartements = Appartement.objects.filter(
+                favoris__locataire=locataire
+            ).annotate(
+                date_favori=F('favoris__date_ajout'),
+                is_favori=Value(True),
+            ).only(*APPARTEMENT_LIST_COLUMNS).order_by('-date_favori', '-pk')
 
             page = self.paginate_queryset(appartements)
             if page is not None:
@@ -727,28 +908,25 @@ class FavorisView(generics.GenericAPIView):
             try:
                 locataire = request.user
                 appartement = get_object_or_404(
-                    Appartement, 
+                    Appartement.objects.only('id'),
                     id=serializer.validated_data['appartement_id']
                 )
 
                 action = serializer.validated_data['action']
 
                 if action == 'add':
-                    favori, created = Favori.objects.get_or_create(
-                        locataire=locataire,
-                        appartement=appartement
-                    )
+                    Favori.ajouter(locataire, appartement.id)
                     message = 'Appartement ajouté aux favoris'
                 else:
-                    Favori.objects.filter(
-                        locataire=locataire,
-                        appartement=appartement
-                    ).delete()
+                    Favori.retirer(locataire, appartement.id)
                     message = 'Appartement retiré des favoris'
 
+                # Compteur maintenu par Favori.ajouter / Favori.retirer
+                locataire.refresh_from_db(fields=['nb_favoris'])
+
                 return Response({
                     'message': message,
-                    'favoris_count': locataire.favoris.count()
+                    'favoris_count': locataire.nb_favoris
                 })
 
             except User.DoesNotExist:
@@ -759,14 +937,51 @@ class FavorisView(generics.GenericAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class FavorisSyncView(generics.GenericAPIView):
+    """
+    Synchronisation par lot des favoris (file d'attente des clients hors ligne)
+    """
+    permission_classes = [IsAuthenticated, IsLocataire]
+    serializer_class = FavoriSyncSerializer
+
+    def post(self, request):
+        """Appliquer un lot d'ajouts/retraits et retourner l'ensemble final des favoris"""
+        serializer = self.get_serializer(data=request.data)
+
+        if serializer.is_valid():
+            favoris, ignores = Favori.synchroniser(
+                request.user,
+                serializer.validated_data['operations']
+            )
+            return Response({
+                'favoris': favoris,
+                'favoris_count': len(favoris),
+                'ignores': ignores,
+            })
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 # ========== VUES DASHBOARD ==========
 
-class ProprietaireDashboardView(APIView):
+class ProprietaireDashboardView(ConditionalAPIViewMixin, APIView):
     """
     Dashboard pour les propriétaires
     """
     permission_classes = [IsAuthenticated, IsProprietaire]
 
+    def get_conditional_fingerprint(self, request):
+        appartements = Appartement.objects.filter(proprietaire=request.user)
+        return (
+            timezone.now().date().isoformat(),
+            aggregate_fingerprint(appartements, 'date_modification'),
+            aggregate_fingerprint(
+                Location.objects.filter(appartement__proprietaire=request.user),
+                'date_modification',
+            ),
+        )
+
+    @conditional_get
     def get(self, request):
         try:
             proprietaire = request.user
@@ -846,12 +1061,24 @@ class ProprietaireDashboardView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
-class LocataireDashboardView(APIView):
+class LocataireDashboardView(ConditionalAPIViewMixin, APIView):
     """
     Dashboard pour les locataires
     """
     permission_classes = [IsAuthenticated, IsLocataire]
 
+    def get_conditional_fingerprint(self, request):
+        locataire = request.user
+        return (
+            timezone.now().date().isoformat(),
+            aggregate_fingerprint(
+                Location.objects.filter(Q(locataire=locataire) | Q(email_locataire=locataire.email)),
+                'date_modification', 'appartement__date_modification',
+            ),
+            locataire.nb_favoris,
+        )
+
+    @conditional_get
     def get(self, request):
         try:
             locataire = request.user
@@ -981,7 +1208,7 @@ class StatistiquesView(APIView):
         return Response(stats)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     VueSet pour gérer les utilisateurs
     """
@@ -136,6 +136,32 @@ else:
     DATABASES = {'default': db_config}
 
 
+# Cache
+# Backend configurable : locmem par défaut, fichier ou Redis en production
+# (ex: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache, CACHE_LOCATION=redis://127.0.0.1:6379/1)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='residance-api'),
+    }
+}
+
+# Durée de vie (secondes) des réponses publiques mises en cache (voir api/caching.py)
+API_RESPONSE_CACHE_TIMEOUT = config('API_RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Archivage de l'audit des paiements Premium (voir api/audit_archive.py) :
+# mois conservés en base et répertoire des archives (hors MEDIA_ROOT, non servi)
+AUDIT_HOT_MONTHS = config('AUDIT_HOT_MONTHS', default=12, cast=int)
+AUDIT_ARCHIVE_ROOT = config('AUDIT_ARCHIVE_ROOT', default=str(BASE_DIR / 'archives' / 'audit'))
+
+# Purge RGPD automatique des locataires Premium partis depuis plus de N jours
+RGPD_RETENTION_DAYS = config('RGPD_RETENTION_DAYS', default=365, cast=int)
+
+# Jour du mois où le loyer Premium est exigible : le mois en cours n'est compté
+# dans les impayés (compute_arrears) qu'à partir de ce jour
+PREMIUM_LOYER_JOUR_ECHEANCE = config('PREMIUM_LOYER_JOUR_ECHEANCE', default=5, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -188,6 +214,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
+# API navigable (formulaires HTML, listes de choix des relations) : développement uniquement
+BROWSABLE_API = config('BROWSABLE_API', default=DEBUG, cast=bool)
+
+# Schéma OpenAPI généré au build (python manage.py spectacular --file schema.yml)
+# et servi tel quel par /schema/ ; en DEBUG, introspection à chaque requête.
+OPENAPI_SCHEMA_FILE = config('OPENAPI_SCHEMA_FILE', default=str(BASE_DIR / 'schema.yml'))
+STATIC_OPENAPI_SCHEMA = config('STATIC_OPENAPI_SCHEMA', default=not DEBUG, cast=bool)
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -203,9 +237,16 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # JSON via orjson quand il est installé, même sortie que le JSONRenderer de DRF ;
+    # API navigable seulement si BROWSABLE_API (voir plus haut)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.FastJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if BROWSABLE_API else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
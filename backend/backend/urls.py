@@ -8,6 +8,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
+from api.schema import schema_statique
+
 urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
@@ -16,7 +18,8 @@ urlpatterns = [
     path('api/', include('api.urls')),
 
     # Documentation
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
+    # Hors DEBUG : schema.yml généré au build, sans introspection par requête
+    path('schema/', schema_statique if settings.STATIC_OPENAPI_SCHEMA else SpectacularAPIView.as_view(), name='schema'),
     path('swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='schema-swagger-ui'),
     path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='schema-redoc'),
 ]
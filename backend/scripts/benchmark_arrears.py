@@ -0,0 +1,80 @@
+"""
+Benchmark du rapport d'impayés (compute_arrears) : 10 000 baux et 500 000 paiements.
+
+Usage:
+    python manage.py shell < scripts/benchmark_arrears.py
+
+Les donnees de test sont creees dans une transaction annulee a la fin.
+"""
+import random
+import time
+from datetime import date
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import User, PremiumBien, PremiumLocataire, PremiumBail, PremiumPayment
+from api.premium_services import compute_arrears, month_bounds, month_from_index, month_index
+
+NB_BAUX = 10_000
+NB_MOIS = 50  # 10 000 baux x 50 mois = 500 000 paiements
+TAUX_IMPAYE = 0.02
+BATCH = 5000
+
+random.seed(42)
+as_of = date(2026, 10, 1)
+premier_mois = month_index(as_of) - NB_MOIS + 1
+
+with transaction.atomic():
+    debut = time.perf_counter()
+    owner = User.objects.create_user(
+        email=f'bench.{uuid4().hex[:8]}@example.com',
+        username=f'bench_{uuid4().hex[:8]}',
+        password=None,
+        plan='premium',
+    )
+    biens = PremiumBien.objects.bulk_create([
+        PremiumBien(owner=owner, titre=f'Bien bench {index}', adresse='Benchmark', loyer_hc=Decimal('450'), charges=Decimal('50'))
+        for index in range(NB_BAUX)
+    ], batch_size=BATCH)
+    locataires = PremiumLocataire.objects.bulk_create([
+        PremiumLocataire(owner=owner, nom='Bench', prenoms=str(index), email=f'locataire{index}@example.com')
+        for index in range(NB_BAUX)
+    ], batch_size=BATCH)
+    baux = PremiumBail.objects.bulk_create([
+        PremiumBail(owner=owner, bien=bien, locataire=locataire, date_entree=month_from_index(premier_mois))
+        for bien, locataire in zip(biens, locataires)
+    ], batch_size=BATCH)
+
+    paiements = []
+    for bail in baux:
+        for index in range(premier_mois, premier_mois + NB_MOIS):
+            periode_debut, periode_fin = month_bounds(month_from_index(index))
+            paiements.append(PremiumPayment(
+                owner=owner,
+                bail=bail,
+                date_paiement=periode_debut,
+                periode_debut=periode_debut,
+                periode_fin=periode_fin,
+                montant=Decimal('500'),
+                statut='IMPAYE' if random.random() < TAUX_IMPAYE else 'PAYE',
+            ))
+        if len(paiements) >= BATCH:
+            PremiumPayment.objects.bulk_create(paiements, batch_size=BATCH)
+            paiements.clear()
+    PremiumPayment.objects.bulk_create(paiements, batch_size=BATCH)
+    print(f"Jeu de donnees: {NB_BAUX} baux, {NB_BAUX * NB_MOIS} paiements ({time.perf_counter() - debut:.1f} s)")
+
+    with CaptureQueriesContext(connection) as queries:
+        debut = time.perf_counter()
+        report = compute_arrears(owner=owner, as_of=as_of)
+        duree = time.perf_counter() - debut
+
+    print(
+        f"compute_arrears: {duree:.2f} s, {len(queries)} requetes, "
+        f"{report['nb_baux_en_retard']} baux en retard, total du {report['total_du']}"
+    )
+
+    transaction.set_rollback(True)
@@ -0,0 +1,93 @@
+"""
+Benchmark du regroupement carte (/api/appartements/clusters/) : taille et durée
+de la réponse pour une ville dense, comparées au rapatriement de tous les marqueurs.
+
+Usage:
+    python manage.py shell < scripts/benchmark_clusters.py
+
+Les données de test sont créées dans une transaction annulée à la fin.
+"""
+import random
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.geo_utils import cellule_carte, tile_xy
+from api.models import User, Appartement, PremiumBien
+
+if 'testserver' not in settings.ALLOWED_HOSTS:
+    settings.ALLOWED_HOSTS.append('testserver')
+
+NB_ANNONCES = 50_000
+CENTRE = (48.8566, 2.3522)
+
+random.seed(42)
+
+
+def mesurer(client, label, url, repetitions=3):
+    meilleur, response = None, None
+    for _ in range(repetitions):
+        cache.clear()
+        debut = time.perf_counter()
+        response = client.get(url, HTTP_ACCEPT='application/json')
+        duree = time.perf_counter() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    print(f"{label:<42} {len(response.content):>10} o {meilleur * 1000:9.1f} ms")
+    return response
+
+
+with transaction.atomic():
+    proprietaire = User.objects.create_user(
+        email=f'bench.{uuid4().hex[:8]}@example.com',
+        username=f'bench_{uuid4().hex[:8]}',
+        password=None,
+        plan='premium',
+    )
+
+    biens = []
+    for index in range(NB_ANNONCES):
+        lat = CENTRE[0] + random.gauss(0, 0.05)
+        lng = CENTRE[1] + random.gauss(0, 0.08)
+        # bulk_create n'appelle pas save() : cellule calculée ici
+        biens.append(PremiumBien(
+            owner=proprietaire, titre=f'Bien {index}', adresse='Benchmark',
+            latitude=Decimal(f'{lat:.7f}'), longitude=Decimal(f'{lng:.7f}'), cellule=cellule_carte(lat, lng),
+        ))
+    biens = PremiumBien.objects.bulk_create(biens, batch_size=5000)
+    Appartement.objects.bulk_create([
+        Appartement(
+            proprietaire=proprietaire, bien=bien, titre=f'Annonce {index}',
+            slug=f'annonce-bench-{uuid4().hex[:12]}', description='Benchmark', adresse='Benchmark',
+            loyer_mensuel=300 + index % 900,
+        )
+        for index, bien in enumerate(biens)
+    ], batch_size=5000)
+    print(f"{NB_ANNONCES} annonces disponibles autour de Paris\n")
+
+    client = APIClient()
+    mesurer(client, 'tous les marqueurs (liste, page de 100)', '/api/appartements/?page_size=100&page=1', repetitions=1)
+    print(f"  -> {NB_ANNONCES // 100} pages nécessaires pour tout afficher\n")
+
+    for zoom in (10, 12, 14):
+        x, y = tile_xy(*CENTRE, zoom)
+        response = mesurer(client, f'clusters tuile {zoom}/{x}/{y}', f'/api/appartements/clusters/?tile={zoom}/{x}/{y}')
+        data = response.json()
+        print(f"  -> {len(data['clusters'])} cellules pour {data['total']} annonces")
+
+    response = mesurer(client, 'clusters bbox Paris zoom 12', '/api/appartements/clusters/?bbox=2.2,48.8,2.5,48.95&zoom=12')
+    print(f"  -> {len(response.json()['clusters'])} cellules\n")
+
+    x, y = tile_xy(*CENTRE, 12)
+    url = f'/api/appartements/clusters/?tile=12/{x}/{y}'
+    client.get(url)
+    debut = time.perf_counter()
+    for _ in range(100):
+        client.get(url)
+    print(f"tuile en cache: {(time.perf_counter() - debut) * 10:.2f} ms / requête")
+
+    transaction.set_rollback(True)
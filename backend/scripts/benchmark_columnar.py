@@ -0,0 +1,103 @@
+"""
+Benchmark du format colonnes (?format=columnar, api/columnar.py) : temps CPU et
+taille de réponse pour 10 000 locations, écritures et paiements, comparés au
+format JSON habituel (sérialiseur par ligne) sur la même page de 10 000 lignes.
+
+Usage:
+    python manage.py shell < scripts/benchmark_columnar.py
+
+Les données de test sont créées dans une transaction annulée à la fin.
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.models import (
+    User, Appartement, Location, PremiumBien, PremiumLocataire, PremiumBail,
+    PremiumComptableEcriture, PremiumPayment,
+)
+from api.pagination import StandardResultsSetPagination
+
+if 'testserver' not in settings.ALLOWED_HOSTS:
+    settings.ALLOWED_HOSTS.append('testserver')
+
+NB_LIGNES = 10_000
+REPETITIONS = 3
+
+# Page unique de NB_LIGNES en JSON aussi, pour comparer à volume égal
+StandardResultsSetPagination.max_page_size = NB_LIGNES
+
+
+def mesurer(client, url, **headers):
+    meilleur, response = None, None
+    for _ in range(REPETITIONS):
+        cache.clear()
+        debut = time.process_time()
+        response = client.get(url, **headers)
+        duree = time.process_time() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    assert response.status_code == 200, response.content[:200]
+    return meilleur, len(response.content)
+
+
+def comparer(client, label, url):
+    url = f'{url}?page_size={NB_LIGNES}'
+    cpu_json, octets_json = mesurer(client, url, HTTP_ACCEPT='application/json')
+    cpu_colonnes, octets_colonnes = mesurer(client, url, HTTP_ACCEPT='application/vnd.columnar+json')
+    print(f"{label:<14} json {cpu_json * 1000:8.1f} ms CPU {octets_json:>9} o | "
+          f"colonnes {cpu_colonnes * 1000:7.1f} ms CPU {octets_colonnes:>9} o | "
+          f"CPU x{cpu_json / cpu_colonnes:.1f}, octets -{(1 - octets_colonnes / octets_json) * 100:.0f}%")
+
+
+with transaction.atomic():
+    suffixe = uuid4().hex[:8]
+    proprietaire = User.objects.create_user(
+        email=f'bench.{suffixe}@example.com', username=f'bench_{suffixe}', password=None, plan='premium'
+    )
+    appartement = Appartement.objects.create(
+        proprietaire=proprietaire, titre='Annonce benchmark', description='Benchmark',
+        adresse='Benchmark', loyer_mensuel=Decimal('250000'),
+    )
+    bien = PremiumBien.objects.create(owner=proprietaire, titre='Bien benchmark', adresse='Benchmark')
+    locataire = PremiumLocataire.objects.create(owner=proprietaire, nom='Kone', prenoms='Awa', email='awa@example.com')
+    bail = PremiumBail.objects.create(owner=proprietaire, bien=bien, locataire=locataire, date_entree=date(2020, 1, 1))
+
+    debut = date(2020, 1, 1)
+    Location.objects.bulk_create([
+        Location(
+            appartement=appartement, locataire=proprietaire, nom_locataire=f'Locataire {index}',
+            email_locataire='locataire@example.com', telephone_locataire='0700000000',
+            date_debut=debut + timedelta(days=index), date_fin=debut + timedelta(days=index + 30),
+            statut='CONFIRME', montant_total=Decimal('250000.00'),
+        )
+        for index in range(NB_LIGNES)
+    ], batch_size=2000)
+    PremiumComptableEcriture.objects.bulk_create([
+        PremiumComptableEcriture(
+            owner=proprietaire, bien=bien, bail=bail, type_ecriture='REVENU', libelle=f'Loyer {index}',
+            categorie='Loyer', date_operation=debut + timedelta(days=index % 2000), montant=Decimal('150000.00'),
+        )
+        for index in range(NB_LIGNES)
+    ], batch_size=2000)
+    PremiumPayment.objects.bulk_create([
+        PremiumPayment(
+            owner=proprietaire, bail=bail, date_paiement=debut + timedelta(days=index % 2000),
+            periode_debut=debut, periode_fin=debut + timedelta(days=30), montant=Decimal('150000.00'), statut='PAYE',
+        )
+        for index in range(NB_LIGNES)
+    ], batch_size=2000)
+    print(f"{NB_LIGNES} lignes par liste, meilleur temps CPU sur {REPETITIONS} requêtes\n")
+
+    client = APIClient()
+    client.force_authenticate(proprietaire)
+    comparer(client, 'locations', '/api/locations/')
+    comparer(client, 'écritures', '/api/premium/comptabilite/ecritures/')
+    comparer(client, 'paiements', '/api/premium/payments/')
+
+    transaction.set_rollback(True)
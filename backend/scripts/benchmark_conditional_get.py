@@ -0,0 +1,96 @@
+"""
+Benchmark des GET conditionnels (ETag / If-None-Match) : octets economises
+quand le client revalide une page deja en cache.
+
+Usage:
+    python manage.py shell < scripts/benchmark_conditional_get.py
+
+Les donnees de test sont creees dans une transaction annulee a la fin.
+"""
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.models import User, Appartement, Location, PremiumBien
+
+if 'testserver' not in settings.ALLOWED_HOSTS:
+    settings.ALLOWED_HOSTS.append('testserver')
+
+NB_APPARTEMENTS = 200
+NB_REQUETES = 50
+
+
+def mesurer(client, url):
+    first = client.get(url, HTTP_ACCEPT='application/json')
+    etag = first.get('ETag')
+
+    debut = time.perf_counter()
+    for _ in range(NB_REQUETES):
+        full = client.get(url, HTTP_ACCEPT='application/json')
+    duree_200 = (time.perf_counter() - debut) / NB_REQUETES
+
+    debut = time.perf_counter()
+    for _ in range(NB_REQUETES):
+        revalidated = client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+    duree_304 = (time.perf_counter() - debut) / NB_REQUETES
+
+    octets_200 = len(full.content)
+    octets_304 = len(revalidated.content)
+    print(
+        f"{url:<40} 200: {octets_200:>7} o {duree_200 * 1000:6.1f} ms | "
+        f"{revalidated.status_code}: {octets_304:>3} o {duree_304 * 1000:6.1f} ms | "
+        f"economie: {octets_200 - octets_304} o/requete"
+    )
+
+
+with transaction.atomic():
+    proprietaire = User.objects.create_user(
+        email=f'bench.{uuid4().hex[:8]}@example.com',
+        username=f'bench_{uuid4().hex[:8]}',
+        password=None,
+        plan='premium',
+    )
+    appartements = Appartement.objects.bulk_create([
+        Appartement(
+            proprietaire=proprietaire,
+            titre=f'Appartement bench {index}',
+            slug=f'appartement-bench-{uuid4().hex[:12]}',
+            description='Description ' * 20,
+            adresse=f'{index} avenue du Benchmark',
+            loyer_mensuel=400 + index,
+        )
+        for index in range(NB_APPARTEMENTS)
+    ])
+    Location.objects.bulk_create([
+        Location(
+            appartement=appartement,
+            nom_locataire='Locataire bench',
+            email_locataire='locataire.bench@example.com',
+            telephone_locataire='0102030405',
+            date_debut='2026-01-01',
+            date_fin='2026-06-30',
+            montant_total=appartement.loyer_mensuel * 6,
+        )
+        for appartement in appartements
+    ])
+    PremiumBien.objects.bulk_create([
+        PremiumBien(owner=proprietaire, titre=f'Bien bench {index}', adresse='Benchmark')
+        for index in range(NB_APPARTEMENTS)
+    ])
+
+    client = APIClient()
+    client.force_authenticate(user=proprietaire)
+
+    for url in [
+        '/api/appartements/?page_size=100',
+        '/api/locations/?page_size=100',
+        '/api/premium/biens/?page_size=100',
+        '/api/premium/dashboard/',
+        '/api/dashboard/proprietaire/',
+    ]:
+        mesurer(client, url)
+
+    transaction.set_rollback(True)
@@ -0,0 +1,86 @@
+"""
+Benchmark de l'export comptable en streaming (CSV / FEC) sur 1 000 000 d'écritures :
+durée, volume produit et pic mémoire Python pendant l'export.
+
+Usage:
+    python manage.py shell < scripts/benchmark_export_comptable.py
+
+Les donnees de test sont creees dans une transaction annulee a la fin.
+"""
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.models import User, PremiumBien, PremiumComptableEcriture
+
+if 'testserver' not in settings.ALLOWED_HOSTS:
+    settings.ALLOWED_HOSTS.append('testserver')
+
+NB_ECRITURES = 1_000_000
+NB_BIENS = 100
+BATCH = 5000
+
+
+def mesurer(client, url):
+    tracemalloc.start()
+    debut = time.perf_counter()
+    response = client.get(url)
+    octets = 0
+    lignes = 0
+    for chunk in response.streaming_content:
+        octets += len(chunk)
+        lignes += chunk.count(b'\n')
+    duree = time.perf_counter() - debut
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{url:<60} {lignes - 1:>8} lignes {octets / 1e6:7.1f} Mo "
+        f"en {duree:5.1f} s, pic memoire {pic / 1e6:5.1f} Mo"
+    )
+
+
+with transaction.atomic():
+    debut = time.perf_counter()
+    owner = User.objects.create_user(
+        email=f'bench.{uuid4().hex[:8]}@example.com',
+        username=f'bench_{uuid4().hex[:8]}',
+        password=None,
+        plan='premium',
+    )
+    biens = PremiumBien.objects.bulk_create([
+        PremiumBien(owner=owner, titre=f'Bien bench {index}', adresse='Benchmark')
+        for index in range(NB_BIENS)
+    ])
+    origine = date(2020, 1, 1)
+    for offset in range(0, NB_ECRITURES, BATCH):
+        PremiumComptableEcriture.objects.bulk_create([
+            PremiumComptableEcriture(
+                owner=owner,
+                bien=biens[index % NB_BIENS],
+                type_ecriture='REVENU' if index % 3 else 'DEPENSE',
+                libelle=f'Ecriture bench {index}',
+                categorie='LOYER' if index % 3 else 'TRAVAUX',
+                date_operation=origine + timedelta(days=index % 2190),
+                montant=Decimal('100.00') + index % 900,
+            )
+            for index in range(offset, min(offset + BATCH, NB_ECRITURES))
+        ])
+    print(f"Jeu de donnees: {NB_ECRITURES} ecritures ({time.perf_counter() - debut:.1f} s)")
+
+    client = APIClient()
+    client.force_authenticate(user=owner)
+
+    for url in [
+        '/api/premium/comptabilite/ecritures/export/?periode=2024',
+        '/api/premium/comptabilite/ecritures/export/',
+        '/api/premium/comptabilite/ecritures/export/?modele=fec',
+    ]:
+        mesurer(client, url)
+
+    transaction.set_rollback(True)
@@ -0,0 +1,97 @@
+"""
+Benchmark de la recherche géographique (api.geo) sur 1 000 000 de biens.
+
+Compare, pour une recherche par rayon autour de Paris :
+- le calcul de haversine sur toute la table (sans préfiltre) ;
+- le préfiltre rectangle sur l'index (latitude, longitude) puis haversine
+  sur les seules lignes candidates (filter_geo) ;
+et mesure la recherche par rectangle (bbox) seule.
+
+Usage:
+    python manage.py shell < scripts/benchmark_geo_search.py
+
+Les données de test sont créées dans une transaction annulée à la fin.
+"""
+import random
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import connection, transaction
+
+from api.geo import bounding_box, filter_geo, haversine_km
+from api.models import User, PremiumBien
+
+NB_BIENS = 1_000_000
+TAILLE_LOT = 20_000
+CENTRE = (48.8566, 2.3522)
+RAYONS_KM = (2, 10, 50)
+
+random.seed(42)
+
+
+def coordonnees():
+    """Un tiers des biens autour de quelques grandes villes, le reste sur la France métropolitaine"""
+    villes = [(48.8566, 2.3522), (45.764, 4.8357), (43.2965, 5.3698), (44.8378, -0.5792), (50.6292, 3.0573)]
+    if random.random() < 0.33:
+        lat, lng = random.choice(villes)
+        return lat + random.gauss(0, 0.15), lng + random.gauss(0, 0.2)
+    return random.uniform(42.3, 51.1), random.uniform(-4.8, 8.2)
+
+
+def chrono(label, queryset, repetitions=3):
+    meilleur, total = None, None
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        total = len(list(queryset.values_list('id', flat=True)))
+        duree = time.perf_counter() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    print(f"{label:<48} {total:>8} biens {meilleur * 1000:9.1f} ms")
+    return meilleur
+
+
+with transaction.atomic():
+    proprietaire = User.objects.create_user(
+        email=f'bench.{uuid4().hex[:8]}@example.com',
+        username=f'bench_{uuid4().hex[:8]}',
+        password=None,
+        plan='premium',
+    )
+
+    debut = time.perf_counter()
+    for lot in range(0, NB_BIENS, TAILLE_LOT):
+        biens = []
+        for index in range(lot, min(lot + TAILLE_LOT, NB_BIENS)):
+            lat, lng = coordonnees()
+            biens.append(PremiumBien(
+                owner=proprietaire, titre=f'Bien {index}', adresse='Benchmark',
+                latitude=Decimal(f'{lat:.7f}'), longitude=Decimal(f'{lng:.7f}'),
+            ))
+        PremiumBien.objects.bulk_create(biens)
+    print(f"{NB_BIENS} biens créés en {time.perf_counter() - debut:.1f} s\n")
+
+    # Statistiques à jour pour que le planificateur choisisse l'index géographique
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE' if connection.vendor == 'sqlite' else 'ANALYZE api_premiumbien')
+
+    lat, lng = CENTRE
+    for label, biens in [
+        ('biens du propriétaire (PremiumBienViewSet)', PremiumBien.objects.filter(owner=proprietaire)),
+        ('tous les biens (annonces via bien)', PremiumBien.objects.all()),
+    ]:
+        biens = biens.order_by()
+        print(f"== {label}")
+        for rayon in RAYONS_KM:
+            print(f"Rayon {rayon} km autour de Paris")
+            sans_prefiltre = biens.annotate(distance_km=haversine_km(lat, lng)).filter(distance_km__lte=rayon)
+            avec_prefiltre = filter_geo(biens, circle=(lat, lng, rayon))
+            lent = chrono('  haversine sur toute la table', sans_prefiltre, repetitions=1)
+            rapide = chrono('  rectangle indexé + haversine (filter_geo)', avec_prefiltre)
+            chrono('  rectangle seul (bbox)', filter_geo(biens, bbox=bounding_box(lat, lng, rayon)))
+            print(f"  gain: x{lent / rapide:.1f}\n")
+
+        print("Plan de la recherche par rayon (10 km) :")
+        print(filter_geo(biens, circle=(lat, lng, 10)).values('id').explain())
+        print()
+
+    transaction.set_rollback(True)
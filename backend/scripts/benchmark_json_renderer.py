@@ -0,0 +1,106 @@
+"""
+Benchmark du rendu / de la lecture JSON : JSONRenderer et JSONParser de DRF
+comparés à api.renderers.FastJSONRenderer et api.parsers.FastJSONParser
+sur des pages de 1 000 lignes.
+
+Pages mesurées :
+- écritures comptables sérialisées (montants Decimal en chaînes, dates, metadata) ;
+- locations sérialisées (LocationListSerializer, UUID du locataire) ;
+- lignes values() brutes (Decimal, UUID, date, datetime passés à l'encodeur).
+
+Usage:
+    python manage.py shell < scripts/benchmark_json_renderer.py
+
+Les données de test sont créées dans une transaction annulée à la fin.
+"""
+import io
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import User, Appartement, Location, PremiumBien, PremiumComptableEcriture
+from api.parsers import FastJSONParser
+from api.premium_serializers import PremiumComptableEcritureSerializer
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import LocationListSerializer
+
+TAILLE_PAGE = 1000
+REPETITIONS = 50
+
+
+def chrono(fonction):
+    meilleur = None
+    for _ in range(REPETITIONS):
+        debut = time.perf_counter()
+        fonction()
+        duree = time.perf_counter() - debut
+        meilleur = duree if meilleur is None else min(meilleur, duree)
+    return meilleur
+
+
+def comparer(label, data):
+    drf, rapide = JSONRenderer(), FastJSONRenderer()
+    contenu = drf.render(data)
+    assert rapide.render(data) == contenu, f'{label}: sortie différente'
+
+    rendu_drf = chrono(lambda: drf.render(data))
+    rendu_rapide = chrono(lambda: rapide.render(data))
+    lecture_drf = chrono(lambda: JSONParser().parse(io.BytesIO(contenu)))
+    lecture_rapide = chrono(lambda: FastJSONParser().parse(io.BytesIO(contenu)))
+    print(f"{label:<32} {len(contenu):>9} o")
+    print(f"  rendu   DRF {rendu_drf * 1000:7.2f} ms   orjson {rendu_rapide * 1000:7.2f} ms   x{rendu_drf / rendu_rapide:.1f}")
+    print(f"  lecture DRF {lecture_drf * 1000:7.2f} ms   orjson {lecture_rapide * 1000:7.2f} ms   x{lecture_drf / lecture_rapide:.1f}")
+
+
+if orjson is None:
+    print("orjson n'est pas installé : FastJSONRenderer utilise json de la bibliothèque standard")
+
+with transaction.atomic():
+    suffixe = uuid4().hex[:8]
+    proprietaire = User.objects.create_user(
+        email=f'bench.{suffixe}@example.com', username=f'bench_{suffixe}', password=None, plan='premium'
+    )
+    locataire = User.objects.create_user(
+        email=f'bench.locataire.{suffixe}@example.com', username=f'bench_locataire_{suffixe}', password=None
+    )
+    bien = PremiumBien.objects.create(owner=proprietaire, titre='Bien benchmark', adresse='Benchmark')
+    appartement = Appartement.objects.create(
+        proprietaire=proprietaire, titre='Annonce benchmark', description='Benchmark',
+        adresse='Benchmark', loyer_mensuel=Decimal('250000'),
+    )
+
+    debut_periode = date(2024, 1, 1)
+    PremiumComptableEcriture.objects.bulk_create([
+        PremiumComptableEcriture(
+            owner=proprietaire, bien=bien, type_ecriture='REVENU' if index % 3 else 'DEPENSE',
+            libelle=f'Loyer {index}', categorie='Loyer', date_operation=debut_periode + timedelta(days=index),
+            montant=Decimal(f'{150000 + index}.{index % 100:02d}'), metadata={'periode': index, 'note': 'échéance'},
+        )
+        for index in range(TAILLE_PAGE)
+    ])
+    Location.objects.bulk_create([
+        Location(
+            appartement=appartement, locataire=locataire, nom_locataire=f'Locataire {index}',
+            email_locataire='locataire@example.com', telephone_locataire='0700000000',
+            date_debut=debut_periode + timedelta(days=index), date_fin=debut_periode + timedelta(days=index + 30),
+            statut='CONFIRME', montant_total=Decimal('250000.00'),
+        )
+        for index in range(TAILLE_PAGE)
+    ])
+
+    ecritures = PremiumComptableEcriture.objects.filter(owner=proprietaire).order_by('date_operation')
+    locations = Location.objects.filter(appartement=appartement).select_related('appartement', 'locataire')
+    print(f"Pages de {TAILLE_PAGE} lignes, meilleur temps sur {REPETITIONS} passes\n")
+
+    comparer('écritures (sérialiseur)', {'count': TAILLE_PAGE, 'results': PremiumComptableEcritureSerializer(ecritures, many=True).data})
+    comparer('locations (sérialiseur)', {'count': TAILLE_PAGE, 'results': LocationListSerializer(locations, many=True).data})
+    comparer('locations (values brutes)', list(locations.values(
+        'id', 'locataire_id', 'date_debut', 'date_fin', 'montant_total', 'date_reservation', 'statut'
+    )))
+
+    transaction.set_rollback(True)
@@ -9,18 +9,21 @@ const AppartementCard = ({ appartement }) => {
   const { mutate: toggleFavori } = useToggleFavori();
   
   // Initialiser l'état avec la valeur correcte dès le départ
+  // is_favori est calculé par l'API pour l'utilisateur connecté
   const [isFavori, setIsFavori] = useState(() => {
-    return user?.profil_locataire?.favoris?.includes(appartement.id) ?? false;
+    return appartement.isFavori ?? user?.profil_locataire?.favoris?.includes(appartement.id) ?? false;
   });
   
   // Mettre à jour l'état local quand l'utilisateur change
   useEffect(() => {
-    if (user?.profil_locataire?.favoris) {
+    if (appartement.isFavori !== undefined) {
+      setIsFavori(appartement.isFavori);
+    } else if (user?.profil_locataire?.favoris) {
       setIsFavori(user.profil_locataire.favoris.includes(appartement.id));
     } else {
       setIsFavori(false);
     }
-  }, [user?.profil_locataire?.favoris, appartement.id]);
+  }, [appartement.isFavori, user?.profil_locataire?.favoris, appartement.id]);
 
   const handleToggleFavori = (e) => {
     e.preventDefault();
@@ -13,6 +13,13 @@ export const favorisService = {
     return response.data;
   },
 
+  // POST /api/favoris/sync/
+  // operations: [{ appartement_id, action: 'add' | 'remove' }]
+  async sync(operations) {
+    const response = await api.post('/favoris/sync/', { operations });
+    return response.data;
+  },
+
   async add(appartementId) {
     return this.toggle({
       appartement_id: appartementId,
@@ -94,6 +94,8 @@ export const adapters = {
     proprietaireNom: data.proprietaire_nom,
     nbVues: data.nb_vues,
     nbFavoris: data.nb_favoris,
+    // Absent (visiteur anonyme, ?fields=) : undefined, la carte retombe sur profil_locataire.favoris
+    isFavori: data.is_favori === undefined ? undefined : Boolean(data.is_favori),
   }),
 
   // Adaptation de AppartementDetail vers format frontend